@@ -0,0 +1,285 @@
+"""Buffered product analytics with incremental hourly rollups.
+
+Request handlers call `track(event, ...)`, which only appends to an in-memory
+buffer and returns; no database work happens on the request path. The buffer
+is flushed in the background when it holds `max_batch` events or the oldest
+has waited `flush_interval` seconds:
+
+* raw events go to `analytics_events` with one `insert_many` (expired by a
+  TTL index, they are for ad-hoc questions only);
+* the batch is pre-aggregated in memory into per-hour counters and applied
+  with one unordered `bulk_write` of `$inc` upserts into `analytics_hourly`:
+
+    {"hour": 2026-10-19T14:00, "dimension": "event", "value": "itinerary_generated", "count": 42}
+    {"hour": 2026-10-19T14:00, "dimension": "destination", "value": "Paris, France", "count": 17}
+
+Dashboards read the rollups (`funnel`, `top_values`, or `python analytics.py
+report`), so nothing scans the itinerary collections. Every worker flushes its
+own buffer and the upserts add up across workers.
+
+Delivery is best effort: a crash loses the buffered events, a full buffer
+drops new ones, and failed writes are retried with backoff, only for the
+operations that failed, then dropped after `max_retries`.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+EVENTS_COLLECTION = "analytics_events"
+ROLLUP_COLLECTION = "analytics_hourly"
+
+# Funnel steps, in order
+ITINERARY_GENERATED = "itinerary_generated"
+AUTH_PREPARED = "auth_prepared"
+ITINERARY_CONVERTED = "itinerary_converted"
+FUNNEL = (ITINERARY_GENERATED, AUTH_PREPARED, ITINERARY_CONVERTED)
+
+# (dimension, event property) pairs counted per value in the rollups
+ROLLUP_DIMENSIONS = {
+    ITINERARY_GENERATED: (("destination", "destinations"), ("theme", "theme")),
+    ITINERARY_CONVERTED: (("converted_destination", "destinations"), ("converted_theme", "theme")),
+}
+
+# Duplicate key: an earlier attempt already inserted these raw events
+DUPLICATE_KEY = 11000
+
+
+def hour_of(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_counts(events: List[Dict[str, Any]]) -> Dict[Tuple[datetime, str, str], int]:
+    """Per-hour counters of a batch: every event by name, plus its rolled-up properties by value"""
+    counts: Dict[Tuple[datetime, str, str], int] = {}
+
+    def add(key):
+        counts[key] = counts.get(key, 0) + 1
+
+    for event in events:
+        hour = hour_of(event["at"])
+        add((hour, "event", event["event"]))
+        for dimension, prop in ROLLUP_DIMENSIONS.get(event["event"], ()):
+            values = event.get(prop)
+            for value in values if isinstance(values, list) else [values]:
+                if value:
+                    add((hour, dimension, value))
+    return counts
+
+
+def rollup_updates(counts: Dict[Tuple[datetime, str, str], int]) -> List[UpdateOne]:
+    return [
+        UpdateOne({"hour": hour, "dimension": dimension, "value": value}, {"$inc": {"count": count}}, upsert=True)
+        for (hour, dimension, value), count in counts.items()
+    ]
+
+
+class AnalyticsBuffer:
+    """Fire-and-forget event sink for one worker"""
+
+    def __init__(
+        self,
+        database,
+        max_batch: int = 500,
+        flush_interval: float = 5.0,
+        max_buffer: int = 10000,
+        max_retries: int = 5,
+    ):
+        self.events_collection = database[EVENTS_COLLECTION]
+        self.rollup_collection = database[ROLLUP_COLLECTION]
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self._buffer: List[Dict[str, Any]] = []
+        # Writes of a flushed batch that still have to succeed
+        self._unwritten_events: List[Dict[str, Any]] = []
+        self._unapplied_updates: List[UpdateOne] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flush: Optional[asyncio.Task] = None
+        self._failures = 0
+        # Metrics
+        self.tracked = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.events_written = 0
+        self.rollup_updates = 0
+        self.failed_flushes = 0
+        self.flush_seconds_max = 0.0
+
+    def track(self, event: str, **properties: Any):
+        """Record an event; never blocks and never raises into the request"""
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append({"_id": ObjectId(), "event": event, "at": datetime.utcnow(), **properties})
+        self.tracked += 1
+        try:
+            # While retrying after a failure, only the backoff timer decides when to write again
+            if self._failures:
+                return
+            if len(self._buffer) >= self.max_batch:
+                self._start_flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().create_task(self._flush_after(self.flush_interval))
+        except RuntimeError:
+            pass  # no running loop (scripts); flushed by close()
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        self._timer = None
+        self._start_flush()
+
+    def _start_flush(self):
+        if self._flush is None or self._flush.done():
+            self._flush = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """Write buffered events and apply their rollups (one batch at a time)"""
+        while self._buffer or self._unwritten_events or self._unapplied_updates:
+            if not self._unwritten_events and not self._unapplied_updates:
+                batch, self._buffer = self._buffer[:self.max_batch], self._buffer[self.max_batch:]
+                self._unwritten_events = batch
+                self._unapplied_updates = rollup_updates(rollup_counts(batch))
+
+            started = time.perf_counter()
+            try:
+                await self._write_events()
+                await self._apply_rollups()
+            except Exception as e:
+                self._retry_later(e)
+                return
+            self._failures = 0
+            self.flushes += 1
+            self.flush_seconds_max = max(self.flush_seconds_max, time.perf_counter() - started)
+
+    async def _write_events(self):
+        if not self._unwritten_events:
+            return
+        try:
+            await self.events_collection.insert_many(self._unwritten_events, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+        self.events_written += len(self._unwritten_events)
+        self._unwritten_events = []
+
+    async def _apply_rollups(self):
+        if not self._unapplied_updates:
+            return
+        updates, self._unapplied_updates = self._unapplied_updates, []
+        try:
+            await self.rollup_collection.bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            # Retry just the counters that failed; the others are already applied
+            failed = [updates[error["index"]] for error in e.details.get("writeErrors", [])]
+            self._unapplied_updates = failed
+            self.rollup_updates += len(updates) - len(failed)
+            raise
+        except Exception:
+            self._unapplied_updates = updates
+            raise
+        self.rollup_updates += len(updates)
+
+    def _retry_later(self, error: Exception):
+        self.failed_flushes += 1
+        self._failures += 1
+        if self._failures > self.max_retries:
+            lost = len(self._unwritten_events) + len(self._unapplied_updates)
+            print(f"Analytics flush dropped after {self.max_retries} retries ({lost} writes): {str(error)}")
+            self._unwritten_events, self._unapplied_updates = [], []
+            self._failures = 0
+        else:
+            print(f"Analytics flush failed, retrying: {str(error)}")
+        if self._timer is None:
+            backoff = min(self.flush_interval * (2 ** self._failures), 300.0)
+            self._timer = asyncio.get_running_loop().create_task(self._flush_after(backoff))
+
+    async def close(self):
+        """Flush what is buffered (called at shutdown)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush is not None:
+            await asyncio.gather(self._flush, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "tracked": self.tracked,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "events_written": self.events_written,
+            "rollup_updates": self.rollup_updates,
+            "failed_flushes": self.failed_flushes,
+            "max_flush_ms": round(self.flush_seconds_max * 1000, 2),
+        }
+
+
+# Dashboard reads
+
+async def funnel(database, since: datetime, until: Optional[datetime] = None) -> Dict[str, int]:
+    """Event counts of the funnel steps between two times (hour resolution)"""
+    hours: Dict[str, Any] = {"$gte": hour_of(since)}
+    if until is not None:
+        hours["$lt"] = until
+    pipeline = [
+        {"$match": {"dimension": "event", "value": {"$in": list(FUNNEL)}, "hour": hours}},
+        {"$group": {"_id": "$value", "count": {"$sum": "$count"}}},
+    ]
+    counts = {step: 0 for step in FUNNEL}
+    async for row in database[ROLLUP_COLLECTION].aggregate(pipeline):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+async def top_values(database, dimension: str, since: datetime, limit: int = 10) -> List[Tuple[str, int]]:
+    """Most frequent values of a rolled-up dimension (destination, theme, converted_destination, ...)"""
+    pipeline = [
+        {"$match": {"dimension": dimension, "hour": {"$gte": hour_of(since)}}},
+        {"$group": {"_id": "$value", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+    return [(row["_id"], row["count"]) async for row in database[ROLLUP_COLLECTION].aggregate(pipeline)]
+
+
+async def report(database, hours: int) -> int:
+    since = datetime.utcnow() - timedelta(hours=hours)
+    steps = await funnel(database, since)
+    print(f"Funnel, last {hours}h:")
+    first = steps[FUNNEL[0]] or 1
+    for step in FUNNEL:
+        print(f"  {step:<22}{steps[step]:>10,}{steps[step] / first:>9.1%}")
+    for dimension in ("destination", "theme", "converted_destination", "converted_theme"):
+        print(f"Top {dimension.replace('_', ' ')}s:")
+        for value, count in await top_values(database, dimension, since):
+            print(f"  {value:<30}{count:>10,}")
+    return 0
+
+
+def main():
+    import os
+
+    import motor.motor_asyncio
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Print the analytics funnel and top destinations/themes")
+    parser.add_argument("command", choices=("report",))
+    parser.add_argument("--hours", type=int, default=24 * 7)
+    args = parser.parse_args()
+
+    load_dotenv()
+    database = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URL")).dora_travel
+    return asyncio.run(report(database, args.hours))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
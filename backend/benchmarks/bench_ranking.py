@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Ranking Benchmark for Dora Travel API
+Compares full sort, bounded-heap and vectorized top-k selection at 10k options
+
+Run from the backend directory: python benchmarks/bench_ranking.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ranking import (  # noqa: E402
+    THEME_AMENITIES,
+    FlightColumns,
+    HotelColumns,
+    score_flight,
+    score_hotel,
+    top_k,
+    top_k_indices,
+)
+
+OPTION_COUNT = 10_000
+TOP_K = 3
+REPEATS = 20
+BUDGET = 2500.0
+THEME = "Luxury"
+
+ALL_AMENITIES = sorted({a for amenities in THEME_AMENITIES.values() for a in amenities})
+
+
+def make_flights(n: int):
+    rng = random.Random(42)
+    return [
+        {
+            "airline": f"Airline {i}",
+            "price": rng.uniform(150, 2500),
+            "stops": rng.choice([0, 0, 1, 1, 2]),
+            "duration": f"{rng.randint(2, 30)}h {rng.randint(0, 59)}m",
+        }
+        for i in range(n)
+    ]
+
+
+def make_hotels(n: int):
+    rng = random.Random(7)
+    return [
+        {
+            "name": f"Hotel {i}",
+            "price_per_night": rng.uniform(40, 900),
+            "star_rating": rng.randint(1, 5),
+            "amenities": rng.sample(ALL_AMENITIES, rng.randint(1, 8)),
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+
+def report(label: str, rows):
+    print(f"\n{label} ({OPTION_COUNT:,} options, top {TOP_K}, mean of {REPEATS} runs)")
+    baseline = rows[0][1]
+    for name, ms in rows:
+        print(f"  {name:<34} {ms:8.2f} ms   {baseline / ms:5.1f}x")
+
+
+def main():
+    flights = make_flights(OPTION_COUNT)
+    hotels = make_hotels(OPTION_COUNT)
+
+    def flight_sort():
+        return sorted(flights, key=lambda f: score_flight(f, BUDGET, THEME), reverse=True)[:TOP_K]
+
+    def flight_heap():
+        return top_k(flights, [score_flight(f, BUDGET, THEME) for f in flights], TOP_K)
+
+    flight_columns = FlightColumns.from_options(flights)
+
+    def flight_vectorized():
+        return [flights[i] for i in top_k_indices(flight_columns.score(BUDGET, THEME), TOP_K)]
+
+    def flight_vectorized_with_build():
+        columns = FlightColumns.from_options(flights)
+        return [flights[i] for i in top_k_indices(columns.score(BUDGET, THEME), TOP_K)]
+
+    results = [timed(fn) for fn in (flight_sort, flight_heap, flight_vectorized, flight_vectorized_with_build)]
+    assert all(r[1] == results[0][1] for r in results), "flight rankings disagree"
+    report("Flights", [
+        ("full sort", results[0][0]),
+        ("bounded heap", results[1][0]),
+        ("vectorized (columns prebuilt)", results[2][0]),
+        ("vectorized (incl. column build)", results[3][0]),
+    ])
+
+    def hotel_sort():
+        return sorted(hotels, key=lambda h: score_hotel(h, BUDGET, THEME, 2, 6), reverse=True)[:TOP_K]
+
+    def hotel_heap():
+        return top_k(hotels, [score_hotel(h, BUDGET, THEME, 2, 6) for h in hotels], TOP_K)
+
+    hotel_columns = HotelColumns.from_options(hotels)
+
+    def hotel_vectorized():
+        return [hotels[i] for i in top_k_indices(hotel_columns.score(BUDGET, THEME, 2, 6), TOP_K)]
+
+    def hotel_vectorized_with_build():
+        columns = HotelColumns.from_options(hotels)
+        return [hotels[i] for i in top_k_indices(columns.score(BUDGET, THEME, 2, 6), TOP_K)]
+
+    results = [timed(fn) for fn in (hotel_sort, hotel_heap, hotel_vectorized, hotel_vectorized_with_build)]
+    assert all(r[1] == results[0][1] for r in results), "hotel rankings disagree"
+    report("Hotels", [
+        ("full sort", results[0][0]),
+        ("bounded heap", results[1][0]),
+        ("vectorized (columns prebuilt)", results[2][0]),
+        ("vectorized (incl. column build)", results[3][0]),
+    ])
+
+
+if __name__ == "__main__":
+    main()
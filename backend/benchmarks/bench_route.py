@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Route Optimizer Benchmark for Dora Travel API
+Times distance-matrix construction and route solving for 2 to 15 destinations
+
+Run from the backend directory: python benchmarks/bench_route.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from city_coordinates import CITY_COORDINATES  # noqa: E402
+from route_optimizer import (  # noqa: E402
+    EXACT_SOLVER_MAX_NODES,
+    _matrix_for_city_set,
+    distance_matrix,
+    optimize_route,
+    solve_tour,
+    tour_length,
+)
+
+ORIGIN = "New York, NY"
+TRIALS = 20
+CITIES = sorted({key for key, coords in CITY_COORDINATES.items() if key not in ("new york", "nyc", "new york city")})
+
+
+def main():
+    rng = random.Random(2024)
+    print(f"Route optimizer ({TRIALS} random trips per size, origin {ORIGIN}, exact up to {EXACT_SOLVER_MAX_NODES} nodes)")
+    print(f"{'cities':>6} {'solver':>7} {'matrix cold':>12} {'matrix hit':>11} {'solve':>10} {'typed km':>10} {'optimized km':>13} {'saved':>6}")
+
+    for n in range(2, 16):
+        cold = warm = solve = 0.0
+        typed_km = optimized_km = 0.0
+        for _ in range(TRIALS):
+            destinations = [city.title() for city in rng.sample(CITIES, n)]
+            keys = ["new york"] + [d.lower() for d in destinations]
+
+            _matrix_for_city_set.cache_clear()
+            start = time.perf_counter()
+            distances = distance_matrix(keys)
+            cold += time.perf_counter() - start
+
+            start = time.perf_counter()
+            distance_matrix(list(reversed(keys)))
+            warm += time.perf_counter() - start
+
+            start = time.perf_counter()
+            solve_tour(distances)
+            solve += time.perf_counter() - start
+
+            typed_km += tour_length(distances, list(range(n + 1)))
+            optimized_km += optimize_route(ORIGIN, destinations).distance_km
+
+        solver = "exact" if n + 1 <= EXACT_SOLVER_MAX_NODES else "2-opt"
+        print(
+            f"{n:>6} {solver:>7} {cold / TRIALS * 1e6:>9.1f} us {warm / TRIALS * 1e6:>8.1f} us "
+            f"{solve / TRIALS * 1e3:>7.2f} ms {typed_km / TRIALS:>10.0f} {optimized_km / TRIALS:>13.0f} "
+            f"{(1 - optimized_km / typed_km) * 100:>5.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
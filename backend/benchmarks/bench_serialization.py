@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Response Encoding Benchmark for Dora Travel API
+Compares JSON, MessagePack and CBOR for 3-, 14- and 90-day itineraries
+
+Reports encode time, decode time and payload size (raw and gzip) for each
+encoding of the same JSON-compatible itinerary, as served by the read and
+generate endpoints.
+
+Run from the backend directory: python benchmarks/bench_serialization.py [--repeats 200]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from serialization import CBOR, JSON, MSGPACK, SUPPORTED_MEDIA_TYPES, decode_content, encode_content  # noqa: E402
+
+TRIP_LENGTHS = (3, 14, 90)
+DESTINATIONS = ["Paris, France", "Rome, Italy", "Barcelona, Spain"]
+SLOTS = ["Morning", "Afternoon", "Evening", "Night"]
+
+
+def make_itinerary(days: int) -> dict:
+    """A TravelItinerary.model_dump(mode="json") shaped like generate_itinerary's output"""
+    start = date(2025, 6, 1)
+    end = start + timedelta(days=days - 1)
+    return {
+        "session_id": str(uuid.uuid4()),
+        "user": {"name": "Traveller", "budget": 2500.0, "currency": "USD", "theme": "Luxury", "party_size": 2},
+        "trip": {"origin": "New York, NY", "destination": ", ".join(DESTINATIONS), "destinations": DESTINATIONS,
+                 "start_date": start.isoformat(), "end_date": end.isoformat(), "duration_days": days,
+                 "route_optimized": True, "route_distance_km": 2431.7},
+        "flights": [{"airline": airline, "price": 800.0 + 75 * i, "deep_link": f"https://skyscanner.com/mock-link-{i}",
+                     "departure_time": "08:00", "arrival_time": "14:30", "duration": "6h 30m", "stops": i % 2}
+                    for i, airline in enumerate(["Delta Airlines", "Emirates", "Lufthansa"])],
+        "accommodations": [{"name": f"Grand Resort {i}", "price_per_night": 300.0 + 40 * i,
+                            "deep_link": f"https://booking.com/mock-link-{i}", "star_rating": 4 + i % 2,
+                            "amenities": ["Free WiFi", "Air Conditioning", "Room Service", "Spa", "Pool"],
+                            "image_url": "https://images.unsplash.com/photo-1566073771259-6a8506099945"}
+                           for i in range(3)],
+        "itinerary_days": [{
+            "day": d + 1,
+            "date": (start + timedelta(days=d)).isoformat(),
+            "summary": f"Day {d + 1} in {DESTINATIONS[d % len(DESTINATIONS)]}",
+            "activities": [{"type": "Sightseeing", "description": f"{slot} exploration of the old town",
+                            "time": slot, "details": f"Guided walk through {DESTINATIONS[d % len(DESTINATIONS)]} "
+                                                     f"with stops at local markets and viewpoints ({slot.lower()})"}
+                           for slot in SLOTS],
+        } for d in range(days)],
+        "destination_info": {"introduction": "Welcome to an unforgettable journey across Europe! " * 4,
+                             "packing_tips": [f"Packing tip number {i}" for i in range(8)],
+                             "cultural_notes": [f"Cultural note number {i}" for i in range(8)]},
+        "utility_links": {"visa_info": "https://dora-travel.com/visa-info", "currency_exchange": "https://wise.com/currency-converter",
+                          "sim_cards": "https://airalo.com/travel-sim", "transportation": "https://uber.com/cities"},
+    }
+
+
+def per_call_us(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    media_types = [m for m in (JSON, MSGPACK, CBOR) if m in SUPPORTED_MEDIA_TYPES]
+    missing = [m for m in (MSGPACK, CBOR) if m not in SUPPORTED_MEDIA_TYPES]
+    if missing:
+        print(f"Skipping {', '.join(missing)} (package not installed)\n")
+
+    print(f"{'days':>5}  {'encoding':<20} {'size':>10} {'gzip':>10} {'encode':>12} {'decode':>12}")
+    for days in TRIP_LENGTHS:
+        itinerary = make_itinerary(days)
+        json_size = None
+        for media_type in media_types:
+            body = encode_content(itinerary, media_type)
+            assert decode_content(body, media_type) == itinerary
+            encode_us = per_call_us(lambda: encode_content(itinerary, media_type), args.repeats)
+            decode_us = per_call_us(lambda: decode_content(body, media_type), args.repeats)
+            json_size = json_size or len(body)
+            print(f"{days:>5}  {media_type:<20} {len(body):>9,}B {len(gzip.compress(body, 6)):>9,}B "
+                  f"{encode_us:>10,.0f}us {decode_us:>10,.0f}us   ({len(body) / json_size:.0%} of JSON)")
+        print()
+
+
+if __name__ == "__main__":
+    main()
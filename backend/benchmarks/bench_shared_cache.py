@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Shared Cache Benchmark for Dora Travel API
+Compares per-worker ByteLRUCache instances with one shared-memory segment
+
+Each simulated uvicorn worker reads a random stream of itinerary sessions,
+filling its cache on a miss. Reports the misses (each one a MongoDB read in
+production), the cache memory held across all workers and the per-lookup
+latency of both tiers.
+
+Run from the backend directory: python benchmarks/bench_shared_cache.py [--workers 4] [--sessions 2000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cache import ByteLRUCache  # noqa: E402
+from shared_cache import SharedMemoryCache  # noqa: E402
+
+BODY_BYTES = 12 * 1024  # a week-long itinerary as brotli + identity JSON
+CACHE_BYTES = 64 * 1024 * 1024
+TTL_SECONDS = 300
+
+
+def body(session: int) -> bytes:
+    return session.to_bytes(4, "little") * (BODY_BYTES // 4)
+
+
+def run_worker(worker: int, args, path: str, results):
+    rng = random.Random(worker)
+    if path:
+        cache = SharedMemoryCache(path, CACHE_BYTES).namespace(1, TTL_SECONDS)
+    else:
+        cache = ByteLRUCache(CACHE_BYTES, TTL_SECONDS)
+    misses = 0
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        session_id = str(rng.randrange(args.sessions))
+        if cache.get(session_id) is None:
+            misses += 1
+            cache.set(session_id, body(int(session_id)))
+    elapsed = time.perf_counter() - started
+    held = 0 if path else cache.stats()["bytes"]
+    results.put((misses, held, elapsed / args.requests * 1e6))
+
+
+def run(args, path: str):
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=run_worker, args=(i, args, path, results)) for i in range(args.workers)]
+    for process in workers:
+        process.start()
+    collected = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    misses = sum(result[0] for result in collected)
+    held = sum(result[1] for result in collected)
+    if path:
+        held = sum(usage["bytes"] for usage in SharedMemoryCache(path, CACHE_BYTES).usage().values())
+    latency = sum(result[2] for result in collected) / len(collected)
+    return misses, held, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=20000, help="lookups per worker")
+    args = parser.parse_args()
+
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    path = os.path.join(directory, f"bench-shared-cache-{os.getpid()}")
+    segment = SharedMemoryCache(path, CACHE_BYTES)
+    segment.close()
+    try:
+        print(f"{args.workers} workers, {args.sessions} sessions, {args.requests} lookups per worker, {BODY_BYTES // 1024} KiB bodies")
+        print(f"{'tier':<12}{'misses':>10}{'cached MiB':>12}{'us/lookup':>12}")
+        for name, tier_path in (("per-worker", ""), ("shared", path)):
+            misses, held, latency = run(args, tier_path)
+            print(f"{name:<12}{misses:>10}{held / 2**20:>12.1f}{latency:>12.1f}")
+    finally:
+        if os.path.exists(segment.path):
+            os.remove(segment.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Storage Schema Benchmark for Dora Travel API
+Compares the legacy and compact itinerary document layouts
+
+Offline it reports document sizes, session index key sizes and mapping
+throughput. With MONGO_URL set it also loads both layouts into a scratch
+database and measures real index sizes and insert/lookup throughput.
+
+Run from the backend directory: python benchmarks/bench_storage_schema.py [--documents 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import bson
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storage_schema import StorageSchema  # noqa: E402
+
+THEMES = ["Family", "Business", "Luxury", "Adventure", "Budget", "Honeymoon"]
+CITIES = ["Paris, France", "Rome, Italy", "Tokyo, Japan", "London, UK", "Barcelona, Spain", "Bangkok, Thailand"]
+
+
+def make_document(rng: random.Random) -> dict:
+    """A legacy-layout temporary itinerary shaped like generate_itinerary's output"""
+    destinations = rng.sample(CITIES, rng.randint(1, 3))
+    days = rng.randint(3, 14)
+    theme = rng.choice(THEMES)
+    start = datetime(2025, 6, 1) + timedelta(days=rng.randint(0, 200))
+    activity = {"type": "Sightseeing", "description": "City center exploration", "time": "Morning", "details": f"Explore the best of {destinations[0]}"}
+    form = {
+        "user_name": "Traveller", "origin_city": "New York, NY", "destinations": destinations,
+        "start_date": f"{start:%Y-%m-%d}", "end_date": f"{start + timedelta(days=days - 1):%Y-%m-%d}",
+        "travel_theme": theme, "party_size": 2, "budget_per_person": 2500.0, "currency": "USD", "optimize_route": False,
+    }
+    return {
+        "session_id": str(uuid.uuid4()),
+        "user_email": None,
+        "user_id": None,
+        "form_data": form,
+        "generated_itinerary": {
+            "user": {"name": "Traveller", "budget": 2500.0, "currency": "USD", "theme": theme, "party_size": 2},
+            "trip": {"origin": "New York, NY", "destination": ", ".join(destinations), "destinations": destinations,
+                     "start_date": form["start_date"], "end_date": form["end_date"], "duration_days": days,
+                     "route_optimized": False, "route_distance_km": None},
+            "flights": [{"airline": "Delta Airlines", "price": 800.0, "deep_link": "https://skyscanner.com/mock-link-1",
+                         "departure_time": "08:00", "arrival_time": "14:30", "duration": "6h 30m", "stops": 0}] * 3,
+            "accommodations": [{"name": "Grand Resort", "price_per_night": 300.0, "deep_link": "https://booking.com/mock-link-1",
+                                "star_rating": 4, "amenities": ["Free WiFi", "Air Conditioning", "Room Service", "Spa"],
+                                "image_url": "https://images.unsplash.com/photo-1566073771259-6a8506099945"}] * 3,
+            "itinerary_days": [{"day": d + 1, "date": f"{start + timedelta(days=d):%Y-%m-%d}", "summary": f"Day {d + 1}",
+                                "activities": [activity] * 3} for d in range(days)],
+            "destination_info": {"introduction": "Welcome!", "packing_tips": ["Comfortable walking shoes"] * 5,
+                                 "cultural_notes": ["Learn a few basic local phrases"] * 5},
+            "utility_links": {"visa_info": "https://dora-travel.com/visa-info", "currency_exchange": "https://wise.com/currency-converter",
+                              "sim_cards": "https://airalo.com/travel-sim", "transportation": "https://uber.com/cities"},
+        },
+        "summary": {"trip_name": f"{theme} trip", "start_date": form["start_date"], "end_date": form["end_date"],
+                    "destinations": destinations, "theme": theme},
+        "created_at": datetime.utcnow(),
+        "expires_at": datetime.utcnow() + timedelta(days=7),
+        "status": "temporary",
+    }
+
+
+def offline(documents):
+    legacy, compact = StorageSchema(False), StorageSchema(True)
+    legacy_docs = [legacy.to_storage(d) for d in documents]
+    compact_docs = [compact.to_storage(d) for d in documents]
+
+    legacy_size = sum(len(bson.encode(d)) for d in legacy_docs) / len(documents)
+    compact_size = sum(len(bson.encode(d)) for d in compact_docs) / len(documents)
+    legacy_key = len(bson.encode({"": legacy_docs[0]["session_id"]})) - 5
+    compact_key = len(bson.encode({"": compact_docs[0]["session_id"]})) - 5
+
+    print(f"Offline ({len(documents):,} documents)")
+    print(f"  document size        legacy {legacy_size:8.0f} B   compact {compact_size:8.0f} B   ({1 - compact_size / legacy_size:.1%} smaller)")
+    print(f"  session_id key value legacy {legacy_key:8d} B   compact {compact_key:8d} B   ({1 - compact_key / legacy_key:.1%} smaller)")
+
+    start = time.perf_counter()
+    for d in documents:
+        compact.to_storage(d)
+    to_rate = len(documents) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for d in compact_docs:
+        compact.from_storage(d)
+    from_rate = len(documents) / (time.perf_counter() - start)
+    print(f"  mapping throughput   to_storage {to_rate:,.0f}/s   from_storage {from_rate:,.0f}/s")
+    return legacy_docs, compact_docs
+
+
+async def live(mongo_url: str, legacy_docs, compact_docs, lookups: int):
+    import motor.motor_asyncio
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(mongo_url)
+    database = client.dora_schema_bench
+    try:
+        print("\nLive MongoDB")
+        for name, docs in (("legacy", legacy_docs), ("compact", compact_docs)):
+            collection = database[name]
+            await collection.drop()
+            await collection.create_index("session_id", unique=True)
+
+            start = time.perf_counter()
+            for offset in range(0, len(docs), 1000):
+                await collection.insert_many([dict(d) for d in docs[offset:offset + 1000]], ordered=False)
+            insert_rate = len(docs) / (time.perf_counter() - start)
+
+            sample = random.Random(1).sample(docs, min(lookups, len(docs)))
+            schema = StorageSchema(name == "compact")
+            start = time.perf_counter()
+            for d in sample:
+                key = d["session_id"]
+                value = key if isinstance(key, str) else str(uuid.UUID(bytes=bytes(key)))
+                schema.from_storage(await collection.find_one({"session_id": schema.session_match(value)}))
+            lookup_rate = len(sample) / (time.perf_counter() - start)
+
+            stats = await database.command("collStats", name)
+            print(f"  {name:<8} data {stats['size'] / 2**20:7.1f} MB  storage {stats['storageSize'] / 2**20:7.1f} MB  "
+                  f"session_id index {stats['indexSizes']['session_id_1'] / 2**20:6.2f} MB  "
+                  f"inserts {insert_rate:8,.0f}/s  lookups {lookup_rate:6,.0f}/s")
+    finally:
+        await client.drop_database("dora_schema_bench")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=5_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    documents = [make_document(rng) for _ in range(args.documents)]
+    legacy_docs, compact_docs = offline(documents)
+
+    mongo_url = os.getenv("MONGO_URL")
+    if mongo_url:
+        asyncio.run(live(mongo_url, legacy_docs, compact_docs, args.lookups))
+    else:
+        print("\nSet MONGO_URL to measure real index sizes and throughput")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Size-bounded, TTL-aware LRU cache for serialized responses.
+
+Entries are charged by their byte size (plus a fixed per-entry overhead) and the
+least recently used entries are evicted once the memory cap is exceeded. Every
+entry carries its own expiry so cached itineraries never outlive the documents
+they were read from.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+# Rough bookkeeping cost of one entry (key, node, tuple) on top of its value
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+
+
+class ByteLRUCache:
+    """LRU cache with a memory cap in bytes and per-entry TTLs"""
+
+    def __init__(self, max_bytes: int, default_ttl: float, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > self._clock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Look up a live entry without touching LRU order or hit statistics"""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= self._clock():
+            return None
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: Optional[int] = None):
+        """Cache a value; `size` defaults to len(value), so bytes values need no hint"""
+        if not self.enabled:
+            return
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        if ttl <= 0:
+            self.invalidate(key)
+            return
+        charged = (len(value) if size is None else size) + ENTRY_OVERHEAD_BYTES
+        if charged > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, charged, self._clock() + ttl)
+        self._bytes += charged
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+            return True
+        return False
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        self._bytes -= self._entries.pop(key).size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
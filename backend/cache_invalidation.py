@@ -0,0 +1,212 @@
+"""Change-stream driven invalidation of in-process caches.
+
+Each API worker watches `temporary_itineraries` and `itineraries` through one
+database-level change stream and publishes an `Invalidation` for every write
+to its local subscribers (the itinerary body cache, ...). A worker therefore
+drops entries made stale by `prepare_auth` or a conversion handled by any
+other worker or pod.
+
+The stream resumes from the last seen resume token after network errors and
+replica-set failover, so no events are skipped. If the token has fallen out
+of the oplog (or is otherwise unusable), events may have been missed and every
+subscriber is told to flush everything. Tokens are only kept in memory: a
+restarted worker starts with empty caches and has nothing to catch up on.
+
+Change streams need a replica set (a single-node one is enough for local
+development; see change_stream_test.py).
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from storage_schema import session_id_str
+
+# Server error codes meaning the resume token can no longer be used
+CHANGE_STREAM_HISTORY_LOST = 286
+INVALID_RESUME_TOKEN = 260
+CHANGE_STREAM_FATAL_ERROR = 280
+UNUSABLE_TOKEN_CODES = (CHANGE_STREAM_HISTORY_LOST, INVALID_RESUME_TOKEN, CHANGE_STREAM_FATAL_ERROR)
+
+# Transient server errors (elections, shutdown, timeouts) that a resume survives
+RESUMABLE_CODES = (6, 7, 43, 63, 89, 91, 133, 150, 189, 234, 262, 9001, 10107, 11600, 11602, 13388, 13435, 13436)
+
+# Document fields subscribers key their caches on
+_PROJECTED_FIELDS = ("session_id", "original_session_id", "user_id")
+
+
+class Invalidation(NamedTuple):
+    collection: Optional[str]
+    operation: str  # insert / update / replace / delete, or "flush" for everything
+    document_id: Any = None
+    session_id: Any = None
+    original_session_id: Any = None
+    user_id: Optional[str] = None
+
+    @property
+    def flush_all(self) -> bool:
+        return self.operation == "flush"
+
+
+Subscriber = Callable[[Invalidation], None]
+
+
+def session_cache_subscriber(cache, temporary_collection: str = "temporary_itineraries") -> Subscriber:
+    """Subscriber dropping the entries of a cache keyed by session id made stale by a write"""
+    def invalidate(invalidation: Invalidation):
+        if invalidation.flush_all:
+            cache.clear()
+            return
+        # A freshly generated session cannot be stale anywhere (and its own worker just cached it)
+        if invalidation.collection == temporary_collection and invalidation.operation == "insert":
+            return
+        for session_key in (invalidation.session_id, invalidation.original_session_id):
+            if session_key is not None:
+                cache.invalidate(session_id_str(session_key))
+    return invalidate
+
+
+class ChangeStreamInvalidator:
+    """Watches collections and fans invalidations out to local caches"""
+
+    def __init__(
+        self,
+        database,
+        collections: List[str],
+        max_backoff_seconds: float = 30,
+        max_await_time_ms: int = 1000,
+    ):
+        self.database = database
+        self.collections = list(collections)
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_await_time_ms = max_await_time_ms
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self._subscribers: List[Subscriber] = []
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self.events = 0
+        self.resumes = 0
+        self.flushes = 0
+        self.errors = 0
+        self.last_event_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    def subscribe(self, subscriber: Subscriber):
+        self._subscribers.append(subscriber)
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        """Only writes to the watched collections, trimmed to the fields subscribers use"""
+        return [
+            {"$match": {
+                "ns.coll": {"$in": self.collections},
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]}
+            }},
+            {"$project": {
+                "operationType": 1,
+                "ns": 1,
+                "documentKey": 1,
+                "clusterTime": 1,
+                **{f"fullDocument.{field}": 1 for field in _PROJECTED_FIELDS}
+            }},
+        ]
+
+    def publish(self, invalidation: Invalidation):
+        for subscriber in self._subscribers:
+            try:
+                subscriber(invalidation)
+            except Exception as e:
+                print(f"Cache invalidation subscriber failed: {str(e)}")
+
+    def _handle(self, change: Dict[str, Any]):
+        document = change.get("fullDocument") or {}
+        self.publish(Invalidation(
+            collection=change["ns"]["coll"],
+            operation=change["operationType"],
+            document_id=change.get("documentKey", {}).get("_id"),
+            session_id=document.get("session_id"),
+            original_session_id=document.get("original_session_id"),
+            user_id=document.get("user_id"),
+        ))
+        self.events += 1
+        self.last_event_at = datetime.utcnow()
+
+    def _flush_all(self, reason: str):
+        print(f"Flushing local caches: {reason}")
+        self.flushes += 1
+        self.publish(Invalidation(collection=None, operation="flush"))
+
+    async def _watch_once(self):
+        """Open the stream (resuming if possible) and process events until it fails"""
+        options: Dict[str, Any] = {"full_document": "updateLookup", "max_await_time_ms": self.max_await_time_ms}
+        if self.resume_token is not None:
+            options["resume_after"] = self.resume_token
+        async with self.database.watch(self.pipeline(), **options) as stream:
+            self._ready.set()
+            while stream.alive:
+                change = await stream.try_next()
+                # Keep the token moving even when idle, so a resume never replays old history
+                self.resume_token = stream.resume_token
+                if change is not None:
+                    self._handle(change)
+
+    def _token_unusable(self, error: OperationFailure) -> bool:
+        if error.code in UNUSABLE_TOKEN_CODES:
+            return True
+        transient = error.has_error_label("ResumableChangeStreamError") or error.code in RESUMABLE_CODES
+        return self.resume_token is not None and not transient
+
+    async def run(self):
+        backoff = 0.5
+        while True:
+            try:
+                await self._watch_once()
+                backoff = 0.5
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                self.errors += 1
+                self.last_error = str(e)
+                if self._token_unusable(e):
+                    # Events between the token and now are gone: start over from the present
+                    self.resume_token = None
+                    self._flush_all(f"resume token unusable ({e.code})")
+                else:
+                    print(f"Change stream error, retrying in {backoff:.1f}s: {str(e)}")
+            except PyMongoError as e:
+                # Failover or network trouble beyond the driver's own automatic resume
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"Change stream interrupted, resuming in {backoff:.1f}s: {str(e)}")
+            self.resumes += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def wait_ready(self, timeout: float = 10):
+        """Wait until the stream is open (tests write only after this)"""
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._ready.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "events": self.events,
+            "resumes": self.resumes,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "last_event_at": self.last_event_at.isoformat() if self.last_event_at else None,
+            "last_error": self.last_error,
+        }
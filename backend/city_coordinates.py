@@ -0,0 +1,168 @@
+"""Bundled offline city-coordinate table used by the route optimizer.
+
+Keys are lower-case city names as typed before the first comma
+("Paris, France" -> "paris"). Values are (latitude, longitude) in degrees.
+"""
+from typing import Dict, Optional, Tuple
+
+CITY_COORDINATES: Dict[str, Tuple[float, float]] = {
+    # North America
+    "new york": (40.7128, -74.0060),
+    "new york city": (40.7128, -74.0060),
+    "nyc": (40.7128, -74.0060),
+    "los angeles": (34.0522, -118.2437),
+    "san francisco": (37.7749, -122.4194),
+    "chicago": (41.8781, -87.6298),
+    "boston": (42.3601, -71.0589),
+    "washington": (38.9072, -77.0369),
+    "washington dc": (38.9072, -77.0369),
+    "miami": (25.7617, -80.1918),
+    "orlando": (28.5383, -81.3792),
+    "seattle": (47.6062, -122.3321),
+    "las vegas": (36.1699, -115.1398),
+    "denver": (39.7392, -104.9903),
+    "austin": (30.2672, -97.7431),
+    "dallas": (32.7767, -96.7970),
+    "houston": (29.7604, -95.3698),
+    "atlanta": (33.7490, -84.3880),
+    "new orleans": (29.9511, -90.0715),
+    "philadelphia": (39.9526, -75.1652),
+    "san diego": (32.7157, -117.1611),
+    "portland": (45.5152, -122.6784),
+    "honolulu": (21.3069, -157.8583),
+    "anchorage": (61.2181, -149.9003),
+    "toronto": (43.6532, -79.3832),
+    "vancouver": (49.2827, -123.1207),
+    "montreal": (45.5017, -73.5673),
+    "quebec city": (46.8139, -71.2080),
+    "mexico city": (19.4326, -99.1332),
+    "cancun": (21.1619, -86.8515),
+    "havana": (23.1136, -82.3666),
+    "san juan": (18.4655, -66.1057),
+    # South America
+    "rio de janeiro": (-22.9068, -43.1729),
+    "sao paulo": (-23.5505, -46.6333),
+    "buenos aires": (-34.6037, -58.3816),
+    "lima": (-12.0464, -77.0428),
+    "cusco": (-13.5319, -71.9675),
+    "santiago": (-33.4489, -70.6693),
+    "bogota": (4.7110, -74.0721),
+    "cartagena": (10.3910, -75.4794),
+    "quito": (-0.1807, -78.4678),
+    # Europe
+    "london": (51.5074, -0.1278),
+    "edinburgh": (55.9533, -3.1883),
+    "dublin": (53.3498, -6.2603),
+    "paris": (48.8566, 2.3522),
+    "nice": (43.7102, 7.2620),
+    "lyon": (45.7640, 4.8357),
+    "marseille": (43.2965, 5.3698),
+    "amsterdam": (52.3676, 4.9041),
+    "brussels": (50.8503, 4.3517),
+    "bruges": (51.2093, 3.2247),
+    "berlin": (52.5200, 13.4050),
+    "munich": (48.1351, 11.5820),
+    "frankfurt": (50.1109, 8.6821),
+    "hamburg": (53.5511, 9.9937),
+    "vienna": (48.2082, 16.3738),
+    "salzburg": (47.8095, 13.0550),
+    "zurich": (47.3769, 8.5417),
+    "geneva": (46.2044, 6.1432),
+    "interlaken": (46.6863, 7.8632),
+    "rome": (41.9028, 12.4964),
+    "florence": (43.7696, 11.2558),
+    "venice": (45.4408, 12.3155),
+    "milan": (45.4642, 9.1900),
+    "naples": (40.8518, 14.2681),
+    "amalfi": (40.6340, 14.6027),
+    "madrid": (40.4168, -3.7038),
+    "barcelona": (41.3851, 2.1734),
+    "seville": (37.3891, -5.9845),
+    "granada": (37.1773, -3.5986),
+    "valencia": (39.4699, -0.3763),
+    "lisbon": (38.7223, -9.1393),
+    "porto": (41.1579, -8.6291),
+    "athens": (37.9838, 23.7275),
+    "santorini": (36.3932, 25.4615),
+    "mykonos": (37.4467, 25.3289),
+    "istanbul": (41.0082, 28.9784),
+    "prague": (50.0755, 14.4378),
+    "budapest": (47.4979, 19.0402),
+    "krakow": (50.0647, 19.9450),
+    "warsaw": (52.2297, 21.0122),
+    "copenhagen": (55.6761, 12.5683),
+    "stockholm": (59.3293, 18.0686),
+    "oslo": (59.9139, 10.7522),
+    "helsinki": (60.1699, 24.9384),
+    "reykjavik": (64.1466, -21.9426),
+    "dubrovnik": (42.6507, 18.0944),
+    "split": (43.5081, 16.4402),
+    "moscow": (55.7558, 37.6173),
+    "st petersburg": (59.9311, 30.3609),
+    # Africa & Middle East
+    "cairo": (30.0444, 31.2357),
+    "marrakech": (31.6295, -7.9811),
+    "casablanca": (33.5731, -7.5898),
+    "cape town": (-33.9249, 18.4241),
+    "johannesburg": (-26.2041, 28.0473),
+    "nairobi": (-1.2921, 36.8219),
+    "zanzibar": (-6.1659, 39.2026),
+    "dubai": (25.2048, 55.2708),
+    "abu dhabi": (24.4539, 54.3773),
+    "doha": (25.2854, 51.5310),
+    "tel aviv": (32.0853, 34.7818),
+    "jerusalem": (31.7683, 35.2137),
+    "amman": (31.9454, 35.9284),
+    # Asia
+    "tokyo": (35.6762, 139.6503),
+    "kyoto": (35.0116, 135.7681),
+    "osaka": (34.6937, 135.5023),
+    "hiroshima": (34.3853, 132.4553),
+    "sapporo": (43.0618, 141.3545),
+    "seoul": (37.5665, 126.9780),
+    "busan": (35.1796, 129.0756),
+    "beijing": (39.9042, 116.4074),
+    "shanghai": (31.2304, 121.4737),
+    "hong kong": (22.3193, 114.1694),
+    "taipei": (25.0330, 121.5654),
+    "singapore": (1.3521, 103.8198),
+    "bangkok": (13.7563, 100.5018),
+    "chiang mai": (18.7883, 98.9853),
+    "phuket": (7.8804, 98.3923),
+    "kuala lumpur": (3.1390, 101.6869),
+    "bali": (-8.3405, 115.0920),
+    "jakarta": (-6.2088, 106.8456),
+    "manila": (14.5995, 120.9842),
+    "hanoi": (21.0278, 105.8342),
+    "ho chi minh city": (10.8231, 106.6297),
+    "siem reap": (13.3671, 103.8448),
+    "delhi": (28.7041, 77.1025),
+    "new delhi": (28.6139, 77.2090),
+    "mumbai": (19.0760, 72.8777),
+    "jaipur": (26.9124, 75.7873),
+    "agra": (27.1767, 78.0081),
+    "goa": (15.2993, 74.1240),
+    "kathmandu": (27.7172, 85.3240),
+    "colombo": (6.9271, 79.8612),
+    "male": (4.1755, 73.5093),
+    # Oceania
+    "sydney": (-33.8688, 151.2093),
+    "melbourne": (-37.8136, 144.9631),
+    "brisbane": (-27.4698, 153.0251),
+    "cairns": (-16.9186, 145.7781),
+    "perth": (-31.9505, 115.8605),
+    "auckland": (-36.8485, 174.7633),
+    "queenstown": (-45.0312, 168.6626),
+    "fiji": (-17.7134, 178.0650),
+}
+
+
+def normalize_city(name: str) -> str:
+    """Normalize a user-typed destination ('Paris, France') to a table key ('paris')"""
+    city = name.split(",")[0].strip().lower()
+    return " ".join(city.replace(".", "").split())
+
+
+def lookup_city(name: str) -> Optional[Tuple[float, float]]:
+    """Return (latitude, longitude) for a destination, or None if it is not bundled"""
+    return CITY_COORDINATES.get(normalize_city(name))
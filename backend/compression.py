@@ -0,0 +1,166 @@
+"""Negotiated gzip/Brotli response compression.
+
+`CompressionMiddleware` compresses JSON responses on the fly for clients that
+accept it, above a size threshold, at a fast compression level. Endpoints that
+serve precompressed bodies set Content-Encoding themselves and are passed
+through untouched. Brotli is used when the Brotli package is installed.
+"""
+import gzip
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+IDENTITY = "identity"
+
+# Preference order when the client rates several encodings equally
+SUPPORTED_ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Levels for per-request compression (fast) and for bodies compressed once and stored (small)
+DYNAMIC_LEVELS = {"gzip": 6, "br": 4}
+STORED_LEVELS = {"gzip": 9, "br": 11}
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/cbor", "text/")
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Map each listed coding to its q-value"""
+    weights: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding] = quality
+    return weights
+
+
+def negotiate_encoding(header: Optional[str], available: Iterable[str] = SUPPORTED_ENCODINGS) -> str:
+    """Best content-coding the client accepts among `available`, else identity"""
+    weights = parse_accept_encoding(header)
+    best, best_quality = IDENTITY, 0.0
+    for coding in available:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, stored: bool = False) -> bytes:
+    levels = STORED_LEVELS if stored else DYNAMIC_LEVELS
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=levels["gzip"], mtime=0)
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("Brotli is not installed")
+        return brotli.compress(body, quality=levels["br"])
+    raise ValueError(f"Unsupported content-coding: {encoding}")
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("Brotli is not installed")
+        return brotli.decompress(body)
+    raise ValueError(f"Unsupported content-coding: {encoding}")
+
+
+def precompress(body: bytes, encodings: Iterable[str]) -> Dict[str, bytes]:
+    """Compress a body once, at maximum ratio, for every stored encoding"""
+    return {encoding: compress(body, encoding, stored=True) for encoding in encodings if encoding in SUPPORTED_ENCODINGS}
+
+
+def variant_etag(etag: Optional[str], encoding: str) -> Optional[str]:
+    """Strong validators must differ per content-coding: "abc" -> "abc-br" """
+    if not etag or encoding == IDENTITY:
+        return etag
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def etag_variants(etag: str) -> List[str]:
+    return [etag] + [variant_etag(etag, encoding) for encoding in SUPPORTED_ENCODINGS]
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def add_vary_accept_encoding(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if b"accept-encoding" in vary.lower() or vary.strip() == b"*":
+        return headers
+    return [(k, v + b", Accept-Encoding" if k.lower() == b"vary" else v) for k, v in headers]
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing buffered JSON responses above `minimum_size` bytes"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = _header(scope.get("headers", []), b"accept-encoding")
+        encoding = negotiate_encoding(accept.decode("latin-1") if accept else None)
+        if encoding == IDENTITY:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def buffered_send(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if _header(headers, b"content-encoding") or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = [(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"]
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers = [
+                    (k, variant_etag(v.decode("latin-1"), encoding).encode("latin-1") if k.lower() == b"etag" else v)
+                    for k, v in headers
+                ]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            headers = add_vary_accept_encoding(headers)
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffered_send)
@@ -0,0 +1,28 @@
+"""HTTP validators and conditional-request helpers.
+
+Itinerary bodies are immutable once generated, so each gets a strong ETag
+computed from its serialized bytes at write time and stored with the document.
+"""
+import hashlib
+from typing import Optional
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong entity tag for a serialized response body"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """If-None-Match evaluation (RFC 9110 weak comparison, as required for this header)"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
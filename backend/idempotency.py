@@ -0,0 +1,187 @@
+"""Idempotency keys for non-idempotent POST endpoints.
+
+A request carrying an `Idempotency-Key` header first claims the key in a TTL
+collection (`_id` is the key, so the claim is a single unique insert). The
+claimant does the work and records the result, optionally with the response
+body; a repeat with the same key and request body gets the recorded result
+instead of doing the work again, and a repeat with a different body is
+rejected. Duplicates that arrive while the
+first request is still running wait for it: in-process through a shared
+future, across workers by polling the claim. Claims carry a lease, so a
+worker that dies mid-request does not block the key until it expires.
+
+Completed keys are also kept in an in-process cache so hot retries skip
+MongoDB entirely.
+"""
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, NamedTuple, Optional
+
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+from cache import ByteLRUCache
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# Bookkeeping size charged per cached key on top of the key and result
+CACHED_RESULT_BYTES = 64
+
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used with a different request body"""
+
+
+class IdempotencyKeyInProgress(Exception):
+    """The original request is still running and did not finish within the wait timeout"""
+
+
+class IdempotentResult(NamedTuple):
+    fingerprint: str
+    result: str
+    # The original response body, so a replay does not depend on the result still existing
+    response: Optional[bytes] = None
+
+
+def request_fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class IdempotencyStore:
+    """Claims, completes and replays idempotency keys"""
+
+    def __init__(
+        self,
+        collection,
+        ttl_seconds: float = 24 * 3600,
+        lease_seconds: float = 120,
+        wait_seconds: float = 60,
+        poll_seconds: float = 0.25,
+        cache_max_bytes: int = 1024 * 1024,
+    ):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._completed = ByteLRUCache(cache_max_bytes, ttl_seconds)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.replays = 0
+        self.waits = 0
+        self.takeovers = 0
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[IdempotentResult]:
+        """Recorded result for a repeat request, or None when this caller now owns the key"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while True:
+            cached = self._completed.get(key)
+            if cached is not None:
+                return self._replay(key, cached, fingerprint)
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                # A duplicate inside this worker: wait for the original to finish
+                self.waits += 1
+                try:
+                    await asyncio.wait_for(asyncio.shield(inflight), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    raise IdempotencyKeyInProgress(key)
+                continue
+
+            future = loop.create_future()
+            self._inflight[key] = future
+            try:
+                record = await self._claim(key, fingerprint)
+            except BaseException:
+                self._release(key, future)
+                raise
+            if record is None:
+                return None
+            self._release(key, future)
+
+            if record.get("fingerprint") != fingerprint:
+                raise IdempotencyKeyMismatch(key)
+            if record.get("status") == COMPLETED:
+                result = IdempotentResult(record["fingerprint"], record["result"], record.get("response"))
+                self._remember(key, result)
+                return self._replay(key, result, fingerprint)
+
+            # Another worker owns the key: poll until it records a result or its lease lapses
+            if loop.time() >= deadline:
+                raise IdempotencyKeyInProgress(key)
+            self.waits += 1
+            await asyncio.sleep(self.poll_seconds)
+
+    async def complete(self, key: str, fingerprint: str, result: str, response: Optional[bytes] = None):
+        """Record the result (and optionally the response body) of the request that owns the key"""
+        completed: Dict[str, Any] = {"status": COMPLETED, "result": result, "completed_at": datetime.utcnow()}
+        if response is not None:
+            completed["response"] = Binary(response)
+        await self.collection.update_one({"_id": key}, {"$set": completed, "$unset": {"locked_until": ""}})
+        self._remember(key, IdempotentResult(fingerprint, result, response))
+        self._release(key, self._inflight.get(key))
+
+    async def abandon(self, key: str):
+        """Free a key whose request failed so a retry can run it again"""
+        try:
+            await self.collection.delete_one({"_id": key, "status": IN_PROGRESS})
+        finally:
+            self._release(key, self._inflight.get(key))
+
+    async def _claim(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """None when the key was claimed, else the existing record"""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "_id": key,
+                "fingerprint": fingerprint,
+                "status": IN_PROGRESS,
+                "locked_until": now + timedelta(seconds=self.lease_seconds),
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl_seconds)
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        # Take over a claim whose lease lapsed (the owner crashed mid-request)
+        taken = await self.collection.find_one_and_update(
+            {"_id": key, "status": IN_PROGRESS, "fingerprint": fingerprint, "locked_until": {"$lt": now}},
+            {"$set": {"locked_until": now + timedelta(seconds=self.lease_seconds)}},
+            projection={"_id": 1}
+        )
+        if taken is not None:
+            self.takeovers += 1
+            return None
+
+        record = await self.collection.find_one({"_id": key})
+        # Deleted between the insert and the read (abandoned or expired): claim it again
+        return record if record is not None else await self._claim(key, fingerprint)
+
+    def _replay(self, key: str, cached: IdempotentResult, fingerprint: str) -> IdempotentResult:
+        if cached.fingerprint != fingerprint:
+            raise IdempotencyKeyMismatch(key)
+        self.replays += 1
+        return cached
+
+    def _remember(self, key: str, result: IdempotentResult):
+        size = len(key) + len(result.result) + len(result.response or b"") + CACHED_RESULT_BYTES
+        self._completed.set(key, result, size=size)
+
+    def _release(self, key: str, future: Optional[asyncio.Future]):
+        if future is not None and self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._inflight),
+            "replays": self.replays,
+            "waits": self.waits,
+            "takeovers": self.takeovers,
+            "cache": self._completed.stats(),
+        }
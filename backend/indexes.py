@@ -0,0 +1,347 @@
+"""Declarative MongoDB index registry.
+
+Every index the API relies on is declared once in INDEX_REGISTRY. Each worker
+creates missing indexes at startup (idempotent, so concurrent workers are
+safe) and reports drifted and unmanaged ones. Rebuilding drifted indexes (drop
+and recreate, or collMod for TTL changes) runs from one process only, as a
+deploy step:
+
+    python indexes.py [--diagnose]
+
+from the backend directory. A diagnostic mode runs explain() on each hot query
+and fails if any of them falls back to a collection scan.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+# Index options that change the index's behaviour and must match exactly
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression", "weights")
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, Any]]  # direction 1 / -1, or "text" (text index specs list their weights too)
+    options: Dict[str, Any]
+
+    @property
+    def name(self) -> str:
+        return self.options["name"]
+
+
+class HotQuery(NamedTuple):
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+class IndexDiagnosticsError(RuntimeError):
+    """Raised when a hot query is answered with a collection scan"""
+
+
+INDEX_REGISTRY: List[IndexSpec] = [
+    # Auto-cleanup of anonymous itineraries
+    IndexSpec("temporary_itineraries", [("expires_at", 1)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    # get_itinerary_by_session, prepare_auth, convert_itinerary
+    IndexSpec("temporary_itineraries", [("session_id", 1)], {"name": "session_id_unique", "unique": True}),
+    # If-None-Match revalidation answered from the index alone (covered query)
+    IndexSpec("temporary_itineraries", [("session_id", 1), ("status", 1), ("etag", 1)], {"name": "session_id_etag"}),
+    # /api/my-itineraries in single-collection storage mode
+    IndexSpec(
+        "temporary_itineraries",
+        [("user_id", 1), ("created_at", -1), ("_id", -1)],
+        {"name": "permanent_user_id_created_at", "partialFilterExpression": {"status": "permanent"}},
+    ),
+    # Archival job in single-collection storage mode (itinerary_archive.py)
+    IndexSpec(
+        "temporary_itineraries",
+        [("summary.end_date", 1)],
+        {"name": "permanent_summary_end_date", "partialFilterExpression": {"status": "permanent"}},
+    ),
+    # /api/my-itineraries/search in single-collection storage mode (see the itineraries indexes below)
+    IndexSpec(
+        "temporary_itineraries",
+        [("user_id", 1), ("summary.destinations", "text")],
+        {
+            "name": "permanent_user_id_destinations_text",
+            "weights": {"summary.destinations": 1},
+            "partialFilterExpression": {"status": "permanent"},
+        },
+    ),
+    IndexSpec(
+        "temporary_itineraries",
+        [("user_id", 1), ("summary.theme", 1), ("summary.start_date", 1)],
+        {"name": "permanent_user_id_theme_start_date", "partialFilterExpression": {"status": "permanent"}},
+    ),
+    IndexSpec(
+        "temporary_itineraries",
+        [("user_id", 1), ("summary.start_date", 1)],
+        {"name": "permanent_user_id_start_date", "partialFilterExpression": {"status": "permanent"}},
+    ),
+    IndexSpec(
+        "temporary_itineraries",
+        [("user_id", 1), ("summary.budget_per_person", 1)],
+        {"name": "permanent_user_id_budget", "partialFilterExpression": {"status": "permanent"}},
+    ),
+    # Idempotency-Key records for POST /api/generate-itinerary expire on their own
+    IndexSpec("idempotency_keys", [("expires_at", 1)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    # /api/my-itineraries, newest first with _id as the keyset tie-breaker
+    IndexSpec("itineraries", [("user_id", 1), ("created_at", -1), ("_id", -1)], {"name": "user_id_created_at"}),
+    # Archival job: trips that ended before the cut-off
+    IndexSpec("itineraries", [("summary.end_date", 1)], {"name": "summary_end_date"}),
+    # /api/my-itineraries/search: destination text, scoped to one user by the equality prefix
+    IndexSpec(
+        "itineraries",
+        [("user_id", 1), ("summary.destinations", "text")],
+        {"name": "user_id_destinations_text", "weights": {"summary.destinations": 1}},
+    ),
+    # /api/my-itineraries/search: theme with an optional start date range, date ranges (upcoming), budget ranges
+    IndexSpec("itineraries", [("user_id", 1), ("summary.theme", 1), ("summary.start_date", 1)], {"name": "user_id_theme_start_date"}),
+    IndexSpec("itineraries", [("user_id", 1), ("summary.start_date", 1)], {"name": "user_id_start_date"}),
+    IndexSpec("itineraries", [("user_id", 1), ("summary.budget_per_person", 1)], {"name": "user_id_budget"}),
+    # One permanent copy per anonymous session
+    IndexSpec(
+        "itineraries",
+        [("original_session_id", 1)],
+        {
+            "name": "original_session_id_unique",
+            "unique": True,
+            # Covers string and binary UUID session keys (see storage_schema)
+            "partialFilterExpression": {"original_session_id": {"$exists": True}},
+        },
+    ),
+    # Hourly analytics counters: one per (dimension, hour, value), upserted by every worker
+    IndexSpec(
+        "analytics_hourly",
+        [("dimension", 1), ("hour", 1), ("value", 1)],
+        {"name": "dimension_hour_value_unique", "unique": True},
+    ),
+    # Raw analytics events are kept for 90 days; dashboards read analytics_hourly
+    IndexSpec("analytics_events", [("at", 1)], {"name": "at_ttl", "expireAfterSeconds": 90 * 24 * 3600}),
+    # Archived itineraries merged into /api/my-itineraries (keys read from the index alone)
+    IndexSpec("itineraries_archive", [("user_id", 1), ("created_at", -1), ("_id", -1)], {"name": "user_id_created_at"}),
+]
+
+# Representative shapes of every query on a request path
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery("get_itinerary_by_session", "temporary_itineraries", {"session_id": "diagnostic-session"}),
+    HotQuery("prepare_auth", "temporary_itineraries", {"session_id": "diagnostic-session"}),
+    HotQuery("convert_itinerary", "temporary_itineraries", {"session_id": "diagnostic-session"}),
+    HotQuery("convert_itinerary_duplicate_check", "itineraries", {"original_session_id": "diagnostic-session"}),
+    HotQuery("get_user_itineraries", "itineraries", {"user_id": "diagnostic-user"}, [("created_at", -1), ("_id", -1)]),
+    HotQuery("get_user_itinerary", "itineraries", {"_id": "diagnostic-id", "user_id": "diagnostic-user"}),
+    HotQuery(
+        "search_user_itineraries_text",
+        "itineraries",
+        {"user_id": "diagnostic-user", "$text": {"$search": "diagnostic"}},
+        [("created_at", -1), ("_id", -1)],
+    ),
+    HotQuery(
+        "search_user_itineraries_theme",
+        "itineraries",
+        {"user_id": "diagnostic-user", "summary.theme": "diagnostic", "summary.start_date": {"$gte": "2000-01-01"}},
+        [("created_at", -1), ("_id", -1)],
+    ),
+    HotQuery(
+        "search_user_itineraries_upcoming",
+        "itineraries",
+        {"user_id": "diagnostic-user", "summary.start_date": {"$gte": "2000-01-01"}},
+        [("created_at", -1), ("_id", -1)],
+    ),
+    HotQuery(
+        "search_user_itineraries_budget",
+        "itineraries",
+        {"user_id": "diagnostic-user", "summary.budget_per_person": {"$gte": 0, "$lte": 1000}},
+        [("created_at", -1), ("_id", -1)],
+    ),
+    HotQuery("get_user_trip_summary", "users", {"_id": "diagnostic-user"}),
+    HotQuery(
+        "get_user_trip_summary_next_trip",
+        "itineraries",
+        {"user_id": "diagnostic-user", "summary.start_date": {"$gte": "2000-01-01"}},
+        [("summary.start_date", 1)],
+    ),
+    HotQuery(
+        "get_user_itineraries_archive",
+        "itineraries_archive",
+        {"user_id": "diagnostic-user"},
+        [("created_at", -1), ("_id", -1)],
+    ),
+    HotQuery(
+        "analytics_rollup_upsert",
+        "analytics_hourly",
+        {"dimension": "event", "hour": "diagnostic-hour", "value": "diagnostic-event"},
+    ),
+    HotQuery(
+        "get_user_itineraries_single_mode",
+        "temporary_itineraries",
+        {"user_id": "diagnostic-user", "status": "permanent"},
+        [("created_at", -1), ("_id", -1)],
+    ),
+]
+
+
+def _options_of(index_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {option: index_info[option] for option in COMPARED_OPTIONS if option in index_info}
+
+
+def _wanted_options(spec: IndexSpec) -> Dict[str, Any]:
+    return {option: spec.options[option] for option in COMPARED_OPTIONS if option in spec.options}
+
+
+async def reconcile_indexes(
+    database, registry: List[IndexSpec] = INDEX_REGISTRY, drop_unmanaged: bool = False, rebuild: bool = True
+) -> Dict[str, List[str]]:
+    """Bring the database's indexes in line with the registry.
+
+    Returns the names of indexes created, rebuilt, left unchanged, drifted (not
+    rebuilt because `rebuild` is off) and found unmanaged. Failures (e.g.
+    duplicate values blocking a unique index) are reported and do not stop the
+    remaining specs from being applied.
+    """
+    report: Dict[str, List[str]] = {"created": [], "rebuilt": [], "unchanged": [], "drifted": [], "unmanaged": [], "failed": []}
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in registry:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    for collection_name, specs in by_collection.items():
+        collection = database[collection_name]
+        existing = {name: info async for name, info in _iterate_indexes(collection)}
+        managed = set()
+
+        for spec in specs:
+            match = next((info for info in existing.values() if _key_pattern(info) == spec.keys), None)
+            try:
+                if match is None:
+                    # A redefined index keeps its name; drop the old key pattern first
+                    if spec.name in existing:
+                        if not rebuild:
+                            report["drifted"].append(spec.name)
+                            managed.add(spec.name)
+                            continue
+                        await collection.drop_index(spec.name)
+                    await collection.create_index(spec.keys, **spec.options)
+                    report["created"].append(spec.name)
+                    managed.add(spec.name)
+                    continue
+
+                managed.add(match["name"])
+                have, want = _options_of(match), _wanted_options(spec)
+                if have == want:
+                    report["unchanged"].append(match["name"])
+                elif not rebuild:
+                    report["drifted"].append(match["name"])
+                elif _only_ttl_differs(have, want):
+                    await database.command(
+                        "collMod",
+                        collection_name,
+                        index={"keyPattern": dict(spec.keys), "expireAfterSeconds": want["expireAfterSeconds"]},
+                    )
+                    report["rebuilt"].append(match["name"])
+                else:
+                    await collection.drop_index(match["name"])
+                    await collection.create_index(spec.keys, **spec.options)
+                    managed.add(spec.name)
+                    report["rebuilt"].append(spec.name)
+            except OperationFailure as e:
+                print(f"Index reconciliation warning ({collection_name}.{spec.name}): {e}")
+                report["failed"].append(spec.name)
+
+        for name in existing:
+            if name == "_id_" or name in managed:
+                continue
+            if drop_unmanaged:
+                await collection.drop_index(name)
+            report["unmanaged"].append(f"{collection_name}.{name}")
+
+    return report
+
+
+async def _iterate_indexes(collection):
+    async for info in collection.list_indexes():
+        yield info["name"], info
+
+
+def _key_pattern(index_info: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Index key as (field, direction) pairs; the server may report directions as floats.
+
+    Text indexes are reported as `_fts`/`_ftsx` placeholders; they are expanded
+    back into the indexed fields (from the weights, in name order).
+    """
+    pattern: List[Tuple[str, Any]] = []
+    for field, direction in index_info["key"].items():
+        if field == "_fts":
+            pattern.extend((name, "text") for name in sorted(index_info.get("weights", {})))
+        elif field != "_ftsx":
+            pattern.append((field, int(direction) if isinstance(direction, float) else direction))
+    return pattern
+
+
+def _only_ttl_differs(have: Dict[str, Any], want: Dict[str, Any]) -> bool:
+    if "expireAfterSeconds" not in have or "expireAfterSeconds" not in want:
+        return False
+    strip = lambda options: {k: v for k, v in options.items() if k != "expireAfterSeconds"}  # noqa: E731
+    return strip(have) == strip(want)
+
+
+def _plan_stages(plan: Dict[str, Any]):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def winning_plan_stages(explain: Dict[str, Any]) -> List[str]:
+    planner = explain.get("queryPlanner", {})
+    return list(_plan_stages(planner.get("winningPlan", {})))
+
+
+async def run_index_diagnostics(database, hot_queries: List[HotQuery] = HOT_QUERIES) -> Dict[str, List[str]]:
+    """explain() every hot query; raise IndexDiagnosticsError if any uses COLLSCAN"""
+    plans: Dict[str, List[str]] = {}
+    for query in hot_queries:
+        cursor = database[query.collection].find(query.filter)
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+        plans[query.name] = winning_plan_stages(await cursor.explain())
+
+    scans = [name for name, stages in plans.items() if "COLLSCAN" in stages]
+    if scans:
+        raise IndexDiagnosticsError(f"Hot queries using COLLSCAN: {', '.join(scans)}")
+    return plans
+
+
+if __name__ == "__main__":
+    import asyncio
+    import os
+    import sys
+
+    import motor.motor_asyncio
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    async def main() -> int:
+        database = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URL")).dora_travel
+        report = await reconcile_indexes(database)
+        print(report)
+        if report["failed"]:
+            print(f"❌ Index reconciliation failed: {', '.join(report['failed'])}")
+            return 1
+        if "--diagnose" in sys.argv:
+            try:
+                for name, stages in (await run_index_diagnostics(database)).items():
+                    print(f"✅ {name}: {' <- '.join(stages)}")
+            except IndexDiagnosticsError as e:
+                print(f"❌ {e}")
+                return 1
+        return 0
+
+    sys.exit(asyncio.run(main()))
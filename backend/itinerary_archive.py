@@ -0,0 +1,230 @@
+"""Cold archive for permanent itineraries of trips that ended long ago.
+
+Old trips are rarely opened again but keep occupying the hot collection's
+cache and indexes. The archival job moves permanent itineraries whose
+`summary.end_date` is older than a cut-off into `itineraries_archive`:
+
+    {"_id": <same ObjectId>, "user_id": ..., "created_at": ..., "summary": {...},
+     "archived_at": ..., "source": "itineraries",
+     "archive": {"v": 1, "codec": "zstd", "data": Binary(<stored document as BSON>)}}
+
+Only what the listing needs stays uncompressed. The stored document (compact
+or legacy layout) is compressed as a whole and restored byte-for-byte on read.
+Each batch is upserted into the archive before it is deleted from the hot
+collection, so an interrupted run loses nothing and is resumed by running it
+again. Readers tolerate the brief overlap by preferring the hot copy.
+
+Usage (from the backend directory, with MONGO_URL set):
+    python itinerary_archive.py report [--older-than-days 365]
+    python itinerary_archive.py run    [--older-than-days 365] [--batch 200] [--legacy]
+
+`--legacy` also archives itineraries converted before summaries were stored,
+matching on `form_data.end_date` (a full scan; run it once, off-peak).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import bson
+from bson import Binary, ObjectId
+from pymongo import ReplaceOne
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback
+    zstandard = None
+
+ARCHIVE_VERSION = 1
+ARCHIVE_COLLECTION = "itineraries_archive"
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+DEFAULT_BATCH_SIZE = 200
+
+# Cold data is written once and read rarely: favour ratio over speed
+ZSTD_LEVEL = 19
+ZLIB_LEVEL = 9
+
+PERMANENT_STATUS = "permanent"
+
+
+class ArchiveError(ValueError):
+    """Raised for archived documents this process cannot decode"""
+
+
+def archive_cutoff(older_than_days: int, now: Optional[datetime] = None) -> str:
+    """Trips ending before this date (YYYY-MM-DD, as stored in summaries) are archived"""
+    return ((now or datetime.utcnow()) - timedelta(days=older_than_days)).strftime("%Y-%m-%d")
+
+
+def ended_before(cutoff: str, legacy: bool = False) -> Dict[str, Any]:
+    """Filter for itineraries whose trip ended before the cut-off"""
+    if not legacy:
+        return {"summary.end_date": {"$lt": cutoff}}
+    return {"summary": {"$exists": False}, "form_data.end_date": {"$lt": cutoff}}
+
+
+def compress_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    data = bson.encode(document)
+    if zstandard is not None:
+        return {"v": ARCHIVE_VERSION, "codec": "zstd", "data": Binary(zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data))}
+    return {"v": ARCHIVE_VERSION, "codec": "zlib", "data": Binary(zlib.compress(data, ZLIB_LEVEL))}
+
+
+def decompress_document(archive: Dict[str, Any]) -> Dict[str, Any]:
+    codec, data = archive.get("codec"), bytes(archive["data"])
+    if codec == "zstd":
+        if zstandard is None:
+            raise ArchiveError("Archived itinerary needs zstandard, which is not installed")
+        return bson.decode(zstandard.ZstdDecompressor().decompress(data))
+    if codec == "zlib":
+        return bson.decode(zlib.decompress(data))
+    raise ArchiveError(f"Unknown archive codec: {codec}")
+
+
+def archive_record(document: Dict[str, Any], source: str, archived_at: datetime) -> Dict[str, Any]:
+    record = {
+        "_id": document["_id"],
+        "user_id": document.get("user_id"),
+        "created_at": document.get("created_at"),
+        "archived_at": archived_at,
+        "source": source,
+        "archive": compress_document(document),
+    }
+    # Listings show the summary; documents predating it keep their (small) form data instead
+    if document.get("summary") is not None:
+        record["summary"] = document["summary"]
+    else:
+        record["form_data"] = document.get("form_data")
+    return record
+
+
+class ItineraryArchive:
+    """Moves old itineraries into the cold collection and reads them back"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.reads = 0
+        self.listing_reads = 0
+
+    # Archival
+
+    async def archive_batch(self, source, match: Dict[str, Any], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """Archive up to `batch_size` matching documents; returns how many were moved"""
+        documents = await source.find(match).limit(batch_size).to_list(length=batch_size)
+        if not documents:
+            return 0
+        archived_at = datetime.utcnow()
+        await self.collection.bulk_write([
+            ReplaceOne({"_id": document["_id"]}, archive_record(document, source.name, archived_at), upsert=True)
+            for document in documents
+        ], ordered=False)
+        # Only after the cold copies are durable; `match` guards against documents that changed meanwhile
+        result = await source.delete_many({"_id": {"$in": [document["_id"] for document in documents]}, **match})
+        return result.deleted_count
+
+    async def run(self, source, match: Dict[str, Any], batch_size: int = DEFAULT_BATCH_SIZE, pause_seconds: float = 0.0) -> int:
+        """Archive every matching document in batches (pausing between them to limit load)"""
+        moved = 0
+        while True:
+            count = await self.archive_batch(source, match, batch_size)
+            if not count:
+                return moved
+            moved += count
+            print(f"  {source.name}: {moved:,} archived")
+            if pause_seconds:
+                await asyncio.sleep(pause_seconds)
+
+    # Reads
+
+    async def find(self, itinerary_id: ObjectId, user_id: str) -> Optional[Dict[str, Any]]:
+        """An archived itinerary in its stored (hot collection) form"""
+        record = await self.collection.find_one({"_id": itinerary_id, "user_id": user_id}, {"archive": 1})
+        if record is None:
+            return None
+        self.reads += 1
+        return decompress_document(record["archive"])
+
+    async def page_keys(
+        self, user_id: str, keyset: Dict[str, Any], limit: int, match: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[datetime, ObjectId]]:
+        """(created_at, _id) of a user's newest archived itineraries after the keyset.
+
+        Read from the index alone unless `match` adds conditions on other fields.
+        """
+        cursor = self.collection.find(
+            {"user_id": user_id, **keyset, **(match or {})}, {"_id": 1, "created_at": 1}
+        ).sort([("created_at", -1), ("_id", -1)]).limit(limit)
+        return [(record["created_at"], record["_id"]) async for record in cursor]
+
+    async def listing_documents(self, itinerary_ids: List[ObjectId]) -> Dict[ObjectId, Dict[str, Any]]:
+        """Listing fields of archived itineraries, shaped like the hot listing projection"""
+        if not itinerary_ids:
+            return {}
+        self.listing_reads += len(itinerary_ids)
+        cursor = self.collection.find({"_id": {"$in": itinerary_ids}}, {"created_at": 1, "summary": 1, "form_data": 1})
+        return {record["_id"]: {**record, "_id": str(record["_id"])} async for record in cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"reads": self.reads, "listing_reads": self.listing_reads}
+
+
+def hot_collection(database) -> Tuple[Any, Dict[str, Any]]:
+    """Where permanent itineraries live for the configured ITINERARY_STORAGE_MODE"""
+    if os.getenv("ITINERARY_STORAGE_MODE", "split") == "single":
+        return database.temporary_itineraries, {"status": PERMANENT_STATUS}
+    return database.itineraries, {}
+
+
+async def report(database, args) -> int:
+    source, owned = hot_collection(database)
+    cutoff = archive_cutoff(args.older_than_days)
+    hot = await source.count_documents(owned)
+    eligible = await source.count_documents({**owned, **ended_before(cutoff)})
+    legacy = await source.count_documents({**owned, **ended_before(cutoff, legacy=True)})
+    archived = await database[ARCHIVE_COLLECTION].estimated_document_count()
+    print(f"Trips ending before {cutoff}:")
+    print(f"  {source.name}: {hot:,} permanent itineraries, {eligible:,} eligible, {legacy:,} more without summaries (--legacy)")
+    print(f"  {ARCHIVE_COLLECTION}: {archived:,} archived")
+    return 0
+
+
+async def run(database, args) -> int:
+    source, owned = hot_collection(database)
+    cutoff = archive_cutoff(args.older_than_days)
+    archive = ItineraryArchive(database[ARCHIVE_COLLECTION])
+    started = time.perf_counter()
+    moved = await archive.run(source, {**owned, **ended_before(cutoff)}, args.batch, args.pause)
+    if args.legacy:
+        moved += await archive.run(source, {**owned, **ended_before(cutoff, legacy=True)}, args.batch, args.pause)
+    print(f"✅ Archived {moved:,} itineraries ending before {cutoff} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def main():
+    import motor.motor_asyncio
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Archive permanent itineraries of long-finished trips")
+    parser.add_argument("command", choices=("report", "run"))
+    parser.add_argument(
+        "--older-than-days", type=int,
+        default=int(os.getenv("ITINERARY_ARCHIVE_AFTER_DAYS", str(DEFAULT_ARCHIVE_AFTER_DAYS)))
+    )
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between batches")
+    parser.add_argument("--legacy", action="store_true", help="also archive itineraries without a stored summary")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URL")).dora_travel
+    if args.command == "report":
+        return asyncio.run(report(database, args))
+    return asyncio.run(run(database, args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
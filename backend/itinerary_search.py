@@ -0,0 +1,164 @@
+"""Server-side search over a user's saved itineraries.
+
+Searches read only the denormalized `summary` stored next to each itinerary
+(`destinations`, `theme`, `start_date`, `end_date`, `budget_per_person`), never
+the generated payload:
+
+* `q` matches destinations through the `user_id` + `summary.destinations`
+  text index (words are OR-ed and stemmed, as with any MongoDB text search);
+* `theme`, `when` (upcoming / past), the `from`/`to` date range and the
+  budget range are plain conditions served by the compound summary indexes.
+
+Results use the same keyset order and cursors as `/api/my-itineraries`.
+Archived itineraries have no text index; there the words are matched as
+case-insensitive substrings of the destinations over the user's (small) set of
+archived records.
+
+Itineraries converted before summaries stored the budget can be backfilled
+(from the backend directory, with MONGO_URL set; archived ones keep matching
+every filter but the budget):
+    python itinerary_search.py backfill
+"""
+import asyncio
+import re
+import sys
+from datetime import date, datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+# Values of the `when` parameter
+UPCOMING, PAST = "upcoming", "past"
+
+# Longest accepted `q`; text searches cost grows with the number of terms
+MAX_QUERY_TERMS = 8
+
+
+class InvalidSearch(ValueError):
+    """Raised for search parameters that cannot be turned into a query"""
+
+
+class ItinerarySearch(NamedTuple):
+    text: Optional[str] = None
+    theme: Optional[str] = None
+    when: Optional[str] = None
+    start_from: Optional[str] = None
+    start_to: Optional[str] = None
+    min_budget: Optional[float] = None
+    max_budget: Optional[float] = None
+    currency: Optional[str] = None
+
+    @property
+    def terms(self):
+        return (self.text or "").split()
+
+
+def _summary_date(value: Optional[str], name: str) -> Optional[str]:
+    """Dates are stored as YYYY-MM-DD strings, which sort chronologically"""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise InvalidSearch(f"{name} must be a date (YYYY-MM-DD): {value}")
+
+
+def summary_conditions(search: ItinerarySearch, today: Optional[date] = None) -> Dict[str, Any]:
+    """Filter on the summary fields shared by hot and archived itineraries (everything but `q`)"""
+    if len(search.terms) > MAX_QUERY_TERMS:
+        raise InvalidSearch(f"Search text is limited to {MAX_QUERY_TERMS} words")
+    if search.when not in (None, UPCOMING, PAST):
+        raise InvalidSearch(f"when must be '{UPCOMING}' or '{PAST}'")
+    if search.min_budget is not None and search.max_budget is not None and search.min_budget > search.max_budget:
+        raise InvalidSearch("min_budget cannot exceed max_budget")
+
+    conditions: Dict[str, Any] = {}
+    if search.theme:
+        conditions["summary.theme"] = search.theme
+
+    # Trips starting within [from, to]; `upcoming` has not started yet, `past` has ended
+    start_date: Dict[str, str] = {}
+    start_from = _summary_date(search.start_from, "from")
+    start_to = _summary_date(search.start_to, "to")
+    today_str = (today or datetime.utcnow().date()).strftime("%Y-%m-%d")
+    if start_from:
+        start_date["$gte"] = start_from
+    if search.when == UPCOMING:
+        start_date["$gte"] = max(start_date.get("$gte", today_str), today_str)
+    if start_to:
+        start_date["$lte"] = start_to
+    if start_date:
+        conditions["summary.start_date"] = start_date
+    if search.when == PAST:
+        conditions["summary.end_date"] = {"$lt": today_str}
+
+    budget: Dict[str, float] = {}
+    if search.min_budget is not None:
+        budget["$gte"] = search.min_budget
+    if search.max_budget is not None:
+        budget["$lte"] = search.max_budget
+    if budget:
+        conditions["summary.budget_per_person"] = budget
+    if search.currency:
+        conditions["summary.currency"] = search.currency
+    return conditions
+
+
+def search_filter(search: ItinerarySearch, today: Optional[date] = None) -> Dict[str, Any]:
+    """Filter for the hot collection, using the destinations text index for `q`"""
+    conditions = summary_conditions(search, today)
+    if search.terms:
+        conditions["$text"] = {"$search": " ".join(search.terms)}
+    return conditions
+
+
+def archive_search_filter(search: ItinerarySearch, today: Optional[date] = None) -> Dict[str, Any]:
+    """Filter for the archive, which has no text index: any word as a destination substring"""
+    conditions = summary_conditions(search, today)
+    if search.terms:
+        conditions["summary.destinations"] = {
+            "$in": [re.compile(re.escape(term), re.IGNORECASE) for term in search.terms]
+        }
+    return conditions
+
+
+async def backfill_budgets(collection) -> int:
+    """Copy form data budgets (and party sizes) into summaries written before they carried them"""
+    result = await collection.update_many(
+        {"summary": {"$exists": True}, "$or": [
+            {"summary.budget_per_person": {"$exists": False}},
+            {"summary.party_size": {"$exists": False}},
+        ]},
+        [{"$set": {
+            # form_data or its compact name (see storage_schema)
+            "summary.budget_per_person": {"$ifNull": ["$form_data.budget_per_person", "$f.bp"]},
+            "summary.currency": {"$ifNull": ["$form_data.currency", {"$ifNull": ["$f.cu", "USD"]}]},
+            "summary.party_size": {"$ifNull": ["$form_data.party_size", "$f.ps"]},
+        }}],
+    )
+    return result.modified_count
+
+
+def main():
+    import os
+
+    import motor.motor_asyncio
+    from dotenv import load_dotenv
+
+    from itinerary_archive import hot_collection
+
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python itinerary_search.py backfill")
+        return 2
+
+    load_dotenv()
+    database = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URL")).dora_travel
+
+    async def backfill() -> int:
+        source, _ = hot_collection(database)
+        print(f"✅ {source.name}: {await backfill_budgets(source):,} summaries backfilled")
+        return 0
+
+    return asyncio.run(backfill())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Itinerary Storage Codec Migration for Dora Travel API
+Trains a zstd dictionary, converts existing documents to compressed blobs and
+reports working-set and disk savings.
+
+Usage (from the backend directory, with MONGO_URL set):
+    python migrate_itinerary_codec.py report  [--sample 500]
+    python migrate_itinerary_codec.py train   [--sample 2000] [--dict-size 65536]
+    python migrate_itinerary_codec.py migrate [--codec zstd] [--batch 500]
+    python migrate_itinerary_codec.py revert  [--batch 500]
+
+`migrate` and `revert` only touch documents still in the source format, so an
+interrupted run is resumed by running it again. Documents in the legacy and the
+compact storage schema (`g`/`gz`) are both handled and keep their layout.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import bson
+import motor.motor_asyncio
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from storage_codec import BLOB_FIELD, PAYLOAD_FIELD, ItineraryCodec, train_dictionary
+from storage_schema import StorageSchema
+
+COLLECTIONS = ("temporary_itineraries", "itineraries")
+
+# A collection can mix legacy and compact documents (see storage_schema)
+LAYOUTS = (StorageSchema(compact=False), StorageSchema(compact=True))
+
+
+def plain_payload(schema: StorageSchema, stored):
+    """API-shape payload of a stored plain `generated_itinerary` (the form the codec encodes)"""
+    return schema.from_storage({schema.field(PAYLOAD_FIELD): stored})[PAYLOAD_FIELD]
+
+
+def stored_payload(schema: StorageSchema, payload):
+    return schema.to_storage({PAYLOAD_FIELD: payload})[schema.field(PAYLOAD_FIELD)]
+
+
+async def sample_payloads(collection, size: int):
+    """(schema, stored plain payload) pairs sampled from the documents not yet compressed"""
+    plain_fields = [schema.field(PAYLOAD_FIELD) for schema in LAYOUTS]
+    pipeline = [
+        {"$match": {"$or": [{field: {"$exists": True}} for field in plain_fields]}},
+        {"$sample": {"size": size}},
+        {"$project": {field: 1 for field in plain_fields}},
+    ]
+    async for document in collection.aggregate(pipeline):
+        for schema in LAYOUTS:
+            if schema.field(PAYLOAD_FIELD) in document:
+                yield schema, document[schema.field(PAYLOAD_FIELD)]
+                break
+
+
+def human(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} TB"
+
+
+async def make_codec(database, codec_name: str) -> ItineraryCodec:
+    codec = ItineraryCodec(codec_name)
+    # Also for `revert`/zlib: existing zstd blobs must stay decodable
+    await codec.load_dictionaries(database.storage_dictionaries)
+    return codec
+
+
+async def train(database, args):
+    samples = []
+    for name in COLLECTIONS:
+        async for schema, stored in sample_payloads(database[name], args.sample):
+            samples.append(plain_payload(schema, stored))
+    if len(samples) < 10:
+        print(f"❌ Need at least 10 plain itineraries to train a dictionary, found {len(samples)}")
+        return 1
+
+    record = train_dictionary(samples, args.dict_size)
+    await database.storage_dictionaries.insert_one(record)
+    print(f"✅ Trained dictionary {record['_id']} ({human(len(record['data']))}) from {len(samples)} itineraries")
+    return 0
+
+
+async def convert(database, args, reverse: bool):
+    codec = await make_codec(database, args.codec)
+    if not reverse and not codec.enabled:
+        print("❌ Choose a compressing codec with --codec")
+        return 1
+
+    for name in COLLECTIONS:
+        collection = database[name]
+        converted = 0
+        started = time.perf_counter()
+        for schema in LAYOUTS:
+            plain, blob = schema.field(PAYLOAD_FIELD), schema.field(BLOB_FIELD)
+            source, target = (blob, plain) if reverse else (plain, blob)
+            while True:
+                batch = await collection.find({source: {"$exists": True}}, {source: 1}).sort("_id", 1).limit(args.batch).to_list(length=args.batch)
+                if not batch:
+                    break
+                operations = []
+                for document in batch:
+                    if reverse:
+                        value = stored_payload(schema, codec.decode(document[source]))
+                    else:
+                        value = codec.encode(plain_payload(schema, document[source]))
+                    operations.append(UpdateOne(
+                        {"_id": document["_id"], source: {"$exists": True}},
+                        {"$set": {target: value}, "$unset": {source: ""}}
+                    ))
+                result = await collection.bulk_write(operations, ordered=False)
+                converted += result.modified_count
+                print(f"  {name}: {converted:,} converted")
+        print(f"✅ {name}: {converted:,} documents in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+async def report(database, args):
+    codec = await make_codec(database, args.codec)
+    if not codec.enabled:
+        codec = await make_codec(database, "zstd")
+
+    print(f"Estimated with codec={codec.codec} dictionary={codec.active_dictionary or 'none'}\n")
+    for name in COLLECTIONS:
+        collection = database[name]
+        stats = await database.command("collStats", name)
+        if not stats.get("count"):
+            print(f"{name}: empty\n")
+            continue
+
+        plain_bytes = blob_bytes = sampled = 0
+        async for schema, stored in sample_payloads(collection, args.sample):
+            plain_bytes += len(bson.encode({schema.field(PAYLOAD_FIELD): stored}))
+            blob_bytes += len(bson.encode({schema.field(BLOB_FIELD): codec.encode(plain_payload(schema, stored))}))
+            sampled += 1
+        remaining = await collection.count_documents(
+            {"$or": [{schema.field(PAYLOAD_FIELD): {"$exists": True}} for schema in LAYOUTS]}
+        )
+
+        # WiredTiger caches uncompressed pages, so data size is the working-set footprint;
+        # storageSize is what the (block-compressed) collection occupies on disk
+        data_size, disk_size = stats["size"], stats["storageSize"]
+        saved_per_doc = (plain_bytes - blob_bytes) / sampled if sampled else 0
+        projected_data = data_size - saved_per_doc * remaining
+
+        print(f"{name}: {stats['count']:,} documents, {remaining:,} not yet compressed")
+        print(f"  working set (data size): {human(data_size)} -> ~{human(projected_data)}")
+        print(f"  on disk (storage size):  {human(disk_size)} -> ~{human(disk_size * projected_data / data_size)}")
+        if sampled:
+            print(f"  payload per document:    {human(plain_bytes / sampled)} -> {human(blob_bytes / sampled)} ({blob_bytes / plain_bytes:.0%}) over {sampled} samples")
+        print()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate itinerary payloads to the compressed storage codec")
+    parser.add_argument("command", choices=("report", "train", "migrate", "revert"))
+    parser.add_argument("--codec", default=os.getenv("ITINERARY_STORAGE_CODEC", "zstd"))
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--dict-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    load_dotenv()
+    database = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URL")).dora_travel
+
+    if args.command == "train":
+        return asyncio.run(train(database, args))
+    if args.command == "report":
+        return asyncio.run(report(database, args))
+    return asyncio.run(convert(database, args, reverse=args.command == "revert"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
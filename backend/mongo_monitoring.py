@@ -0,0 +1,255 @@
+"""PyMongo command and connection-pool monitoring.
+
+Listeners registered on the Motor client record:
+
+* latency histograms per database.collection and command (find, insert,
+  update, delete, aggregate, ...);
+* pool checkout wait times, open connections and connections in use;
+* a slow-query log: commands over the threshold are printed with their filter
+  shape, every value replaced by "?" so no user data reaches the logs.
+
+PyMongo calls listeners from its own threads, so all state is lock-protected.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is unbounded)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Slow queries kept for /api/metrics?slow_queries=true
+RECENT_SLOW_QUERIES = 50
+
+# Where each command keeps its filter
+_FILTER_FIELDS = {"find": "filter", "count": "query", "findAndModify": "query", "distinct": "query"}
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        self.counts[bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of samples (capped at the max)"""
+        if not self.count:
+            return None
+        threshold = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return min(self.buckets_ms[index], self.max_ms) if index < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets_ms, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+def redact(value: Any) -> Any:
+    """The shape of a filter: keys and operators kept, every value replaced by "?" """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes: List[Any] = []
+        for item in value:
+            shape = redact(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def command_collection(command_name: str, command: Dict[str, Any]) -> Optional[str]:
+    if command_name == "getMore":
+        return command.get("collection")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else None
+
+
+def filter_shape(command_name: str, command: Dict[str, Any]) -> Any:
+    """Redacted filter of a command, for the slow-query log"""
+    if command_name in _FILTER_FIELDS:
+        return redact(command.get(_FILTER_FIELDS[command_name], {}))
+    if command_name in ("update", "delete"):
+        statements = command.get(command_name + "s", [])
+        return redact([statement.get("q", {}) for statement in statements])
+    if command_name == "aggregate":
+        return redact([stage for stage in command.get("pipeline", []) if "$match" in stage or "$sort" in stage])
+    return None
+
+
+class _CommandListener(monitoring.CommandListener):
+    def __init__(self, monitor: "MongoMonitor"):
+        self.monitor = monitor
+
+    def started(self, event):
+        self.monitor._command_started(event)
+
+    def succeeded(self, event):
+        self.monitor._command_finished(event, failed=False)
+
+    def failed(self, event):
+        self.monitor._command_finished(event, failed=True)
+
+
+class _PoolListener(monitoring.ConnectionPoolListener):
+    def __init__(self, monitor: "MongoMonitor"):
+        self.monitor = monitor
+        self._checkout_started = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.monitor._adjust_pool(open_delta=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.monitor._adjust_pool(open_delta=-1)
+
+    def connection_check_out_started(self, event):
+        # Checkout runs start to finish on one thread
+        self._checkout_started.value = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self.monitor._checkout_failed()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._checkout_started, "value", None)
+        wait_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        self.monitor._checked_out(wait_ms)
+
+    def connection_checked_in(self, event):
+        self.monitor._adjust_pool(in_use_delta=-1)
+
+
+class MongoMonitor:
+    """Collects command latencies, pool usage and slow queries for one client"""
+
+    def __init__(self, slow_query_ms: float = 100, log=print):
+        self.slow_query_ms = slow_query_ms
+        self._log = log
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[Any, int], Tuple[str, str, Any]] = {}
+        self._commands: Dict[str, LatencyHistogram] = {}
+        self._failures: Dict[str, int] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=RECENT_SLOW_QUERIES)
+        self.slow_queries = 0
+        self._checkout_wait = LatencyHistogram()
+        self._checkout_failures = 0
+        self._open_connections = 0
+        self._in_use = 0
+        self.listeners = [_CommandListener(self), _PoolListener(self)]
+
+    # Command events
+
+    def _command_started(self, event):
+        name = command_collection(event.command_name, event.command)
+        if name is None:
+            return
+        key = f"{event.database_name}.{name}.{event.command_name}"
+        shape = filter_shape(event.command_name, event.command)
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (key, event.command_name, shape)
+
+    def _command_finished(self, event, failed: bool):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        key, command_name, shape = started
+        ms = event.duration_micros / 1000
+        with self._lock:
+            self._commands.setdefault(key, LatencyHistogram()).record(ms)
+            if failed:
+                self._failures[key] = self._failures.get(key, 0) + 1
+        if ms >= self.slow_query_ms:
+            entry = {
+                "namespace": key.rsplit(".", 1)[0],
+                "command": command_name,
+                "duration_ms": round(ms, 3),
+                "filter": shape,
+                "failed": failed,
+            }
+            with self._lock:
+                self.slow_queries += 1
+                self._slow.append(entry)
+            self._log(
+                f"Slow MongoDB {command_name} on {entry['namespace']}: {ms:.1f} ms "
+                f"filter={json.dumps(shape, separators=(',', ':'))}"
+            )
+
+    # Pool events
+
+    def _adjust_pool(self, open_delta: int = 0, in_use_delta: int = 0):
+        with self._lock:
+            self._open_connections += open_delta
+            self._in_use += in_use_delta
+
+    def _checked_out(self, wait_ms: float):
+        with self._lock:
+            self._in_use += 1
+            self._checkout_wait.record(wait_ms)
+
+    def _checkout_failed(self):
+        with self._lock:
+            self._checkout_failures += 1
+
+    def stats(self, include_slow_queries: bool = False) -> Dict[str, Any]:
+        """Counters and latencies; recent slow-query shapes (collection and field names) only on request"""
+        with self._lock:
+            stats = {
+                "commands": {
+                    key: {**histogram.stats(), "failures": self._failures.get(key, 0)}
+                    for key, histogram in sorted(self._commands.items())
+                },
+                "pool": {
+                    "open_connections": self._open_connections,
+                    "in_use": self._in_use,
+                    "checkout_failures": self._checkout_failures,
+                    "checkout_wait": self._checkout_wait.stats(),
+                },
+                "slow_query_ms": self.slow_query_ms,
+                "slow_queries": self.slow_queries,
+            }
+            if include_slow_queries:
+                stats["recent_slow_queries"] = list(self._slow)
+            return stats
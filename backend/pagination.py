@@ -0,0 +1,45 @@
+"""Opaque keyset-pagination cursors.
+
+A cursor encodes the (created_at, _id) of the last item on a page. The next page
+continues strictly after that position in (created_at desc, _id desc) order, so
+pages stay stable while new itineraries are being added.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(created_at: datetime, object_id: ObjectId) -> str:
+    payload = json.dumps({"c": created_at.isoformat(), "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_filter(cursor: str) -> Dict[str, Any]:
+    """Filter matching everything after the cursor in (created_at desc, _id desc) order"""
+    created_at, object_id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": object_id}},
+        ]
+    }
+
+
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
@@ -0,0 +1,253 @@
+"""Ranking engine for provider flight and hotel options.
+
+Providers can return hundreds of candidates per search. Options are scored on
+price relative to the traveller's budget, stops, duration, star rating and
+theme-specific amenities, and only the top-k are kept. Small result sets are
+scored one option at a time and selected with a bounded heap; large result sets
+are converted to array-backed columns and scored in a single vectorized pass.
+"""
+import heapq
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Amenities that make a hotel a good fit for each travel theme
+THEME_AMENITIES: Dict[str, List[str]] = {
+    "Family": ["Pool", "Kids Club", "Playground", "Family Rooms"],
+    "Business": ["Business Center", "Conference Rooms", "Fast WiFi", "Airport Shuttle"],
+    "Luxury": ["Spa", "Concierge", "Fine Dining", "Butler Service"],
+    "Adventure": ["Fitness Center", "Bike Rental", "Tour Desk", "Outdoor Activities"],
+    "Budget": ["Free WiFi", "Continental Breakfast", "24hr Reception"],
+    "Honeymoon": ["Spa", "Room Service", "Romantic Dining", "Couples Massage"]
+}
+DEFAULT_THEME_AMENITIES = ["Pool", "Restaurant"]
+
+# Relative weight of each scoring component per theme
+FLIGHT_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "default": {"price": 0.5, "stops": 0.3, "duration": 0.2},
+    "Budget": {"price": 0.75, "stops": 0.15, "duration": 0.1},
+    "Business": {"price": 0.2, "stops": 0.4, "duration": 0.4},
+    "Luxury": {"price": 0.2, "stops": 0.45, "duration": 0.35},
+    "Family": {"price": 0.4, "stops": 0.45, "duration": 0.15},
+}
+HOTEL_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "default": {"price": 0.45, "stars": 0.3, "amenities": 0.25},
+    "Budget": {"price": 0.7, "stars": 0.1, "amenities": 0.2},
+    "Luxury": {"price": 0.1, "stars": 0.5, "amenities": 0.4},
+    "Honeymoon": {"price": 0.25, "stars": 0.35, "amenities": 0.4},
+    "Family": {"price": 0.4, "stars": 0.2, "amenities": 0.4},
+}
+
+# Share of the per-person budget we expect to go on each booking type
+FLIGHT_BUDGET_SHARE = 0.4
+HOTEL_BUDGET_SHARE = 0.3
+
+# Longest itinerary we still consider (anything longer scores zero on duration)
+MAX_FLIGHT_MINUTES = 36 * 60
+
+# Below this many options the per-option heap path beats building columns
+VECTORIZE_THRESHOLD = 256
+
+_DURATION_RE = re.compile(r"(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?")
+
+
+def _field(option: Any, name: str) -> Any:
+    """Read a field from a Pydantic model or a plain provider dict"""
+    if isinstance(option, dict):
+        return option[name]
+    return getattr(option, name)
+
+
+def parse_duration_minutes(duration: str) -> int:
+    """Parse provider durations such as '6h 30m' into minutes"""
+    match = _DURATION_RE.fullmatch(duration.strip()) if duration else None
+    if not match or not any(match.groups()):
+        return MAX_FLIGHT_MINUTES
+    hours, minutes = match.groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+def _weights(table: Dict[str, Dict[str, float]], theme: str) -> Dict[str, float]:
+    return table.get(theme, table["default"])
+
+
+def _price_score(price: float, allowance: float) -> float:
+    """1.0 for free, 0.0 at the allowance, negative (down to -1) when over it"""
+    return max(-1.0, min(1.0, 1.0 - price / allowance))
+
+
+def flight_allowance(budget_per_person: float) -> float:
+    return max(budget_per_person * FLIGHT_BUDGET_SHARE, 1.0)
+
+
+def hotel_allowance(budget_per_person: float, party_size: int, nights: int) -> float:
+    return max(budget_per_person * max(party_size, 1) * HOTEL_BUDGET_SHARE / max(nights, 1), 1.0)
+
+
+def score_flight(option: Any, budget_per_person: float, theme: str) -> float:
+    """Score a single flight option (higher is better)"""
+    weights = _weights(FLIGHT_WEIGHTS, theme)
+    minutes = parse_duration_minutes(_field(option, "duration"))
+    return (
+        weights["price"] * _price_score(_field(option, "price"), flight_allowance(budget_per_person))
+        + weights["stops"] / (1 + _field(option, "stops"))
+        + weights["duration"] * (1.0 - min(minutes / MAX_FLIGHT_MINUTES, 1.0))
+    )
+
+
+def score_hotel(option: Any, budget_per_person: float, theme: str, party_size: int = 1, nights: int = 1) -> float:
+    """Score a single hotel option (higher is better)"""
+    weights = _weights(HOTEL_WEIGHTS, theme)
+    wanted = THEME_AMENITIES.get(theme, DEFAULT_THEME_AMENITIES)
+    offered = set(_field(option, "amenities"))
+    allowance = hotel_allowance(budget_per_person, party_size, nights)
+    return (
+        weights["price"] * _price_score(_field(option, "price_per_night"), allowance)
+        + weights["stars"] * min(_field(option, "star_rating"), 5) / 5
+        + weights["amenities"] * sum(1 for amenity in wanted if amenity in offered) / len(wanted)
+    )
+
+
+def top_k(options: Sequence[Any], scores: Sequence[float], k: int) -> List[Any]:
+    """Select the k best-scoring options with a bounded min-heap.
+
+    Runs in O(n log k) and keeps at most k entries alive. Ties keep provider
+    order, so the first of two equally good options wins.
+    """
+    if k <= 0:
+        return []
+    heap: List[Tuple[float, int]] = []
+    for index, score in enumerate(scores):
+        entry = (score, -index)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return [options[-index] for _, index in sorted(heap, reverse=True)]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Vectorized top-k: partial selection with argpartition, then order only the k winners"""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    # lexsort sorts by the last key first: score descending, then provider order
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class FlightColumns:
+    """Array-backed flight options, one NumPy column per scored attribute"""
+
+    def __init__(self, price: np.ndarray, stops: np.ndarray, duration_minutes: np.ndarray):
+        self.price = np.asarray(price, dtype=np.float64)
+        self.stops = np.asarray(stops, dtype=np.float64)
+        self.duration_minutes = np.asarray(duration_minutes, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.price.shape[0]
+
+    @classmethod
+    def from_options(cls, options: Sequence[Any]) -> "FlightColumns":
+        return cls(
+            price=np.fromiter((_field(o, "price") for o in options), dtype=np.float64, count=len(options)),
+            stops=np.fromiter((_field(o, "stops") for o in options), dtype=np.float64, count=len(options)),
+            duration_minutes=np.fromiter(
+                (parse_duration_minutes(_field(o, "duration")) for o in options),
+                dtype=np.float64,
+                count=len(options)
+            )
+        )
+
+    def score(self, budget_per_person: float, theme: str) -> np.ndarray:
+        weights = _weights(FLIGHT_WEIGHTS, theme)
+        price_score = np.clip(1.0 - self.price / flight_allowance(budget_per_person), -1.0, 1.0)
+        duration_score = 1.0 - np.minimum(self.duration_minutes / MAX_FLIGHT_MINUTES, 1.0)
+        return (
+            weights["price"] * price_score
+            + weights["stops"] / (1.0 + self.stops)
+            + weights["duration"] * duration_score
+        )
+
+
+# Every amenity we know about gets one bit, so amenity sets become integer masks
+_AMENITY_BITS: Dict[str, int] = {}
+for _amenities in list(THEME_AMENITIES.values()) + [DEFAULT_THEME_AMENITIES]:
+    for _amenity in _amenities:
+        _AMENITY_BITS.setdefault(_amenity, len(_AMENITY_BITS))
+
+
+def amenity_mask(amenities: Sequence[str]) -> int:
+    mask = 0
+    for amenity in amenities:
+        bit = _AMENITY_BITS.get(amenity)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    as_bytes = masks.astype(">u8").view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1)
+
+
+class HotelColumns:
+    """Array-backed hotel options; amenities are stored as a bitmask column"""
+
+    def __init__(self, price_per_night: np.ndarray, star_rating: np.ndarray, amenity_masks: np.ndarray):
+        self.price_per_night = np.asarray(price_per_night, dtype=np.float64)
+        self.star_rating = np.asarray(star_rating, dtype=np.float64)
+        self.amenity_masks = np.asarray(amenity_masks, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return self.price_per_night.shape[0]
+
+    @classmethod
+    def from_options(cls, options: Sequence[Any]) -> "HotelColumns":
+        n = len(options)
+        return cls(
+            price_per_night=np.fromiter((_field(o, "price_per_night") for o in options), dtype=np.float64, count=n),
+            star_rating=np.fromiter((_field(o, "star_rating") for o in options), dtype=np.float64, count=n),
+            amenity_masks=np.fromiter((amenity_mask(_field(o, "amenities")) for o in options), dtype=np.uint64, count=n)
+        )
+
+    def score(self, budget_per_person: float, theme: str, party_size: int = 1, nights: int = 1) -> np.ndarray:
+        weights = _weights(HOTEL_WEIGHTS, theme)
+        wanted = THEME_AMENITIES.get(theme, DEFAULT_THEME_AMENITIES)
+        allowance = hotel_allowance(budget_per_person, party_size, nights)
+        price_score = np.clip(1.0 - self.price_per_night / allowance, -1.0, 1.0)
+        matches = _popcount(self.amenity_masks & np.uint64(amenity_mask(wanted)))
+        return (
+            weights["price"] * price_score
+            + weights["stars"] * np.minimum(self.star_rating, 5.0) / 5.0
+            + weights["amenities"] * matches / len(wanted)
+        )
+
+
+def rank_flights(options: Sequence[Any], budget_per_person: float, theme: str, k: int = 3) -> List[Any]:
+    """Return the k best flight options, best first"""
+    if len(options) >= VECTORIZE_THRESHOLD:
+        scores = FlightColumns.from_options(options).score(budget_per_person, theme)
+        return [options[i] for i in top_k_indices(scores, k)]
+    scores = [score_flight(option, budget_per_person, theme) for option in options]
+    return top_k(options, scores, k)
+
+
+def rank_hotels(
+    options: Sequence[Any],
+    budget_per_person: float,
+    theme: str,
+    party_size: int = 1,
+    nights: int = 1,
+    k: int = 3
+) -> List[Any]:
+    """Return the k best hotel options, best first"""
+    if len(options) >= VECTORIZE_THRESHOLD:
+        scores = HotelColumns.from_options(options).score(budget_per_person, theme, party_size, nights)
+        return [options[i] for i in top_k_indices(scores, k)]
+    scores = [score_hotel(option, budget_per_person, theme, party_size, nights) for option in options]
+    return top_k(options, scores, k)
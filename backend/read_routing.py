@@ -0,0 +1,186 @@
+"""Per-endpoint read preferences with a read-your-writes guard.
+
+Read-only endpoints can be served by secondaries so they stop competing with
+generation writes on the primary. Each endpoint gets a read preference spec
+`mode[:max_staleness_seconds]`, e.g. `secondaryPreferred:120`. Secondaries
+lagging further behind are not selected (MongoDB's minimum bound is 90 s).
+
+Secondary reads may be stale, so:
+
+* write endpoints return an `X-Consistency-Token` (the cluster and operation
+  time right after the write). A read that sends it back runs in a causally
+  consistent session with majority read concern, so the secondary waits until
+  it has the write. If it cannot catch up within `causal_wait_ms`, the read is
+  retried on the primary;
+* point lookups that find nothing on a secondary are retried on the primary,
+  so a freshly generated itinerary never 404s because of replication lag.
+
+Endpoints routed to the primary ignore tokens: the primary has every
+acknowledged write.
+"""
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+
+import bson
+from bson import Timestamp
+from pymongo.errors import ExecutionTimeout
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Smallest maxStalenessSeconds MongoDB accepts
+MIN_MAX_STALENESS_SECONDS = 90
+
+DEFAULT_CAUSAL_WAIT_MS = 2000
+
+
+class InvalidConsistencyToken(ValueError):
+    """Raised when a client sends a consistency token we did not issue"""
+
+
+def parse_read_preference(spec: str):
+    """`mode[:max_staleness_seconds]` -> a PyMongo read preference"""
+    mode, _, staleness = spec.strip().partition(":")
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if not staleness:
+        return READ_PREFERENCE_MODES[mode]()
+    if mode == "primary":
+        raise ValueError("maxStalenessSeconds cannot be combined with the primary read preference")
+    max_staleness = int(staleness)
+    if max_staleness < MIN_MAX_STALENESS_SECONDS:
+        raise ValueError(f"maxStalenessSeconds must be at least {MIN_MAX_STALENESS_SECONDS}")
+    return READ_PREFERENCE_MODES[mode](max_staleness=max_staleness)
+
+
+def encode_consistency_token(cluster_time: Dict[str, Any], operation_time: Timestamp) -> str:
+    payload = bson.encode({"c": cluster_time, "o": operation_time})
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_consistency_token(token: str) -> Tuple[Dict[str, Any], Timestamp]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = bson.decode(base64.urlsafe_b64decode(padded.encode()))
+        cluster_time, operation_time = payload["c"], payload["o"]
+        if not isinstance(operation_time, Timestamp) or not isinstance(cluster_time.get("clusterTime"), Timestamp):
+            raise TypeError("unexpected token field types")
+        return cluster_time, operation_time
+    except (ValueError, KeyError, TypeError, AttributeError, bson.errors.BSONError) as e:
+        raise InvalidConsistencyToken(f"Invalid consistency token: {token}") from e
+
+
+class EndpointReads:
+    """Reads for one request to one endpoint, routed per the endpoint's preference"""
+
+    def __init__(self, router: "ReadRouter", endpoint: str, token: Optional[str]):
+        self.router = router
+        self.endpoint = endpoint
+        self.read_preference = router.routes.get(endpoint, Primary())
+        self.routed = not isinstance(self.read_preference, Primary)
+        self.after = decode_consistency_token(token) if token and self.routed else None
+        # Whether the last read was answered by the primary; routed reads may be stale
+        # even after a change-stream invalidation, so only primary results are cacheable
+        self.from_primary = not self.routed
+
+    def _collection(self, collection):
+        if self.after is not None:
+            return collection.with_options(read_preference=self.read_preference, read_concern=ReadConcern("majority"))
+        return collection.with_options(read_preference=self.read_preference)
+
+    async def _run(self, operation, collection, primary_if_missing: bool):
+        """Run `operation(collection, **kwargs)` on the routed members, falling back to the primary"""
+        if not self.routed:
+            return await operation(collection)
+
+        self.from_primary = False
+        stats = self.router._stats.setdefault(self.endpoint, {"routed": 0, "causal": 0, "causal_timeouts": 0, "missing_retried": 0})
+        stats["routed"] += 1
+        if self.after is None:
+            result = await operation(self._collection(collection))
+        else:
+            stats["causal"] += 1
+            cluster_time, operation_time = self.after
+            try:
+                async with await self.router.client.start_session(causal_consistency=True) as session:
+                    session.advance_cluster_time(cluster_time)
+                    session.advance_operation_time(operation_time)
+                    result = await operation(
+                        self._collection(collection), session=session, max_time_ms=self.router.causal_wait_ms
+                    )
+            except ExecutionTimeout:
+                # The selected member could not catch up with the client's last write in time
+                stats["causal_timeouts"] += 1
+                self.from_primary = True
+                return await operation(collection)
+
+        if primary_if_missing and result is None:
+            stats["missing_retried"] += 1
+            self.from_primary = True
+            return await operation(collection)
+        return result
+
+    async def find_one(self, collection, filter: Dict[str, Any], projection: Optional[Dict[str, Any]] = None):
+        async def operation(target, **kwargs):
+            return await target.find_one(filter, projection, **kwargs)
+        return await self._run(operation, collection, primary_if_missing=True)
+
+    async def aggregate(
+        self, collection, pipeline: List[Dict[str, Any]], length: Optional[int] = None, max_time_ms: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """`max_time_ms` bounds the query itself; a causal wait uses the smaller of both limits"""
+        query_max_time_ms = max_time_ms
+
+        async def operation(target, session=None, max_time_ms=None):
+            limits = [limit for limit in (max_time_ms, query_max_time_ms) if limit]
+            options = {"maxTimeMS": min(limits)} if limits else {}
+            return await target.aggregate(pipeline, session=session, **options).to_list(length=length)
+        return await self._run(operation, collection, primary_if_missing=False)
+
+
+class ReadRouter:
+    """Per-endpoint read preferences and consistency tokens for one client"""
+
+    def __init__(self, client, routes: Dict[str, Any], causal_wait_ms: int = DEFAULT_CAUSAL_WAIT_MS):
+        self.client = client
+        self.routes = routes
+        self.causal_wait_ms = causal_wait_ms
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.tokens_issued = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any endpoint reads from members other than the primary"""
+        return any(not isinstance(preference, Primary) for preference in self.routes.values())
+
+    def reads(self, endpoint: str, token: Optional[str] = None) -> EndpointReads:
+        return EndpointReads(self, endpoint, token)
+
+    async def token_after_write(self, collection, filter: Dict[str, Any]) -> Optional[str]:
+        """A token covering every write acknowledged so far (None when no endpoint is routed).
+
+        A primary read's operation time is at least that of every write it can
+        see, so one `_id`-only lookup right after the write yields it.
+        """
+        if not self.enabled:
+            return None
+        async with await self.client.start_session(causal_consistency=True) as session:
+            await collection.find_one(filter, {"_id": 1}, session=session)
+            if session.cluster_time is None or session.operation_time is None:
+                return None  # standalone server: nothing to route
+            self.tokens_issued += 1
+            return encode_consistency_token(session.cluster_time, session.operation_time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "routes": {endpoint: preference.document for endpoint, preference in self.routes.items()},
+            "tokens_issued": self.tokens_issued,
+            "endpoints": self._stats,
+        }
@@ -0,0 +1,103 @@
+"""Whole-itinerary result cache keyed by the normalized travel form.
+
+Apart from the traveller's name and exact budget, a generated itinerary is a
+function of the form: destinations, dates, theme, party size, currency, route
+optimization and (through price-based ranking) the budget. Popular packages are
+requested with identical parameters many times a day, so the generated payload
+is cached under a key built from those fields, with the budget rounded into
+geometric buckets, and a hit only re-stamps the personal fields onto a copy.
+"""
+import hashlib
+import json
+import math
+from typing import Any, Dict, Optional
+
+from cache import ByteLRUCache
+
+# Budgets within the same ~10% band share cached results
+DEFAULT_BUDGET_BUCKET_RATIO = 1.1
+
+
+def _normalize_place(name: str) -> str:
+    """'  Paris ,  france' -> 'paris, france'"""
+    return ", ".join(" ".join(part.split()) for part in name.casefold().split(","))
+
+
+def budget_bucket(budget: float, ratio: float = DEFAULT_BUDGET_BUCKET_RATIO) -> int:
+    if budget <= 0:
+        return 0
+    return math.floor(math.log(budget) / math.log(ratio))
+
+
+def normalize_form(form: Dict[str, Any], ratio: float = DEFAULT_BUDGET_BUCKET_RATIO) -> Dict[str, Any]:
+    """The TravelForm fields that determine the generated itinerary (user_name excluded)"""
+    return {
+        "origin_city": _normalize_place(form["origin_city"]),
+        "destinations": [_normalize_place(destination) for destination in form["destinations"]],
+        "start_date": str(form["start_date"]),
+        "end_date": str(form["end_date"]),
+        "travel_theme": form["travel_theme"].strip().casefold(),
+        "party_size": form["party_size"],
+        "budget_bucket": budget_bucket(form["budget_per_person"], ratio),
+        "currency": form["currency"].strip().upper(),
+        "optimize_route": bool(form.get("optimize_route", False)),
+    }
+
+
+def form_cache_key(form: Dict[str, Any], ratio: float = DEFAULT_BUDGET_BUCKET_RATIO) -> str:
+    normalized = json.dumps(normalize_form(form, ratio), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def personalize(itinerary_data: Dict[str, Any], form: Dict[str, Any]) -> Dict[str, Any]:
+    """Re-stamp the requester's own name, budget and spelling of places onto a cached payload"""
+    spelled = {_normalize_place(destination): destination for destination in form["destinations"]}
+    destinations = [spelled.get(_normalize_place(destination), destination) for destination in itinerary_data["trip"]["destinations"]]
+    return {
+        **itinerary_data,
+        "user": {**itinerary_data["user"], "name": form["user_name"], "budget": form["budget_per_person"]},
+        "trip": {
+            **itinerary_data["trip"],
+            "origin": form["origin_city"],
+            "destination": ", ".join(destinations),
+            "destinations": destinations,
+        },
+    }
+
+
+class ItineraryResultCache:
+    """Generated itinerary payloads by normalized form, serialized so entries are immutable"""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float,
+        budget_bucket_ratio: float = DEFAULT_BUDGET_BUCKET_RATIO,
+        cache=None,
+    ):
+        # `cache` overrides the per-process LRU (e.g. a shared-memory namespace)
+        self._cache = cache if cache is not None else ByteLRUCache(max_bytes, ttl_seconds)
+        self.budget_bucket_ratio = budget_bucket_ratio
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.enabled
+
+    def key(self, form: Dict[str, Any]) -> str:
+        return form_cache_key(form, self.budget_bucket_ratio)
+
+    def get(self, form: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """A personalized copy of the cached payload for this form, or None"""
+        if not self.enabled:
+            return None
+        cached = self._cache.get(self.key(form))
+        if cached is None:
+            return None
+        return personalize(json.loads(cached), form)
+
+    def set(self, form: Dict[str, Any], itinerary_data: Dict[str, Any]):
+        if self.enabled:
+            self._cache.set(self.key(form), json.dumps(itinerary_data, separators=(",", ":")).encode())
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
@@ -0,0 +1,165 @@
+"""Multi-city route optimization.
+
+Reorders a trip's destinations to minimize total great-circle distance. The
+route starts and ends at the origin city when it is known (the traveller flies
+home); otherwise it is an open path through the destinations. Distances come
+from a NumPy-vectorized haversine matrix cached per destination set. Small
+trips are solved exactly (Held-Karp); larger ones use nearest neighbour
+followed by 2-opt improvement.
+"""
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from city_coordinates import CITY_COORDINATES, normalize_city
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Held-Karp is O(n^2 2^n); above this many tour nodes we switch to 2-opt
+EXACT_SOLVER_MAX_NODES = 10
+
+TWO_OPT_MAX_PASSES = 50
+
+
+class RoutePlan(NamedTuple):
+    destinations: List[str]
+    distance_km: Optional[float]
+    optimized: bool
+
+
+def haversine_matrix(coordinates: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances (km) for an (n, 2) array of lat/lon degrees"""
+    radians = np.radians(coordinates)
+    lat = radians[:, 0:1]
+    lon = radians[:, 1:2]
+    dlat = lat.T - lat
+    dlon = lon.T - lon
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+@lru_cache(maxsize=1024)
+def _matrix_for_city_set(cities: Tuple[str, ...]) -> np.ndarray:
+    matrix = haversine_matrix(np.array([CITY_COORDINATES[city] for city in cities], dtype=np.float64))
+    matrix.setflags(write=False)
+    return matrix
+
+
+def distance_matrix(cities: Sequence[str]) -> np.ndarray:
+    """Distance matrix for normalized city keys, in the order given.
+
+    The underlying matrix is computed once per distinct set of cities, so
+    the same trip typed in a different order is a cache hit.
+    """
+    canonical = tuple(sorted(set(cities)))
+    position = {city: i for i, city in enumerate(canonical)}
+    index = [position[city] for city in cities]
+    return _matrix_for_city_set(canonical)[np.ix_(index, index)]
+
+
+def tour_length(distances: np.ndarray, tour: Sequence[int]) -> float:
+    """Length of the closed tour that visits nodes in order and returns to the first"""
+    order = np.asarray(tour)
+    return float(distances[order, np.roll(order, -1)].sum())
+
+
+def solve_exact(distances: np.ndarray) -> List[int]:
+    """Optimal closed tour starting at node 0 (Held-Karp dynamic programming)"""
+    size = distances.shape[0]
+    if size <= 3:
+        return list(range(size))
+
+    n = size - 1  # nodes 1..size-1 map to bits 0..n-1
+    full = 1 << n
+    inner = distances[1:, 1:]
+    cost = np.full((full, n), np.inf)
+    parent = np.full((full, n), -1, dtype=np.intp)
+    for j in range(n):
+        cost[1 << j, j] = distances[0, j + 1]
+
+    bits = np.arange(n)
+    for mask in range(1, full):
+        if mask & (mask - 1) == 0:
+            continue
+        members = bits[(mask >> bits) & 1 == 1]
+        previous = mask ^ (1 << members)
+        # candidates[i, k]: reach member i last, coming from k
+        candidates = cost[previous] + inner[:, members].T
+        best = np.argmin(candidates, axis=1)
+        cost[mask, members] = candidates[np.arange(members.size), best]
+        parent[mask, members] = best
+
+    closing = cost[full - 1] + distances[1:, 0]
+    last = int(np.argmin(closing))
+    tour = []
+    mask = full - 1
+    while last != -1:
+        tour.append(last + 1)
+        mask, last = mask ^ (1 << last), int(parent[mask, last])
+    return [0] + tour[::-1]
+
+
+def solve_two_opt(distances: np.ndarray, max_passes: int = TWO_OPT_MAX_PASSES) -> List[int]:
+    """Closed tour starting at node 0: nearest-neighbour seed improved with 2-opt"""
+    size = distances.shape[0]
+    if size <= 3:
+        return list(range(size))
+
+    tour = [0]
+    unvisited = set(range(1, size))
+    while unvisited:
+        last = tour[-1]
+        nearest = min(unvisited, key=lambda node: distances[last, node])
+        tour.append(nearest)
+        unvisited.remove(nearest)
+
+    route = np.array(tour + [0], dtype=np.intp)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, size - 1):
+            a, b = route[i - 1], route[i]
+            js = np.arange(i + 1, size)
+            c, d = route[js], route[js + 1]
+            # Gain of reversing route[i..j] for every j at once
+            delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = js[best]
+                route[i:j + 1] = route[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return route[:-1].tolist()
+
+
+def solve_tour(distances: np.ndarray) -> List[int]:
+    if distances.shape[0] <= EXACT_SOLVER_MAX_NODES:
+        return solve_exact(distances)
+    return solve_two_opt(distances)
+
+
+def optimize_route(origin: Optional[str], destinations: Sequence[str]) -> RoutePlan:
+    """Reorder destinations to minimize travel distance.
+
+    Returns the user's order unchanged (optimized=False) when any destination
+    is missing from the bundled coordinate table.
+    """
+    destinations = list(destinations)
+    keys = [normalize_city(destination) for destination in destinations]
+    if len(destinations) < 2 or any(key not in CITY_COORDINATES for key in keys):
+        return RoutePlan(destinations, None, False)
+
+    origin_key = normalize_city(origin) if origin else None
+    round_trip = origin_key in CITY_COORDINATES
+    if round_trip:
+        distances = distance_matrix([origin_key] + keys)
+    else:
+        # A zero-cost depot turns the closed tour into an open path
+        distances = np.zeros((len(keys) + 1, len(keys) + 1))
+        distances[1:, 1:] = distance_matrix(keys)
+
+    tour = solve_tour(distances)
+    ordered = [destinations[node - 1] for node in tour[1:]]
+    total = tour_length(distances, tour)
+    return RoutePlan(ordered, round(total, 1), True)
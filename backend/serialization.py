@@ -0,0 +1,102 @@
+"""Binary response encodings negotiated from the Accept header.
+
+Responses keep the JSON schema; MessagePack and CBOR are offered as more
+compact, faster-to-parse encodings of the same JSON-compatible data (dates
+stay ISO strings), for clients that ask for them with
+`Accept: application/msgpack` or `Accept: application/cbor`. Either format
+is offered only when its package is installed; JSON is always available and
+is the default.
+"""
+import json
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Preference order when the client rates several media types equally
+SUPPORTED_MEDIA_TYPES: Tuple[str, ...] = (JSON,) + ((MSGPACK,) if msgpack is not None else ()) + ((CBOR,) if cbor2 is not None else ())
+
+# Names clients send for the same formats
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+# ETag suffix per encoding; JSON keeps the stored validator unchanged
+ETAG_SUFFIXES = {MSGPACK: "msgpack", CBOR: "cbor"}
+
+
+def parse_accept(header: Optional[str]) -> Dict[str, float]:
+    """Map each listed media range to its q-value"""
+    weights: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        media_range, *params = part.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_range = MEDIA_TYPE_ALIASES.get(media_range, media_range)
+        weights[media_range] = max(quality, weights.get(media_range, 0.0))
+    return weights
+
+
+def negotiate_media_type(header: Optional[str]) -> str:
+    """Best supported media type for an Accept header; JSON when nothing else is preferred"""
+    weights = parse_accept(header)
+    if not weights:
+        return JSON
+    best, best_quality = JSON, 0.0
+    for media_type in SUPPORTED_MEDIA_TYPES:
+        quality = weights.get(media_type)
+        if quality is None:
+            quality = weights.get(media_type.split("/")[0] + "/*", weights.get("*/*", 0.0))
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def encode_content(content: Any, media_type: str) -> bytes:
+    """Serialize JSON-compatible data (e.g. model_dump(mode="json")) in the given media type"""
+    if media_type == MSGPACK:
+        return msgpack.packb(content, use_bin_type=True)
+    if media_type == CBOR:
+        return cbor2.dumps(content)
+    if media_type == JSON:
+        return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+
+def decode_content(body: bytes, media_type: str) -> Any:
+    if media_type == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    if media_type == CBOR:
+        return cbor2.loads(body)
+    if media_type == JSON:
+        return json.loads(body)
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+
+def media_etag(etag: Optional[str], media_type: str) -> Optional[str]:
+    """Validator for one encoding of a JSON body's ETag: "abc" -> "abc-msgpack" """
+    suffix = ETAG_SUFFIXES.get(media_type)
+    if not etag or suffix is None:
+        return etag
+    return f'{etag[:-1]}-{suffix}"' if etag.endswith('"') else etag
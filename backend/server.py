@@ -1,16 +1,92 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import List, Optional, Dict, Any, NamedTuple, Tuple
 from datetime import datetime, date, timedelta
 import os
 import asyncio
 import uuid
 import json
+import secrets
 import requests
 from dotenv import load_dotenv
 import motor.motor_asyncio
+import bson
 from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, ExecutionTimeout
+
+# Declarative index registry
+from indexes import reconcile_indexes, run_index_diagnostics
+
+# Keyset pagination for itinerary listings
+from pagination import InvalidCursor, KEYSET_SORT, encode_cursor, keyset_filter
+
+# Compressed itinerary payload storage
+from storage_codec import PAYLOAD_FIELD, ItineraryCodec
+
+# Compact persisted document layout
+from storage_schema import StorageSchema
+
+# In-process response caching
+from cache import ByteLRUCache
+
+# Cross-process cache segment shared by the workers on a host
+from shared_cache import SharedMemoryCache
+
+# ETags and conditional requests
+from http_caching import compute_etag, etag_matches
+
+# Negotiated gzip/Brotli compression
+from bson import Binary
+from compression import (
+    IDENTITY, SUPPORTED_ENCODINGS, CompressionMiddleware,
+    compress, decompress, etag_variants, negotiate_encoding, precompress, variant_etag
+)
+
+# MessagePack/CBOR responses negotiated from the Accept header
+from serialization import JSON, encode_content, media_etag, negotiate_media_type
+
+# Sparse fieldsets and day ranges read via projections
+from sparse_fields import (
+    MAX_DAYS_PER_PAGE, InvalidFieldSelection,
+    days_projection, fields_projection, parse_fields, select_days, select_fields
+)
+
+# Whole-itinerary result cache keyed by the normalized travel form
+from result_cache import ItineraryResultCache
+
+# Local (SQLite) tier for anonymous sessions
+from session_store import LocalSessionStore
+
+# Write-behind batching of temporary itinerary inserts
+from write_behind import WriteBehindQueue
+
+# Command/pool monitoring and slow-query log
+from mongo_monitoring import MongoMonitor
+
+# Secondary reads with per-endpoint read preferences and consistency tokens
+from read_routing import InvalidConsistencyToken, ReadRouter, parse_read_preference
+
+# Cross-worker cache invalidation via change streams
+from cache_invalidation import ChangeStreamInvalidator, session_cache_subscriber
+
+# Cold archive of long-finished trips
+from itinerary_archive import ARCHIVE_COLLECTION, ItineraryArchive
+
+# Search over users' itinerary summaries
+from itinerary_search import InvalidSearch, ItinerarySearch, archive_search_filter, search_filter
+
+# Per-user trip summary documents in the users collection
+from user_summary import CURRENCY_PATTERN, record_conversions, trip_summary_view
+
+# Buffered analytics events with hourly rollups
+from analytics import AUTH_PREPARED, ITINERARY_CONVERTED, ITINERARY_GENERATED, AnalyticsBuffer
+
+# Idempotency-Key support for itinerary generation
+from idempotency import IdempotencyKeyInProgress, IdempotencyKeyMismatch, IdempotencyStore, request_fingerprint
 
 # Emergent LLM Integration
 from emergentintegrations.llm.chat import LlmChat, UserMessage
@@ -19,7 +95,12 @@ from emergentintegrations.llm.chat import LlmChat, UserMessage
 import jwt
 from jwt import PyJWTError
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from functools import lru_cache
+
+# Provider result ranking
+from ranking import THEME_AMENITIES, DEFAULT_THEME_AMENITIES, rank_flights, rank_hotels
+
+# Multi-city route optimization
+from route_optimizer import RoutePlan, optimize_route
 
 # Load environment variables
 load_dotenv()
@@ -33,28 +114,330 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Consistency-Token"],
 )
 
+# Compress JSON responses on the fly above this size (precompressed bodies bypass it)
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL")
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+
+# Per-command latency histograms and pool usage; slower commands are logged with redacted filters
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "100"))
+mongo_monitor = MongoMonitor(slow_query_ms=MONGO_SLOW_QUERY_MS)
+
+client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL, event_listeners=mongo_monitor.listeners)
 database = client.dora_travel
 
 # Collections
 temporary_itineraries = database.temporary_itineraries
 permanent_itineraries = database.itineraries
 users = database.users
+storage_dictionaries = database.storage_dictionaries
+idempotency_keys = database.idempotency_keys
+itineraries_archive = database[ARCHIVE_COLLECTION]
+
+# Read preference per read-only endpoint, as mode[:max staleness seconds], e.g. "secondaryPreferred:120".
+# Conversions return an X-Consistency-Token; reads sending it back see that write (waiting up to
+# CAUSAL_READ_WAIT_MS on a lagging secondary before retrying on the primary).
+READ_PREFERENCE_ITINERARY = os.getenv("READ_PREFERENCE_ITINERARY", "primary")
+READ_PREFERENCE_MY_ITINERARIES = os.getenv("READ_PREFERENCE_MY_ITINERARIES", "primary")
+CAUSAL_READ_WAIT_MS = int(os.getenv("CAUSAL_READ_WAIT_MS", "2000"))
+read_router = ReadRouter(client, {
+    "itinerary": parse_read_preference(READ_PREFERENCE_ITINERARY),
+    "my_itineraries": parse_read_preference(READ_PREFERENCE_MY_ITINERARIES),
+}, causal_wait_ms=CAUSAL_READ_WAIT_MS)
+CONSISTENCY_TOKEN_HEADER = "X-Consistency-Token"
+
+# Itinerary payload storage: none (plain documents), zlib or zstd
+ITINERARY_STORAGE_CODEC = os.getenv("ITINERARY_STORAGE_CODEC", "none")
+itinerary_codec = ItineraryCodec(ITINERARY_STORAGE_CODEC)
+
+# Binary UUID session keys and short payload field names (legacy documents stay readable)
+COMPACT_STORAGE_SCHEMA = os.getenv("COMPACT_STORAGE_SCHEMA", "false").lower() == "true"
+storage_schema = StorageSchema(compact=COMPACT_STORAGE_SCHEMA)
+
+# Where converted itineraries live:
+#   split  - copied into `itineraries` and deleted from `temporary_itineraries`
+#   single - flipped to status "permanent" in place inside `temporary_itineraries`
+ITINERARY_STORAGE_MODE = os.getenv("ITINERARY_STORAGE_MODE", "split")
+PERMANENT_STATUS = "permanent"
+
+def owned_itineraries():
+    """Collection holding users' converted itineraries and the filter selecting them"""
+    if ITINERARY_STORAGE_MODE == "single":
+        return temporary_itineraries, {"status": PERMANENT_STATUS}
+    return permanent_itineraries, {}
+
+# Itineraries of long-finished trips moved out of the hot collection by itinerary_archive.py;
+# listings and reads fall back to it transparently
+itinerary_archive = ItineraryArchive(itineraries_archive)
+
+# Memory-mapped cache segment shared by all workers on the host, e.g. /dev/shm/dora-travel-cache.
+# Empty keeps a separate LRU cache per worker. Workers configured with different sizes use separate segments.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+shared_cache = None
+if SHARED_CACHE_PATH:
+    try:
+        shared_cache = SharedMemoryCache(SHARED_CACHE_PATH, SHARED_CACHE_MAX_BYTES)
+    except (OSError, ValueError) as e:
+        print(f"Shared cache unavailable, using per-worker caches: {e}")
+
+# Namespaces within the shared segment
+SHARED_ITINERARIES, SHARED_ITINERARY_RESULTS, SHARED_JWKS, SHARED_DESTINATION_INFO = 1, 2, 3, 4
+
+def local_or_shared_cache(namespace: int, max_bytes: int, ttl_seconds: float, dumps=None, loads=None):
+    """A namespace of the shared segment when enabled, otherwise a per-worker LRU (0 bytes disables both)"""
+    if shared_cache is not None and max_bytes > 0:
+        return shared_cache.namespace(namespace, ttl_seconds, dumps=dumps, loads=loads)
+    return ByteLRUCache(max_bytes, ttl_seconds)
+
+# (media type, content-coding) of one serialized itinerary body
+Representation = Tuple[str, str]
+
+class CachedItinerary(NamedTuple):
+    etag: str
+    bodies: Dict[Representation, bytes]
+
+def dump_cached_itinerary(cached: CachedItinerary) -> bytes:
+    return bson.encode({"etag": cached.etag, "bodies": [[media_type, encoding, body] for (media_type, encoding), body in cached.bodies.items()]})
+
+def load_cached_itinerary(data: bytes) -> CachedItinerary:
+    document = bson.decode(data)
+    return CachedItinerary(document["etag"], {(media_type, encoding): body for media_type, encoding, body in document["bodies"]})
+
+# Serialized GET /api/itinerary/{session_id} bodies, keyed by session_id (0 bytes disables)
+ITINERARY_CACHE_MAX_BYTES = int(os.getenv("ITINERARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ITINERARY_CACHE_TTL_SECONDS = float(os.getenv("ITINERARY_CACHE_TTL_SECONDS", "300"))
+itinerary_cache = local_or_shared_cache(
+    SHARED_ITINERARIES, ITINERARY_CACHE_MAX_BYTES, ITINERARY_CACHE_TTL_SECONDS,
+    dumps=dump_cached_itinerary, loads=load_cached_itinerary
+)
+
+# Browser caching of itinerary reads; revalidation uses the stored ETag. Private by default:
+# bodies carry the traveller's name, so shared caches (CDNs) must not store them
+ITINERARY_CACHE_CONTROL = os.getenv("ITINERARY_CACHE_CONTROL", "private, max-age=60")
+# Generation responses are never reused
+GENERATED_CACHE_CONTROL = "no-store"
+
+# Content-codings compressed once at generation and stored with each temporary itinerary
+PRECOMPRESSED_ENCODINGS = [
+    encoding.strip() for encoding in os.getenv("PRECOMPRESSED_ENCODINGS", "br,gzip").split(",")
+    if encoding.strip() in SUPPORTED_ENCODINGS
+]
+
+def cache_itinerary_bodies(session_id: str, etag: str, expires_at: datetime, bodies: Dict[Representation, bytes]):
+    """Cache serialized bodies (merged with any already cached) for no longer than the document lives"""
+    cached = itinerary_cache.peek(session_id)
+    if cached is not None and cached.etag == etag:
+        bodies = {**cached.bodies, **bodies}
+    itinerary_cache.set(
+        session_id,
+        CachedItinerary(etag, bodies),
+        ttl=(expires_at - datetime.utcnow()).total_seconds(),
+        size=len(etag) + sum(len(body) for body in bodies.values())
+    )
+
+def serialize_itinerary(itinerary: "TravelItinerary", representation: Representation) -> bytes:
+    """Render an itinerary in the requested media type and content-coding"""
+    media_type, encoding = representation
+    if media_type == JSON:
+        body = itinerary.model_dump_json().encode()
+    else:
+        body = encode_content(itinerary.model_dump(mode="json"), media_type)
+    return body if encoding == IDENTITY else compress(body, encoding)
+
+def itinerary_matches(if_none_match: Optional[str], etag: Optional[str], media_type: str) -> bool:
+    """Whether the client holds this version in the negotiated media type (any content-coding)"""
+    return any(etag_matches(if_none_match, variant) for variant in etag_variants(media_etag(etag, media_type)))
+
+def itinerary_response(
+    body: bytes,
+    etag: str,
+    representation: Representation,
+    if_none_match: Optional[str],
+    cache_control: str = ITINERARY_CACHE_CONTROL
+) -> Response:
+    """200 with the (possibly precompressed) body, or 304 when the client already holds this version"""
+    media_type, encoding = representation
+    headers = {
+        "ETag": variant_etag(media_etag(etag, media_type), encoding),
+        "Cache-Control": cache_control,
+        "Vary": "Accept, Accept-Encoding"
+    }
+    if itinerary_matches(if_none_match, etag, media_type):
+        return Response(status_code=304, headers=headers)
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def stored_itinerary_response(
+    session_id: str,
+    document: Dict[str, Any],
+    representation: Representation,
+    if_none_match: Optional[str]
+) -> Response:
+    """Serve a whole stored itinerary document (storage form) in the negotiated representation"""
+    stored = storage_schema.from_storage(document)
+    media_type, encoding = representation
+    if itinerary_matches(if_none_match, stored["etag"], media_type):
+        return itinerary_response(b"", stored["etag"], representation, if_none_match)
+    
+    compressed = stored.get("compressed_bodies", {}).get(encoding) if media_type == JSON else None
+    if compressed is not None:
+        body = bytes(compressed)
+    else:
+        await itinerary_codec.ensure_dictionary(stored)
+        itinerary = TravelItinerary(session_id=session_id, **itinerary_codec.load(stored))
+        body = serialize_itinerary(itinerary, representation)
+    cache_itinerary_bodies(session_id, stored["etag"], stored["expires_at"], {representation: body})
+    return itinerary_response(body, stored["etag"], representation, if_none_match)
+
+def replayed_generation_response(compressed: bytes, accept: Optional[str], accept_encoding: Optional[str]) -> Response:
+    """The original generation response, rebuilt from the gzip body kept with its Idempotency-Key"""
+    body = decompress(compressed, "gzip")
+    representation = (negotiate_media_type(accept), negotiate_encoding(accept_encoding))
+    bodies = {(JSON, IDENTITY): body, (JSON, "gzip"): compressed}
+    if representation not in bodies:
+        bodies[representation] = serialize_itinerary(TravelItinerary.model_validate_json(body), representation)
+    return itinerary_response(bodies[representation], compute_etag(body), representation, None, GENERATED_CACHE_CONTROL)
+
+def negotiated_response(content: Any, accept: Optional[str]) -> Response:
+    """JSON, MessagePack or CBOR rendering of JSON-compatible content, per the Accept header"""
+    media_type = negotiate_media_type(accept)
+    headers = {"Vary": "Accept"}
+    if media_type == JSON:
+        return JSONResponse(jsonable_encoder(content), headers=headers)
+    return Response(content=encode_content(jsonable_encoder(content), media_type), media_type=media_type, headers=headers)
+
+# Generated payloads by normalized form (budget in ~10% bands); 0 bytes disables
+ITINERARY_RESULT_CACHE_MAX_BYTES = int(os.getenv("ITINERARY_RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+ITINERARY_RESULT_CACHE_TTL_SECONDS = float(os.getenv("ITINERARY_RESULT_CACHE_TTL_SECONDS", str(6 * 3600)))
+ITINERARY_RESULT_BUDGET_BUCKET_RATIO = float(os.getenv("ITINERARY_RESULT_BUDGET_BUCKET_RATIO", "1.1"))
+itinerary_results = ItineraryResultCache(
+    ITINERARY_RESULT_CACHE_MAX_BYTES,
+    ITINERARY_RESULT_CACHE_TTL_SECONDS,
+    budget_bucket_ratio=ITINERARY_RESULT_BUDGET_BUCKET_RATIO,
+    cache=local_or_shared_cache(SHARED_ITINERARY_RESULTS, ITINERARY_RESULT_CACHE_MAX_BYTES, ITINERARY_RESULT_CACHE_TTL_SECONDS)
+)
+
+# Generation retries carrying the same Idempotency-Key replay the first result
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+idempotency_store = IdempotencyStore(
+    idempotency_keys,
+    ttl_seconds=IDEMPOTENCY_KEY_TTL_SECONDS,
+    wait_seconds=IDEMPOTENCY_WAIT_SECONDS
+)
+
+# Where new anonymous itineraries are written:
+#   mongo - straight into temporary_itineraries
+#   local - an SQLite file on this host, promoted to MongoDB on prepare_auth/convert
+#           or after SESSION_PROMOTE_AFTER_VIEWS reads (needs session-sticky routing across hosts)
+SESSION_STORE = os.getenv("SESSION_STORE", "mongo")
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "anonymous_sessions.db")
+SESSION_PROMOTE_AFTER_VIEWS = int(os.getenv("SESSION_PROMOTE_AFTER_VIEWS", "3"))
+local_sessions = LocalSessionStore(SESSION_STORE_PATH) if SESSION_STORE == "local" else None
+
+# Group temporary itinerary inserts into insert_many batches (SESSION_STORE=mongo only).
+# With ack "queued" a crash loses at most WRITE_BEHIND_MAX_DELAY_MS of generated itineraries;
+# with "flushed" each request waits for its batch to be written.
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "50"))
+WRITE_BEHIND_ACK = os.getenv("WRITE_BEHIND_ACK", "queued")
+write_behind = WriteBehindQueue(
+    temporary_itineraries,
+    max_batch=WRITE_BEHIND_MAX_BATCH,
+    max_delay=WRITE_BEHIND_MAX_DELAY_MS / 1000,
+    ack=WRITE_BEHIND_ACK
+) if WRITE_BEHIND_ENABLED and local_sessions is None else None
+
+# Funnel events (generation -> prepare-auth -> conversion), written in the background in batches of
+# ANALYTICS_MAX_BATCH or every ANALYTICS_FLUSH_SECONDS and rolled up per hour (see analytics.py)
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "true").lower() == "true"
+ANALYTICS_MAX_BATCH = int(os.getenv("ANALYTICS_MAX_BATCH", "500"))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "5"))
+ANALYTICS_MAX_BUFFER = int(os.getenv("ANALYTICS_MAX_BUFFER", "10000"))
+analytics = AnalyticsBuffer(
+    database,
+    max_batch=ANALYTICS_MAX_BATCH,
+    flush_interval=ANALYTICS_FLUSH_SECONDS,
+    max_buffer=ANALYTICS_MAX_BUFFER
+) if ANALYTICS_ENABLED else None
+
+def track_event(event: str, **properties: Any):
+    """Fire-and-forget analytics event"""
+    if analytics is not None:
+        analytics.track(event, **properties)
+
+async def save_anonymous_itinerary(session_id: str, document: Dict[str, Any]):
+    """Persist a new anonymous itinerary (already in storage form) in the configured tier"""
+    if local_sessions is not None:
+        await local_sessions.put(session_id, document, document["expires_at"])
+    elif write_behind is not None:
+        await write_behind.add(session_id, document)
+    else:
+        await temporary_itineraries.insert_one(document)
+
+async def find_local_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """A session not in MongoDB yet (storage form): queued for write-behind, or in the local tier"""
+    if write_behind is not None:
+        return write_behind.get(session_id)
+    if local_sessions is None:
+        return None
+    return await local_sessions.get(session_id)
+
+async def record_session_view(session_id: str):
+    """Count a view of a local-tier session, cached or not, and promote popular ones to MongoDB"""
+    if local_sessions is not None and await local_sessions.record_view(session_id) >= SESSION_PROMOTE_AFTER_VIEWS:
+        await local_sessions.promote(session_id, temporary_itineraries)
+
+async def promote_session(session_id: str):
+    """Make sure a session about to be claimed lives in MongoDB"""
+    if local_sessions is not None:
+        await local_sessions.promote(session_id, temporary_itineraries)
+    elif write_behind is not None:
+        await write_behind.persist(session_id)
 
-# Create TTL index for temporary itineraries (auto-cleanup)
+# Watch itinerary writes made by other workers/pods and drop stale local cache entries (needs a replica set)
+CHANGE_STREAM_INVALIDATION = os.getenv("CHANGE_STREAM_INVALIDATION", "false").lower() == "true"
+cache_invalidator = ChangeStreamInvalidator(
+    database, [temporary_itineraries.name, permanent_itineraries.name]
+) if CHANGE_STREAM_INVALIDATION else None
+
+# Drop cached itinerary bodies made stale by a write from any worker
+if cache_invalidator is not None:
+    cache_invalidator.subscribe(session_cache_subscriber(itinerary_cache, temporary_itineraries.name))
+
+def anonymous_session_filter(session_id: str) -> Dict[str, Any]:
+    """Filter for a session's itinerary that has not been converted yet"""
+    return {"session_id": storage_schema.session_match(session_id), "status": {"$ne": PERMANENT_STATUS}}
+
+# Fail startup if any hot query would scan a collection (see indexes.HOT_QUERIES)
+MONGO_INDEX_DIAGNOSTICS = os.getenv("MONGO_INDEX_DIAGNOSTICS", "false").lower() == "true"
+
+# Reconcile declared indexes (TTL cleanup, session and user lookups)
 async def create_indexes():
     try:
-        await temporary_itineraries.create_index(
-            "expires_at", 
-            expireAfterSeconds=0
-        )
-        print("✅ TTL index created for temporary_itineraries")
+        # Workers only create missing indexes; drifted ones are rebuilt by `python indexes.py` (one process)
+        report = await reconcile_indexes(database, rebuild=False)
+        print(f"✅ Indexes reconciled: {len(report['created'])} created, {len(report['unchanged'])} unchanged")
+        if report["failed"]:
+            print(f"❌ Index creation failed: {', '.join(report['failed'])}")
+        if report["drifted"]:
+            print(f"Indexes differ from the registry (run `python indexes.py` to rebuild): {', '.join(report['drifted'])}")
+        if report["unmanaged"]:
+            print(f"Unmanaged indexes: {', '.join(report['unmanaged'])}")
     except Exception as e:
         print(f"Index creation warning: {e}")
+    
+    if MONGO_INDEX_DIAGNOSTICS:
+        plans = await run_index_diagnostics(database)
+        print(f"✅ Index diagnostics passed for {len(plans)} hot queries")
 
 # Auth0 Configuration
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN", "your-tenant.auth0.com")
@@ -65,21 +448,43 @@ AUTH0_ALGORITHMS = ["RS256"]
 # Security scheme
 security = HTTPBearer(auto_error=False)
 
-# JWKS cache
-jwks_cache = {"keys": None, "expires": 0}
+# JWKS cache (refetched after the TTL so rotated signing keys are picked up)
+JWKS_CACHE_TTL_SECONDS = float(os.getenv("JWKS_CACHE_TTL_SECONDS", "3600"))
+jwks_cache = local_or_shared_cache(SHARED_JWKS, 64 * 1024, JWKS_CACHE_TTL_SECONDS)
+# While Auth0 is unreachable, requests fail fast instead of each waiting for a fetch
+JWKS_FAILURE_TTL_SECONDS = float(os.getenv("JWKS_FAILURE_TTL_SECONDS", "30"))
+jwks_fetch_lock = asyncio.Lock()
 
-@lru_cache(maxsize=1)
-def get_jwks():
-    """Fetch and cache Auth0 JWKS"""
-    try:
-        response = requests.get(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json", timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching JWKS: {e}")
+def fetch_jwks() -> bytes:
+    response = requests.get(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json", timeout=30)
+    response.raise_for_status()
+    return response.content
+
+async def get_jwks():
+    """Fetch and cache Auth0 JWKS (one fetch at a time, off the event loop)"""
+    cached = jwks_cache.get("jwks")
+    if cached is not None:
+        return json.loads(cached)
+    if jwks_cache.peek("jwks_unavailable") is not None:
         return None
+    async with jwks_fetch_lock:
+        # Fetched, or failed, while this request waited for the lock
+        cached = jwks_cache.peek("jwks")
+        if cached is not None:
+            return json.loads(cached)
+        if jwks_cache.peek("jwks_unavailable") is not None:
+            return None
+        try:
+            content = await run_in_threadpool(fetch_jwks)
+            jwks = json.loads(content)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error fetching JWKS: {e}")
+            jwks_cache.set("jwks_unavailable", b"1", ttl=JWKS_FAILURE_TTL_SECONDS)
+            return None
+        jwks_cache.set("jwks", content)
+        return jwks
 
-def verify_token(token: str) -> Optional[Dict[str, Any]]:
+async def verify_token(token: str) -> Optional[Dict[str, Any]]:
     """Verify Auth0 JWT token"""
     try:
         # Get unverified header to find key ID
@@ -90,7 +495,7 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
             return None
             
         # Get JWKS
-        jwks = get_jwks()
+        jwks = await get_jwks()
         if not jwks:
             return None
             
@@ -130,7 +535,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if not credentials or not credentials.credentials:
         return None
         
-    payload = verify_token(credentials.credentials)
+    payload = await verify_token(credentials.credentials)
     if not payload:
         return None
         
@@ -171,7 +576,8 @@ class TravelForm(BaseModel):
     travel_theme: str
     party_size: int
     budget_per_person: float
-    currency: str = "USD"
+    currency: str = Field("USD", pattern=CURRENCY_PATTERN)  # ISO 4217 code
+    optimize_route: bool = False  # reorder destinations to minimize travel distance
 
 class TemporaryItinerary(BaseModel):
     session_id: str
@@ -186,6 +592,12 @@ class TemporaryItinerary(BaseModel):
 class ItineraryConversion(BaseModel):
     session_id: str
 
+# Largest batch accepted by /api/convert-itineraries
+MAX_BULK_CONVERSIONS = 50
+
+class BulkItineraryConversion(BaseModel):
+    session_ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_CONVERSIONS)
+
 # Existing models remain the same...
 class FlightOption(BaseModel):
     airline: str
@@ -220,6 +632,7 @@ class DestinationInfo(BaseModel):
     introduction: str
     packing_tips: List[str]
     cultural_notes: List[str]
+    _from_fallback: bool = PrivateAttr(default=False)
 
 class UtilityLinks(BaseModel):
     visa_info: Optional[str] = None
@@ -362,17 +775,44 @@ Only return the JSON, no additional text."""
         
         content = theme_specific_content.get(theme, default_content)
         
-        return DestinationInfo(
+        info = DestinationInfo(
             introduction=content["intro"],
             packing_tips=content["packing"],
             cultural_notes=content["culture"]
         )
+        info._from_fallback = True
+        return info
 
 # Initialize AI service
 ai_generator = AIContentGenerator()
 
+# AI destination guides by destinations, theme, duration and party size; 0 bytes disables
+DESTINATION_INFO_CACHE_MAX_BYTES = int(os.getenv("DESTINATION_INFO_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+DESTINATION_INFO_CACHE_TTL_SECONDS = float(os.getenv("DESTINATION_INFO_CACHE_TTL_SECONDS", str(24 * 3600)))
+destination_info_cache = local_or_shared_cache(
+    SHARED_DESTINATION_INFO, DESTINATION_INFO_CACHE_MAX_BYTES, DESTINATION_INFO_CACHE_TTL_SECONDS
+)
+
+async def get_destination_info(destinations: List[str], theme: str, duration_days: int, party_size: int) -> DestinationInfo:
+    """Destination info from the cache or the AI generator (fallback content is not cached)"""
+    key = json.dumps(
+        [[destination.strip().lower() for destination in destinations], theme.lower(), duration_days, party_size],
+        separators=(",", ":")
+    )
+    cached = destination_info_cache.get(key)
+    if cached is not None:
+        return DestinationInfo.model_validate_json(cached)
+    info = await ai_generator.generate_destination_info(destinations, theme, duration_days, party_size)
+    if not info._from_fallback:
+        destination_info_cache.set(key, info.model_dump_json().encode())
+    return info
+
 # Mock data generators remain the same but updated for multiple destinations...
 
+# Number of options shown to the user for each booking type
+MAX_FLIGHT_OPTIONS = 3
+MAX_HOTEL_OPTIONS = 3
+
 def generate_mock_flights(origin: str, destinations: List[str], theme: str, budget: float) -> List[FlightOption]:
     """Generate mock flight data for multiple destinations"""
     primary_destination = destinations[0] if destinations else "Multiple Cities"
@@ -411,24 +851,15 @@ def generate_mock_flights(origin: str, destinations: List[str], theme: str, budg
         )
     ]
     
-    return flights[:3]
+    return rank_flights(flights, budget, theme, k=MAX_FLIGHT_OPTIONS)
 
-def generate_mock_hotels(destinations: List[str], theme: str, budget: float, party_size: int) -> List[HotelOption]:
+def generate_mock_hotels(destinations: List[str], theme: str, budget: float, party_size: int, nights: int = 1) -> List[HotelOption]:
     """Generate mock hotel data for multiple destinations"""
     primary_destination = destinations[0] if destinations else "Multi-City"
     price_per_night = min(budget * 0.3 / party_size, 300)
     
-    theme_amenities = {
-        "Family": ["Pool", "Kids Club", "Playground", "Family Rooms"],
-        "Business": ["Business Center", "Conference Rooms", "Fast WiFi", "Airport Shuttle"],
-        "Luxury": ["Spa", "Concierge", "Fine Dining", "Butler Service"],
-        "Adventure": ["Fitness Center", "Bike Rental", "Tour Desk", "Outdoor Activities"],
-        "Budget": ["Free WiFi", "Continental Breakfast", "24hr Reception"],
-        "Honeymoon": ["Spa", "Room Service", "Romantic Dining", "Couples Massage"]
-    }
-    
     base_amenities = ["Free WiFi", "Air Conditioning", "Room Service"]
-    specific_amenities = theme_amenities.get(theme, ["Pool", "Restaurant"])
+    specific_amenities = THEME_AMENITIES.get(theme, DEFAULT_THEME_AMENITIES)
     
     hotels = [
         HotelOption(
@@ -457,7 +888,7 @@ def generate_mock_hotels(destinations: List[str], theme: str, budget: float, par
         )
     ]
     
-    return hotels[:3]
+    return rank_hotels(hotels, budget, theme, party_size, nights, k=MAX_HOTEL_OPTIONS)
 
 def generate_mock_itinerary_days(start_date: date, end_date: date, destinations: List[str], theme: str) -> List[ItineraryDay]:
     """Generate mock daily itinerary for multiple destinations"""
@@ -610,6 +1041,22 @@ def generate_mock_itinerary_days(start_date: date, end_date: date, destinations:
     
     return days
 
+def build_itinerary_summary(form_data: Dict[str, Any], itinerary_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Small listing projection stored next to the full itinerary at write time"""
+    trip = itinerary_data.get("trip", {})
+    destinations = trip.get("destinations") or form_data["destinations"]
+    cities = [destination.split(",")[0].strip() for destination in destinations]
+    return {
+        "trip_name": f"{form_data['travel_theme']} trip to {', '.join(cities)}",
+        "start_date": form_data["start_date"],
+        "end_date": form_data["end_date"],
+        "destinations": destinations,
+        "theme": form_data["travel_theme"],
+        "budget_per_person": form_data.get("budget_per_person"),
+        "currency": form_data.get("currency", "USD"),
+        "party_size": form_data.get("party_size")
+    }
+
 def generate_mock_utility_links(destinations: List[str]) -> UtilityLinks:
     """Generate mock utility links for multiple destinations"""
     return UtilityLinks(
@@ -619,82 +1066,162 @@ def generate_mock_utility_links(destinations: List[str]) -> UtilityLinks:
         transportation="https://uber.com/cities"
     )
 
+async def compose_itinerary_data(form_data: TravelForm, duration_days: int) -> Tuple[Dict[str, Any], bool]:
+    """Generate the itinerary payload; the flag is set when destination info is the AI fallback"""
+    # Visit destinations in the shortest order when requested
+    if form_data.optimize_route:
+        route = optimize_route(form_data.origin_city, form_data.destinations)
+    else:
+        route = RoutePlan(list(form_data.destinations), None, False)
+    destinations = route.destinations
+    
+    # Generate data in parallel
+    async def generate_all_data():
+        ai_destination_task = get_destination_info(
+            destinations,
+            form_data.travel_theme,
+            duration_days,
+            form_data.party_size
+        )
+    
+        flights = generate_mock_flights(
+            form_data.origin_city, 
+            destinations, 
+            form_data.travel_theme, 
+            form_data.budget_per_person
+        )
+    
+        hotels = generate_mock_hotels(
+            destinations,
+            form_data.travel_theme,
+            form_data.budget_per_person,
+            form_data.party_size,
+            nights=max(duration_days - 1, 1)
+        )
+    
+        itinerary_days = generate_mock_itinerary_days(
+            form_data.start_date,
+            form_data.end_date,
+            destinations,
+            form_data.travel_theme
+        )
+    
+        utility_links = generate_mock_utility_links(destinations)
+    
+        destination_info = await ai_destination_task
+    
+        return flights, hotels, itinerary_days, destination_info, utility_links
+    
+    flights, hotels, itinerary_days, destination_info, utility_links = await generate_all_data()
+    
+    # Compile the complete itinerary
+    itinerary_data = {
+        "user": {
+            "name": form_data.user_name,
+            "budget": form_data.budget_per_person,
+            "currency": form_data.currency,
+            "theme": form_data.travel_theme,
+            "party_size": form_data.party_size
+        },
+        "trip": {
+            "origin": form_data.origin_city,
+            "destination": ", ".join(destinations),
+            "destinations": destinations,
+            "start_date": form_data.start_date.strftime("%Y-%m-%d"),
+            "end_date": form_data.end_date.strftime("%Y-%m-%d"),
+            "duration_days": duration_days,
+            "route_optimized": route.optimized,
+            "route_distance_km": route.distance_km
+        },
+        "flights": [flight.dict() for flight in flights],
+        "accommodations": [hotel.dict() for hotel in hotels],
+        "itinerary_days": [day.dict() for day in itinerary_days],
+        "destination_info": destination_info.dict(),
+        "utility_links": utility_links.dict()
+    }
+    
+    return itinerary_data, destination_info._from_fallback
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
     await create_indexes()
+    # Always loaded: zstd blobs written before a rollback to none/zlib must stay readable
+    await itinerary_codec.load_dictionaries(storage_dictionaries)
+    if itinerary_codec.codec == "zstd":
+        print(f"✅ Itinerary storage codec: zstd (dictionary {itinerary_codec.active_dictionary or 'none'})")
+    if local_sessions is not None:
+        local_sessions.start()
+        print(f"✅ Anonymous sessions: local tier at {SESSION_STORE_PATH}")
+    if cache_invalidator is not None:
+        cache_invalidator.start()
+        print("✅ Change-stream cache invalidation started")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued writes and release local resources on shutdown"""
+    if cache_invalidator is not None:
+        await cache_invalidator.stop()
+    if write_behind is not None:
+        await write_behind.close()
+    if analytics is not None:
+        await analytics.close()
+    if local_sessions is not None:
+        await local_sessions.close()
+    if shared_cache is not None:
+        shared_cache.close()
 
 @app.get("/")
 async def root():
     return {"message": "Dora Travel API v2.0 with Auth & Temporary Storage!"}
 
 @app.post("/api/generate-itinerary", response_model=TravelItinerary)
-async def generate_itinerary(form_data: TravelForm):
+async def generate_itinerary(
+    form_data: TravelForm,
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255)
+):
     """Generate a travel itinerary and store temporarily (7 days + 1 day buffer)"""
+    claimed = False
     try:
+        if idempotency_key is not None:
+            fingerprint = request_fingerprint(form_data.model_dump_json().encode())
+            replayed = await idempotency_store.begin(idempotency_key, fingerprint)
+            if replayed is not None:
+                # Served from the key's record: the session may since have been converted or expired
+                if replayed.response is not None:
+                    response = replayed_generation_response(replayed.response, accept, accept_encoding)
+                else:
+                    response = await get_itinerary_by_session(replayed.result, None, None, accept, accept_encoding, None)
+                    response.headers["Cache-Control"] = GENERATED_CACHE_CONTROL
+                response.headers["Idempotent-Replayed"] = "true"
+                return response
+            claimed = True
+        
         duration_days = (form_data.end_date - form_data.start_date).days + 1
         session_id = str(uuid.uuid4())
         
-        # Generate data in parallel
-        async def generate_all_data():
-            ai_destination_task = ai_generator.generate_destination_info(
-                form_data.destinations,
-                form_data.travel_theme,
-                duration_days,
-                form_data.party_size
-            )
-            
-            flights = generate_mock_flights(
-                form_data.origin_city, 
-                form_data.destinations, 
-                form_data.travel_theme, 
-                form_data.budget_per_person
-            )
-            
-            hotels = generate_mock_hotels(
-                form_data.destinations,
-                form_data.travel_theme,
-                form_data.budget_per_person,
-                form_data.party_size
-            )
-            
-            itinerary_days = generate_mock_itinerary_days(
-                form_data.start_date,
-                form_data.end_date,
-                form_data.destinations,
-                form_data.travel_theme
-            )
-            
-            utility_links = generate_mock_utility_links(form_data.destinations)
-            
-            destination_info = await ai_destination_task
-            
-            return flights, hotels, itinerary_days, destination_info, utility_links
-        
-        flights, hotels, itinerary_days, destination_info, utility_links = await generate_all_data()
-        
-        # Compile the complete itinerary
-        itinerary_data = {
-            "user": {
-                "name": form_data.user_name,
-                "budget": form_data.budget_per_person,
-                "currency": form_data.currency,
-                "theme": form_data.travel_theme,
-                "party_size": form_data.party_size
-            },
-            "trip": {
-                "origin": form_data.origin_city,
-                "destination": ", ".join(form_data.destinations),
-                "destinations": form_data.destinations,
-                "start_date": form_data.start_date.strftime("%Y-%m-%d"),
-                "end_date": form_data.end_date.strftime("%Y-%m-%d"),
-                "duration_days": duration_days
-            },
-            "flights": [flight.dict() for flight in flights],
-            "accommodations": [hotel.dict() for hotel in hotels],
-            "itinerary_days": [day.dict() for day in itinerary_days],
-            "destination_info": destination_info.dict(),
-            "utility_links": utility_links.dict()
+        # Identical trips (up to traveller name and budget band) reuse a recent generation
+        itinerary_data = itinerary_results.get(form_data.model_dump())
+        reused = itinerary_data is not None
+        if itinerary_data is None:
+            itinerary_data, from_fallback = await compose_itinerary_data(form_data, duration_days)
+            # Mock content served while the LLM is failing is not worth keeping
+            if not from_fallback:
+                itinerary_results.set(form_data.model_dump(), itinerary_data)
+        
+        stored_form_data = {
+            "user_name": form_data.user_name,
+            "origin_city": form_data.origin_city,
+            "destinations": form_data.destinations,
+            "start_date": form_data.start_date.strftime("%Y-%m-%d"),
+            "end_date": form_data.end_date.strftime("%Y-%m-%d"),
+            "travel_theme": form_data.travel_theme,
+            "party_size": form_data.party_size,
+            "budget_per_person": form_data.budget_per_person,
+            "currency": form_data.currency,
+            "optimize_route": form_data.optimize_route
         }
         
         # Store temporarily (7 days + buffer)
@@ -702,142 +1229,773 @@ async def generate_itinerary(form_data: TravelForm):
             "session_id": session_id,
             "user_email": None,
             "user_id": None,
-            "form_data": {
-                "user_name": form_data.user_name,
-                "origin_city": form_data.origin_city,
-                "destinations": form_data.destinations,
-                "start_date": form_data.start_date.strftime("%Y-%m-%d"),
-                "end_date": form_data.end_date.strftime("%Y-%m-%d"),
-                "travel_theme": form_data.travel_theme,
-                "party_size": form_data.party_size,
-                "budget_per_person": form_data.budget_per_person,
-                "currency": form_data.currency
-            },
-            "generated_itinerary": itinerary_data,
+            "form_data": stored_form_data,
+            **itinerary_codec.store(itinerary_data),
+            "summary": build_itinerary_summary(stored_form_data, itinerary_data),
             "created_at": datetime.utcnow(),
             "expires_at": datetime.utcnow() + timedelta(days=7),  # 7 days
             "status": "temporary"
         }
         
-        await temporary_itineraries.insert_one(temp_itinerary)
-        
         # Return itinerary with session_id
         itinerary = TravelItinerary(
             session_id=session_id,
             **itinerary_data
         )
         
-        return itinerary
+        # The body never changes, so its validator and compressed forms are computed once here
+        body = itinerary.model_dump_json().encode()
+        temp_itinerary["etag"] = compute_etag(body)
+        precompressed = precompress(body, PRECOMPRESSED_ENCODINGS)
+        if precompressed:
+            temp_itinerary["compressed_bodies"] = {
+                encoding: Binary(compressed) for encoding, compressed in precompressed.items()
+            }
+        bodies = {(JSON, IDENTITY): body, **{(JSON, encoding): compressed for encoding, compressed in precompressed.items()}}
         
+        await save_anonymous_itinerary(session_id, storage_schema.to_storage(temp_itinerary))
+        if claimed:
+            replay_body = precompressed.get("gzip") or compress(body, "gzip", stored=True)
+            await idempotency_store.complete(idempotency_key, fingerprint, session_id, replay_body)
+            claimed = False
+        track_event(
+            ITINERARY_GENERATED,
+            session_id=session_id,
+            destinations=form_data.destinations,
+            theme=form_data.travel_theme,
+            duration_days=duration_days,
+            party_size=form_data.party_size,
+            reused=reused
+        )
+        
+        media_type = negotiate_media_type(accept)
+        representation = (media_type, negotiate_encoding(accept_encoding))
+        if representation not in bodies:
+            bodies[representation] = serialize_itinerary(itinerary, representation)
+        
+        # The first shared-link view is served from memory
+        cache_itinerary_bodies(session_id, temp_itinerary["etag"], temp_itinerary["expires_at"], bodies)
+        
+        return itinerary_response(bodies[representation], temp_itinerary["etag"], representation, None, GENERATED_CACHE_CONTROL)
+        
+    except IdempotencyKeyMismatch:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    except IdempotencyKeyInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed",
+            headers={"Retry-After": "5"}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating itinerary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating itinerary: {str(e)}")
+    finally:
+        if claimed:
+            # Failed or cancelled (client disconnect) before completing: let a retry generate again
+            await asyncio.shield(idempotency_store.abandon(idempotency_key))
 
 @app.get("/api/itinerary/{session_id}")
-async def get_itinerary_by_session(session_id: str):
+async def get_itinerary_by_session(
+    session_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER)
+):
     """Retrieve itinerary by session ID"""
     try:
-        temp_itinerary = await temporary_itineraries.find_one({"session_id": session_id})
+        reads = read_router.reads("itinerary", consistency_token)
+        # Counted before the cache lookup: generation pre-warms the cache, so most views never reach the tier
+        await record_session_view(session_id)
+        
+        # ?fields=trip,flights reads and returns only those parts of the itinerary
+        selected = parse_fields(fields)
+        if selected is not None:
+            document = await find_local_session(session_id) or await reads.find_one(
+                temporary_itineraries, anonymous_session_filter(session_id), fields_projection(selected)
+            )
+            if document is None:
+                raise HTTPException(status_code=404, detail="Itinerary not found or expired")
+            document = storage_schema.from_storage(document)
+            await itinerary_codec.ensure_dictionary(document)
+            payload = itinerary_codec.load({PAYLOAD_FIELD: {}, **document})
+            return negotiated_response({"session_id": session_id, **select_fields(payload, selected)}, accept)
+        
+        media_type = negotiate_media_type(accept)
+        encoding = negotiate_encoding(accept_encoding)
+        representation = (media_type, encoding)
+        
+        # Repeat views skip both MongoDB and model validation
+        cached = itinerary_cache.get(session_id)
+        if cached is not None and representation in cached.bodies:
+            return itinerary_response(cached.bodies[representation], cached.etag, representation, if_none_match)
+        
+        # Sessions not yet promoted to MongoDB are served from the local tier
+        local = await find_local_session(session_id)
+        if local is not None:
+            return await stored_itinerary_response(session_id, local, representation, if_none_match)
+        
+        # Revalidation reads only the stored ETag (covered by the session_id_etag index)
+        if if_none_match:
+            stored = await reads.find_one(temporary_itineraries, anonymous_session_filter(session_id), {"_id": 0, "etag": 1})
+            if stored and itinerary_matches(if_none_match, stored.get("etag"), media_type):
+                return itinerary_response(b"", stored["etag"], representation, if_none_match)
+        
+        # Stream a JSON body compressed at generation time without touching the payload
+        bodies_field = storage_schema.field("compressed_bodies")
+        if media_type == JSON and encoding in PRECOMPRESSED_ENCODINGS:
+            stored = await reads.find_one(
+                temporary_itineraries,
+                anonymous_session_filter(session_id),
+                {"_id": 0, "etag": 1, "expires_at": 1, f"{bodies_field}.{encoding}": 1}
+            )
+            if not stored:
+                raise HTTPException(status_code=404, detail="Itinerary not found or expired")
+            compressed = stored.get(bodies_field, {}).get(encoding)
+            if compressed is not None and stored.get("etag"):
+                compressed = bytes(compressed)
+                # A lagging secondary may return a version already invalidated from the cache
+                if reads.from_primary:
+                    cache_itinerary_bodies(session_id, stored["etag"], stored["expires_at"], {representation: compressed})
+                return itinerary_response(compressed, stored["etag"], representation, if_none_match)
+        
+        temp_itinerary = await reads.find_one(temporary_itineraries, anonymous_session_filter(session_id), {bodies_field: 0})
         
         if not temp_itinerary:
             raise HTTPException(status_code=404, detail="Itinerary not found or expired")
+        temp_itinerary = storage_schema.from_storage(temp_itinerary)
         
-        itinerary_data = temp_itinerary["generated_itinerary"]
+        await itinerary_codec.ensure_dictionary(temp_itinerary)
+        itinerary_data = itinerary_codec.load(temp_itinerary)
         itinerary = TravelItinerary(
             session_id=session_id,
             **itinerary_data
         )
         
-        return itinerary
+        body = itinerary.model_dump_json().encode()
+        etag = temp_itinerary.get("etag")
+        if etag is None:
+            # Documents written before ETags existed get theirs on first read
+            etag = compute_etag(body)
+            await temporary_itineraries.update_one({"_id": temp_itinerary["_id"]}, {"$set": {"etag": etag}})
+        
+        bodies = {(JSON, IDENTITY): body}
+        if representation not in bodies:
+            # Binary media types, and codings without a stored body, are rendered per request
+            bodies[representation] = serialize_itinerary(itinerary, representation)
+        if reads.from_primary:
+            cache_itinerary_bodies(session_id, etag, temp_itinerary["expires_at"], bodies)
+        return itinerary_response(bodies[representation], etag, representation, if_none_match)
         
+    except HTTPException:
+        raise
+    except (InvalidFieldSelection, InvalidConsistencyToken) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error retrieving itinerary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error retrieving itinerary: {str(e)}")
 
+@app.get("/api/itinerary/{session_id}/days")
+async def get_itinerary_days(
+    session_id: str,
+    first_day: int = Query(1, alias="from", ge=1),
+    last_day: Optional[int] = Query(None, alias="to", ge=1),
+    accept: Optional[str] = Header(None),
+    consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER)
+):
+    """Retrieve a range of itinerary days (1-based, inclusive) by session ID"""
+    try:
+        last_day = first_day if last_day is None else last_day
+        if last_day < first_day:
+            raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+        if last_day - first_day + 1 > MAX_DAYS_PER_PAGE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_DAYS_PER_PAGE} days can be requested at once")
+        
+        reads = read_router.reads("itinerary", consistency_token)
+        await record_session_view(session_id)
+        document = await find_local_session(session_id) or await reads.find_one(
+            temporary_itineraries, anonymous_session_filter(session_id), days_projection(first_day, last_day)
+        )
+        if document is None:
+            raise HTTPException(status_code=404, detail="Itinerary not found or expired")
+        document = storage_schema.from_storage(document)
+        
+        # Plain payloads arrive pre-sliced; codec blobs are decoded whole and sliced here
+        await itinerary_codec.ensure_dictionary(document)
+        payload = itinerary_codec.load({PAYLOAD_FIELD: {}, **document})
+        return negotiated_response({
+            "session_id": session_id,
+            "duration_days": payload.get("trip", {}).get("duration_days"),
+            "from": first_day,
+            "to": last_day,
+            "itinerary_days": select_days(payload, first_day, last_day)
+        }, accept)
+        
+    except HTTPException:
+        raise
+    except InvalidConsistencyToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error retrieving itinerary days: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving itinerary days: {str(e)}")
+
 @app.post("/api/prepare-auth/{session_id}")
 async def prepare_auth(session_id: str):
     """Extend expiry before authentication (1 day buffer)"""
     try:
-        result = await temporary_itineraries.update_one(
-            {"session_id": session_id},
+        await promote_session(session_id)
+        # The previous status tells whether this call moved the session into auth_pending
+        previous = await temporary_itineraries.find_one_and_update(
+            anonymous_session_filter(session_id),
             {
                 "$set": {
                     "expires_at": datetime.utcnow() + timedelta(days=1),  # 1 day buffer
                     "status": "auth_pending"
                 }
-            }
+            },
+            projection={"_id": 0, "status": 1}
         )
         
-        if result.matched_count == 0:
+        # The expiry moved, so the cached entry's lifetime is stale
+        itinerary_cache.invalidate(session_id)
+        
+        if previous is None:
             raise HTTPException(status_code=404, detail="Itinerary not found")
         
+        # Repeated calls (retries, re-opened login dialogs) only extend the expiry
+        if previous.get("status") != "auth_pending":
+            track_event(AUTH_PREPARED, session_id=session_id)
         return {"success": True, "message": "Itinerary prepared for authentication"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error preparing auth: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error preparing auth: {str(e)}")
 
+class ItineraryAlreadyClaimed(Exception):
+    """The session was converted by a different user"""
+
+async def find_converted_copy(session_id: str, current_user: Dict[str, Any]) -> Optional[str]:
+    """Split mode: the permanent copy of an already converted session, if this user owns it"""
+    existing = await permanent_itineraries.find_one(
+        {"original_session_id": storage_schema.session_match(session_id)},
+        {"_id": 1, "user_id": 1}
+    )
+    if not existing:
+        return None
+    if existing["user_id"] != current_user["user_id"]:
+        raise ItineraryAlreadyClaimed(session_id)
+    return str(existing["_id"])
+
+async def record_converted(current_user: Dict[str, Any], converted: List[Dict[str, Any]]):
+    """Fold itineraries this request converted into the user's trip summary and analytics.
+
+    The conversion itself has succeeded at this point; a failed summary update
+    is logged (`python user_summary.py rebuild --user ...` repairs it).
+    """
+    for itinerary in converted:
+        summary = itinerary.get("summary") or {}
+        track_event(
+            ITINERARY_CONVERTED,
+            user_id=current_user["user_id"],
+            itinerary_id=str(itinerary["_id"]),
+            destinations=summary.get("destinations"),
+            theme=summary.get("theme")
+        )
+    try:
+        await record_conversions(users, current_user["user_id"], converted)
+    except Exception as e:
+        print(f"Error updating trip summary for {current_user['user_id']}: {str(e)}")
+
+async def convert_session_by_copy(session_id: str, current_user: Dict[str, Any]) -> Optional[str]:
+    """Split mode: copy into `itineraries`, then delete the temporary record"""
+    # Find temporary itinerary
+    temp_itinerary = await temporary_itineraries.find_one({"session_id": storage_schema.session_match(session_id)})
+    
+    if not temp_itinerary:
+        return await find_converted_copy(session_id, current_user)
+    temp_itinerary = storage_schema.from_storage(temp_itinerary)
+    await itinerary_codec.ensure_dictionary(temp_itinerary)
+    
+    # Create permanent itinerary
+    permanent_itinerary = {
+        "user_id": current_user["user_id"],
+        "user_email": current_user["email"],
+        "form_data": temp_itinerary["form_data"],
+        # Copied as stored; compressed payloads are not decoded here
+        **itinerary_codec.stored_fields(temp_itinerary),
+        "summary": temp_itinerary.get("summary") or build_itinerary_summary(
+            temp_itinerary["form_data"], itinerary_codec.load(temp_itinerary)
+        ),
+        "created_at": temp_itinerary["created_at"],
+        "converted_at": datetime.utcnow(),
+        "original_session_id": session_id
+    }
+    
+    # Insert permanent record (original_session_id is unique, so a double-submit lands here once)
+    try:
+        result = await permanent_itineraries.insert_one(storage_schema.to_storage(permanent_itinerary))
+        itinerary_id = result.inserted_id
+        await record_converted(current_user, [{"_id": itinerary_id, "summary": permanent_itinerary["summary"]}])
+    except DuplicateKeyError:
+        itinerary_id = await find_converted_copy(session_id, current_user)
+    
+    # Delete temporary record
+    await temporary_itineraries.delete_one({"session_id": storage_schema.session_match(session_id)})
+    
+    return str(itinerary_id)
+
+async def convert_session_in_place(session_id: str, current_user: Dict[str, Any]) -> Optional[str]:
+    """Single mode: one atomic status flip, idempotent per session_id"""
+    now = datetime.utcnow()
+    converted = await temporary_itineraries.find_one_and_update(
+        anonymous_session_filter(session_id),
+        {
+            "$set": {
+                "status": PERMANENT_STATUS,
+                "user_id": current_user["user_id"],
+                storage_schema.field("user_email"): current_user["email"],
+                storage_schema.field("converted_at"): now
+            },
+            # No expiry: the TTL index ignores documents without expires_at.
+            # Shared-link bodies are only served for anonymous itineraries.
+            "$unset": {"expires_at": "", storage_schema.field("compressed_bodies"): ""}
+        },
+        projection={"_id": 1, "summary": 1}
+    )
+    if converted:
+        await record_converted(current_user, [converted])
+        return str(converted["_id"])
+    
+    # Already converted (double-submit or retry): same answer for the same user
+    existing = await temporary_itineraries.find_one(
+        {"session_id": storage_schema.session_match(session_id), "status": PERMANENT_STATUS},
+        {"_id": 1, "user_id": 1}
+    )
+    if not existing:
+        return None
+    if existing["user_id"] != current_user["user_id"]:
+        raise ItineraryAlreadyClaimed(session_id)
+    return str(existing["_id"])
+
+async def issue_consistency_token(response: Response, current_user: Dict[str, Any]):
+    """Let the client read its own conversion from secondaries via X-Consistency-Token"""
+    collection, owned = owned_itineraries()
+    token = await read_router.token_after_write(collection, {"user_id": current_user["user_id"], **owned})
+    if token is not None:
+        response.headers[CONSISTENCY_TOKEN_HEADER] = token
+
 @app.post("/api/convert-itinerary")
 async def convert_itinerary(
     conversion: ItineraryConversion,
+    response: Response,
     current_user: Dict[str, Any] = Depends(require_auth)
 ):
     """Convert temporary itinerary to permanent storage after authentication"""
     try:
-        # Find temporary itinerary
-        temp_itinerary = await temporary_itineraries.find_one({"session_id": conversion.session_id})
+        await promote_session(conversion.session_id)
+        if ITINERARY_STORAGE_MODE == "single":
+            itinerary_id = await convert_session_in_place(conversion.session_id, current_user)
+        else:
+            itinerary_id = await convert_session_by_copy(conversion.session_id, current_user)
+        itinerary_cache.invalidate(conversion.session_id)
         
-        if not temp_itinerary:
+        if itinerary_id is None:
             raise HTTPException(status_code=404, detail="Temporary itinerary not found")
         
-        # Create permanent itinerary
-        permanent_itinerary = {
+        await issue_consistency_token(response, current_user)
+        return {
+            "success": True,
+            "message": "Itinerary successfully converted to permanent storage",
+            "itinerary_id": itinerary_id
+        }
+        
+    except ItineraryAlreadyClaimed:
+        raise HTTPException(status_code=409, detail="Itinerary already claimed by another user")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error converting itinerary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error converting itinerary: {str(e)}")
+
+# Per-session outcomes of a bulk conversion
+CONVERTED, CONFLICT, NOT_FOUND = "converted", "conflict", "not_found"
+
+async def bulk_convert_by_copy(session_ids: List[str], current_user: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Split mode: one find per collection, one insert_many and one delete_many for the whole batch"""
+    results: Dict[str, Dict[str, Any]] = {}
+    
+    def record_copies(copies):
+        for copy in copies:
+            copy = storage_schema.from_storage(copy)
+            owned = copy["user_id"] == current_user["user_id"]
+            results[copy["original_session_id"]] = {
+                "status": CONVERTED if owned else CONFLICT,
+                "itinerary_id": str(copy["_id"]) if owned else None
+            }
+    
+    record_copies(await permanent_itineraries.find(
+        {"original_session_id": storage_schema.sessions_match(session_ids)},
+        {"_id": 1, "user_id": 1, "original_session_id": 1}
+    ).to_list(length=None))
+    
+    pending = [session_id for session_id in session_ids if session_id not in results]
+    temp_itineraries = []
+    if pending:
+        temp_itineraries = await temporary_itineraries.find(
+            {"session_id": storage_schema.sessions_match(pending)}
+        ).to_list(length=None)
+    
+    converted_at = datetime.utcnow()
+    documents, document_sessions = [], []
+    for temp_itinerary in map(storage_schema.from_storage, temp_itineraries):
+        await itinerary_codec.ensure_dictionary(temp_itinerary)
+        documents.append(storage_schema.to_storage({
             "user_id": current_user["user_id"],
             "user_email": current_user["email"],
             "form_data": temp_itinerary["form_data"],
-            "generated_itinerary": temp_itinerary["generated_itinerary"],
+            **itinerary_codec.stored_fields(temp_itinerary),
+            "summary": temp_itinerary.get("summary") or build_itinerary_summary(
+                temp_itinerary["form_data"], itinerary_codec.load(temp_itinerary)
+            ),
             "created_at": temp_itinerary["created_at"],
-            "converted_at": datetime.utcnow(),
-            "original_session_id": conversion.session_id
+            "converted_at": converted_at,
+            "original_session_id": temp_itinerary["session_id"]
+        }))
+        document_sessions.append(temp_itinerary["session_id"])
+    
+    if documents:
+        raced = []
+        try:
+            await permanent_itineraries.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent conversion won these sessions; report whoever owns them now
+            raced = [document_sessions[error["index"]] for error in e.details["writeErrors"] if error["code"] == 11000]
+            if len(raced) != len(e.details["writeErrors"]):
+                raise
+        for session_id, document in zip(document_sessions, documents):
+            if session_id not in raced:
+                results[session_id] = {"status": CONVERTED, "itinerary_id": str(document["_id"])}
+        await record_converted(current_user, [
+            document for session_id, document in zip(document_sessions, documents) if session_id not in raced
+        ])
+        if raced:
+            record_copies(await permanent_itineraries.find(
+                {"original_session_id": storage_schema.sessions_match(raced)},
+                {"_id": 1, "user_id": 1, "original_session_id": 1}
+            ).to_list(length=None))
+    
+    # Every session that now has a permanent copy no longer needs its temporary record
+    claimed = [session_id for session_id, result in results.items() if result["status"] != NOT_FOUND]
+    if claimed:
+        await temporary_itineraries.delete_many({"session_id": storage_schema.sessions_match(claimed)})
+    
+    return results
+
+async def bulk_convert_in_place(session_ids: List[str], current_user: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Single mode: one update_many flips every unclaimed session, one find reports the outcome"""
+    match = storage_schema.sessions_match(session_ids)
+    # Stored with millisecond precision; identifies the documents this request flipped
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    await temporary_itineraries.update_many(
+        {"session_id": match, "status": {"$ne": PERMANENT_STATUS}},
+        {
+            "$set": {
+                "status": PERMANENT_STATUS,
+                "user_id": current_user["user_id"],
+                storage_schema.field("user_email"): current_user["email"],
+                storage_schema.field("converted_at"): now
+            },
+            "$unset": {"expires_at": "", storage_schema.field("compressed_bodies"): ""}
         }
+    )
+    
+    results: Dict[str, Dict[str, Any]] = {}
+    newly_converted = []
+    documents = await temporary_itineraries.find(
+        {"session_id": match},
+        {"_id": 1, "session_id": 1, "user_id": 1, "status": 1, "summary": 1, storage_schema.field("converted_at"): 1}
+    ).to_list(length=None)
+    for document in map(storage_schema.from_storage, documents):
+        owned = document["status"] == PERMANENT_STATUS and document["user_id"] == current_user["user_id"]
+        results[document["session_id"]] = {
+            "status": CONVERTED if owned else CONFLICT,
+            "itinerary_id": str(document["_id"]) if owned else None
+        }
+        if owned and document.get("converted_at") == now:
+            newly_converted.append(document)
+    await record_converted(current_user, newly_converted)
+    return results
+
+@app.post("/api/convert-itineraries")
+async def convert_itineraries(
+    conversion: BulkItineraryConversion,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(require_auth)
+):
+    """Convert several temporary itineraries (e.g. everything generated before signing up) at once"""
+    try:
+        session_ids = list(dict.fromkeys(conversion.session_ids))
+        for session_id in session_ids:
+            await promote_session(session_id)
+        if ITINERARY_STORAGE_MODE == "single":
+            results = await bulk_convert_in_place(session_ids, current_user)
+        else:
+            results = await bulk_convert_by_copy(session_ids, current_user)
+        for session_id in session_ids:
+            itinerary_cache.invalidate(session_id)
         
-        # Insert permanent record
-        result = await permanent_itineraries.insert_one(permanent_itinerary)
-        
-        # Delete temporary record
-        await temporary_itineraries.delete_one({"session_id": conversion.session_id})
-        
+        await issue_consistency_token(response, current_user)
         return {
             "success": True,
-            "message": "Itinerary successfully converted to permanent storage",
-            "itinerary_id": str(result.inserted_id)
+            "results": [
+                {"session_id": session_id, **results.get(session_id, {"status": NOT_FOUND, "itinerary_id": None})}
+                for session_id in session_ids
+            ]
         }
         
     except Exception as e:
-        print(f"Error converting itinerary: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error converting itinerary: {str(e)}")
+        print(f"Error converting itineraries: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error converting itineraries: {str(e)}")
+
+# Listing page sizes for /api/my-itineraries
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Server-side time limit for /api/my-itineraries/search queries
+SEARCH_MAX_TIME_MS = int(os.getenv("SEARCH_MAX_TIME_MS", "2000"))
+
+# Summary fields only; the full payload is served by /api/my-itineraries/{itinerary_id}
+ITINERARY_SUMMARY_PROJECTION = {
+    "_id": {"$toString": "$_id"},
+    "created_at": 1,
+    "summary": 1,
+    # Legacy documents predate the stored summary and fall back to their form data
+    "form_data": {"$cond": [{"$ifNull": ["$summary", False]}, "$$REMOVE", "$form_data"]}
+}
+
+async def merge_archived_listing(
+    documents: List[Dict[str, Any]],
+    user_id: str,
+    keyset: Dict[str, Any],
+    limit: int,
+    archive_match: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Interleave archived itineraries into a listing page in keyset order.
+
+    Archived keys come from the archive's index alone; summaries are only read
+    for the archived itineraries that actually land on the page.
+    """
+    archived_keys = await itinerary_archive.page_keys(user_id, keyset, limit, archive_match)
+    if not archived_keys:
+        return documents
+    # Mid-archival a document can exist in both collections; the hot copy wins
+    hot_ids = {document["_id"] for document in documents}
+    entries = [((document["created_at"], ObjectId(document["_id"])), document) for document in documents]
+    entries += [(key, None) for key in archived_keys if str(key[1]) not in hot_ids]
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    entries = entries[:limit]
+    
+    archived = await itinerary_archive.listing_documents([key[1] for key, document in entries if document is None])
+    return [
+        document if document is not None else archived[key[1]]
+        for key, document in entries
+        if document is not None or key[1] in archived
+    ]
+
+def summary_listing_item(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a projected itinerary into a listing item"""
+    summary = document.get("summary") or build_itinerary_summary(document["form_data"], {})
+    return {"_id": document["_id"], "created_at": document["created_at"], **summary}
+
+async def summary_page(
+    reads,
+    user_id: str,
+    cursor: Optional[str],
+    limit: int,
+    search: Optional[Dict[str, Any]] = None,
+    archive_search: Optional[Dict[str, Any]] = None,
+    max_time_ms: Optional[int] = None
+) -> Dict[str, Any]:
+    """One keyset page of a user's itinerary summaries (hot and archived), optionally filtered"""
+    collection, owned = owned_itineraries()
+    keyset = keyset_filter(cursor) if cursor else {}
+    match: Dict[str, Any] = {"user_id": user_id, **owned, **keyset, **(search or {})}
+    
+    # Fetch one extra document to know whether another page exists
+    pipeline = [
+        {"$match": match},
+        {"$sort": dict(KEYSET_SORT)},
+        {"$limit": limit + 1},
+        {"$project": ITINERARY_SUMMARY_PROJECTION}
+    ]
+    documents = await reads.aggregate(collection, pipeline, length=limit + 1, max_time_ms=max_time_ms)
+    documents = await merge_archived_listing(documents, user_id, keyset, limit + 1, archive_search)
+    
+    page = documents[:limit]
+    next_cursor = None
+    if len(documents) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last["created_at"], ObjectId(last["_id"]))
+    
+    return {
+        "itineraries": [summary_listing_item(document) for document in page],
+        "next_cursor": next_cursor
+    }
 
 @app.get("/api/my-itineraries")
-async def get_user_itineraries(current_user: Dict[str, Any] = Depends(require_auth)):
-    """Get authenticated user's permanent itineraries"""
+async def get_user_itineraries(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER),
+    current_user: Dict[str, Any] = Depends(require_auth)
+):
+    """Get a page of the authenticated user's itinerary summaries, newest first"""
     try:
-        cursor = permanent_itineraries.find({"user_id": current_user["user_id"]})
-        itineraries = await cursor.to_list(length=100)
-        
-        # Convert ObjectId to string
-        for itinerary in itineraries:
-            itinerary["_id"] = str(itinerary["_id"])
-        
-        return {"itineraries": itineraries}
+        reads = read_router.reads("my_itineraries", consistency_token)
+        page = await summary_page(reads, current_user["user_id"], cursor, limit)
+        return negotiated_response(page, accept)
         
+    except (InvalidCursor, InvalidConsistencyToken) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error retrieving user itineraries: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error retrieving user itineraries: {str(e)}")
 
+@app.get("/api/my-itineraries/search")
+async def search_user_itineraries(
+    q: Optional[str] = Query(None, max_length=200, description="Destination words"),
+    theme: Optional[str] = None,
+    when: Optional[str] = Query(None, description="upcoming or past"),
+    start_from: Optional[str] = Query(None, alias="from", description="Trips starting on or after (YYYY-MM-DD)"),
+    start_to: Optional[str] = Query(None, alias="to", description="Trips starting on or before (YYYY-MM-DD)"),
+    min_budget: Optional[float] = Query(None, ge=0),
+    max_budget: Optional[float] = Query(None, ge=0),
+    currency: Optional[str] = Query(None, pattern=CURRENCY_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER),
+    current_user: Dict[str, Any] = Depends(require_auth)
+):
+    """Search the authenticated user's itineraries by destination, theme, dates and budget, newest first"""
+    try:
+        search = ItinerarySearch(q, theme, when, start_from, start_to, min_budget, max_budget, currency)
+        reads = read_router.reads("my_itineraries", consistency_token)
+        page = await summary_page(
+            reads, current_user["user_id"], cursor, limit,
+            search=search_filter(search), archive_search=archive_search_filter(search),
+            max_time_ms=SEARCH_MAX_TIME_MS
+        )
+        return negotiated_response(page, accept)
+        
+    except (InvalidSearch, InvalidCursor, InvalidConsistencyToken) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutionTimeout:
+        raise HTTPException(status_code=503, detail="Search took too long; narrow it down with more filters")
+    except Exception as e:
+        print(f"Error searching user itineraries: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching user itineraries: {str(e)}")
+
+@app.get("/api/my-itineraries/summary")
+async def get_user_trip_summary(
+    accept: Optional[str] = Header(None),
+    consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER),
+    current_user: Dict[str, Any] = Depends(require_auth)
+):
+    """Trip count, next upcoming trip, total planned budget and recent destinations of the authenticated user"""
+    try:
+        reads = read_router.reads("my_itineraries", consistency_token)
+        document = await reads.find_one(users, {"_id": current_user["user_id"]}, {"trip_summary": 1})
+        collection, owned = owned_itineraries()
+        trip_summary = await trip_summary_view(users, current_user["user_id"], document, collection, owned)
+        return negotiated_response(trip_summary, accept)
+        
+    except InvalidConsistencyToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error retrieving trip summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving trip summary: {str(e)}")
+
+@app.get("/api/my-itineraries/{itinerary_id}")
+async def get_user_itinerary(
+    itinerary_id: str,
+    accept: Optional[str] = Header(None),
+    consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER),
+    current_user: Dict[str, Any] = Depends(require_auth)
+):
+    """Get one of the authenticated user's itineraries in full"""
+    try:
+        if not ObjectId.is_valid(itinerary_id):
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        
+        collection, owned = owned_itineraries()
+        itinerary = await read_router.reads("my_itineraries", consistency_token).find_one(
+            collection,
+            {"_id": ObjectId(itinerary_id), "user_id": current_user["user_id"], **owned},
+            {storage_schema.field("compressed_bodies"): 0}
+        )
+        if not itinerary:
+            itinerary = await itinerary_archive.find(ObjectId(itinerary_id), current_user["user_id"])
+        if not itinerary:
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        
+        itinerary = storage_schema.from_storage(itinerary)
+        itinerary.pop("compressed_bodies", None)
+        itinerary["_id"] = str(itinerary["_id"])
+        await itinerary_codec.ensure_dictionary(itinerary)
+        return negotiated_response(itinerary_codec.expand(itinerary), accept)
+        
+    except HTTPException:
+        raise
+    except InvalidConsistencyToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error retrieving user itinerary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving user itinerary: {str(e)}")
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "Dora Travel API v2.0", "auth_enabled": True}
 
+# Operator token for /api/metrics (sent as a bearer token); the endpoint is disabled while unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+async def require_operator(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Require the operator token"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not credentials or not secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail="Operator token required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@app.get("/api/metrics", dependencies=[Depends(require_operator)])
+async def metrics(slow_queries: bool = False):
+    """Operational counters for this worker (operators only); ?slow_queries=true adds recent slow-query shapes"""
+    return {
+        "itinerary_cache": itinerary_cache.stats(),
+        "destination_info_cache": destination_info_cache.stats(),
+        "shared_cache": shared_cache.stats() if shared_cache is not None else None,
+        "idempotency": idempotency_store.stats(),
+        "itinerary_results": itinerary_results.stats(),
+        "local_sessions": await local_sessions.stats() if local_sessions is not None else None,
+        "write_behind": write_behind.stats() if write_behind is not None else None,
+        "mongo": mongo_monitor.stats(include_slow_queries=slow_queries),
+        "cache_invalidation": cache_invalidator.stats() if cache_invalidator is not None else None,
+        "itinerary_archive": itinerary_archive.stats(),
+        "analytics": analytics.stats() if analytics is not None else None,
+        "read_routing": read_router.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
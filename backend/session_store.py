@@ -0,0 +1,175 @@
+"""Local tier for anonymous itinerary sessions.
+
+Most anonymous itineraries are never converted, so with the local tier enabled
+they are written to an embedded SQLite database (WAL mode) on the API host
+instead of MongoDB. A session is promoted to `temporary_itineraries` when it
+is about to be claimed (prepare_auth / convert) or once it has been viewed
+often enough to be worth sharing across hosts. Expired sessions are removed by
+a periodic sweeper, mirroring the MongoDB TTL index.
+
+Documents are kept in their persisted (storage schema) form as BSON, so
+promotion is a plain insert. SQLite runs on a single worker thread; WAL mode
+lets several API processes on the same host share the file. Hosts do not see
+each other's local sessions, so multi-host deployments need sticky routing by
+session or a promotion threshold of 1.
+"""
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import bson
+from pymongo.errors import DuplicateKeyError
+
+_EPOCH = datetime(1970, 1, 1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    document BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+"""
+
+
+def _timestamp(value: datetime) -> float:
+    return (value - _EPOCH).total_seconds()
+
+
+class LocalSessionStore:
+    """SQLite-backed anonymous session documents with expiry and view counts"""
+
+    def __init__(self, path: str, sweep_interval_seconds: float = 300, clock=time.time):
+        self.path = path
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.promotions = 0
+        self.swept = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL commits are durable against process crashes without an fsync per write
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # Blocking operations (run on the store's thread)
+
+    def _put(self, session_id: str, document: bytes, expires_at: float):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sessions (session_id, document, expires_at, views) VALUES (?, ?, ?, 0)",
+            (session_id, document, expires_at),
+        )
+
+    def _get(self, session_id: str, now: float) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT document FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _record_view(self, session_id: str) -> int:
+        connection = self._connect()
+        connection.execute("UPDATE sessions SET views = views + 1 WHERE session_id = ?", (session_id,))
+        row = connection.execute("SELECT views FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _delete(self, session_id: str) -> bool:
+        return self._connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def _sweep(self, now: float) -> int:
+        return self._connect().execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+
+    def _count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    # Async API
+
+    async def put(self, session_id: str, document: Dict[str, Any], expires_at: datetime):
+        """Store a session's persisted document until `expires_at` (naive UTC)"""
+        await self._run(self._put, session_id, bson.encode(document), _timestamp(expires_at))
+        self.writes += 1
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = await self._run(self._get, session_id, self._clock())
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bson.decode(data)
+
+    async def record_view(self, session_id: str) -> int:
+        """Count a view and return the session's total"""
+        return await self._run(self._record_view, session_id)
+
+    async def delete(self, session_id: str) -> bool:
+        return await self._run(self._delete, session_id)
+
+    async def promote(self, session_id: str, collection) -> bool:
+        """Move a session into MongoDB; the local copy is removed only once the insert succeeded"""
+        data = await self._run(self._get, session_id, self._clock())
+        if data is None:
+            return False
+        try:
+            await collection.insert_one(bson.decode(data))
+        except DuplicateKeyError:
+            pass  # a concurrent promotion already inserted it
+        await self.delete(session_id)
+        self.promotions += 1
+        return True
+
+    async def sweep(self) -> int:
+        removed = await self._run(self._sweep, self._clock())
+        self.swept += removed
+        return removed
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    print(f"Swept {removed} expired local sessions")
+            except Exception as e:
+                print(f"Error sweeping local sessions: {str(e)}")
+
+    def start(self):
+        """Open the database and start the TTL sweeper (call from a running event loop)"""
+        self._connect()
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=False)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": await self._run(self._count),
+            "writes": self.writes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "promotions": self.promotions,
+            "swept": self.swept,
+        }
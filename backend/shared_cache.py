@@ -0,0 +1,522 @@
+"""Shared-memory cache tier for multi-worker deployments.
+
+Every uvicorn worker maps the same file (ideally on tmpfs, e.g.
+/dev/shm/dora-travel-cache), so N workers on a host share one warm cache
+instead of N cold copies.
+
+Layout: a header page, a set-associative index and a data ring.
+
+* Entries (key + value) are appended to the ring at its head; space is
+  reclaimed at its tail, so variable-sized values waste no memory.
+* A key hashes to one index set of `ways` entries pointing into the ring.
+* Eviction is CLOCK (second chance): reads set the entry's reference bit.
+  When the tail reaches a live, referenced entry, the entry is moved to the
+  head with its bit cleared instead of being dropped. Full index sets pick a
+  victim with the same bit and a per-set hand.
+
+Reads take no locks. Index entries are guarded by a sequence number that
+writers make odd while rewriting them (a seqlock). Ring records carry their
+own position and a CRC of key and value, and a reader discards any copy
+whose position fell behind the tail while it was being read. A torn or
+recycled record is therefore never returned, even on weakly ordered CPUs.
+Writers serialize on a `lockf` lock on the header, plus a thread lock since
+POSIX record locks are per process.
+
+Entries belong to a namespace (itinerary bodies, JWKS, ...). `clear` bumps the
+namespace's epoch in the header, which invalidates all its entries at once.
+Each geometry gets its own segment file, `<path>.<version>.<sets>x<ways>.<ring
+bytes>`: a segment that may be mapped is never resized or reformatted (other
+workers would fault reading it). During a rolling deploy that changes the size
+or layout, old and new workers simply use different segments; stale files
+can be removed once no worker maps them.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from hashlib import blake2b
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAGIC = b"DSHC"
+VERSION = 1
+
+DEFAULT_WAYS = 16
+# Index entries are provisioned for values of about this size on average
+DEFAULT_ENTRY_BYTES = 2048
+MAX_NAMESPACES = 16
+
+# Copies retried while a writer holds an index entry before treating it as a miss
+READ_RETRIES = 4
+
+# Bytes of live entries the tail may move to the head (second chance) per byte written
+REINSERT_BUDGET = 4
+
+# Header page: geometry first, then the ring's head/tail and the namespace epochs
+HEADER_BYTES = 4096
+_GEOMETRY = struct.Struct("<4sIIIQ")
+_POSITIONS_OFFSET = 64
+_POSITION = struct.Struct("<Q")
+_HEAD_OFFSET = _POSITIONS_OFFSET
+_TAIL_OFFSET = _POSITIONS_OFFSET + 8
+_EPOCHS_OFFSET = 256
+_EPOCHS = struct.Struct("<" + "I" * MAX_NAMESPACES)
+_EPOCH = struct.Struct("<I")
+
+# CLOCK hand of each index set, stored ahead of the entries
+_HAND = struct.Struct("<I")
+
+# usage() scans the whole index; stats calls within this window share one scan
+USAGE_CACHE_SECONDS = 1.0
+
+# Index entry: sequence (u32), then reference bit, namespace, key hash, ring
+# position, record length, namespace epoch and expiry (unix time)
+_SEQ = struct.Struct("<I")
+_ENTRY = struct.Struct("<BBxxQQIId")
+_INDEX_ENTRY = struct.Struct("<IBBxxQQIId")
+_REF_OFFSET = 4
+ENTRY_BYTES = _INDEX_ENTRY.size
+
+# Ring record: key hash, own ring position, expiry, value length, CRC of key + value, key length, namespace
+_RECORD = struct.Struct("<QQdIIHBx4x")
+RECORD_HEADER_BYTES = _RECORD.size
+
+
+def key_hash(key: bytes) -> int:
+    """Process-independent 64-bit hash (0 marks an empty index entry)"""
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def segment_path(path: str, sets: int, ways: int, ring_bytes: int) -> str:
+    """File of the segment with this layout (one per configuration and format version)"""
+    return f"{path}.{VERSION}.{sets}x{ways}.{ring_bytes}"
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class SharedMemoryCache:
+    """Memory-mapped, cross-process cache segment holding bytes values per namespace"""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        ways: int = DEFAULT_WAYS,
+        entry_bytes: int = DEFAULT_ENTRY_BYTES,
+        clock=time.time,
+    ):
+        self.ways = ways
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._usage: Optional[Tuple[float, Dict[int, Dict[str, int]]]] = None
+        self.sets = max(1, max_bytes // (entry_bytes * ways))
+        self.hands_offset = HEADER_BYTES
+        self.index_offset = self.hands_offset + _align(self.sets * _HAND.size)
+        self.ring_offset = self.index_offset + self.sets * self.ways * ENTRY_BYTES
+        self.ring_bytes = max(max_bytes - (self.ring_offset - HEADER_BYTES), 64 * 1024) & ~7
+        self.max_record_bytes = self.ring_bytes // 4
+        self.size = self.ring_offset + self.ring_bytes
+        self.path = segment_path(path, self.sets, self.ways, self.ring_bytes)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._format()
+            self._mm = mmap.mmap(self._fd, self.size)
+        except Exception:
+            os.close(self._fd)
+            raise
+        # Per-process counters
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.reinsertions = 0
+        self.rejected = 0
+        self.retries = 0
+
+    def _format(self):
+        """Initialise a new (empty) segment file; never touch one another worker may have mapped"""
+        geometry = _GEOMETRY.pack(MAGIC, VERSION, self.sets, self.ways, self.ring_bytes)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                print(f"Formatting shared cache segment {self.path} ({self.size} bytes)")
+                os.ftruncate(self._fd, self.size)
+                os.pwrite(self._fd, geometry, 0)
+            elif size != self.size or os.pread(self._fd, len(geometry), 0) != geometry:
+                raise ValueError(f"Shared cache segment {self.path} has an unexpected layout; remove it once no worker maps it")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    # Header fields
+
+    def _locked(self):
+        """Writer lock shared by every process mapping the segment"""
+        return _WriterLock(self)
+
+    def _position(self, offset: int) -> int:
+        return _POSITION.unpack_from(self._mm, offset)[0]
+
+    def _set_position(self, offset: int, value: int):
+        _POSITION.pack_into(self._mm, offset, value)
+
+    def _epoch(self, namespace: int) -> int:
+        return _EPOCH.unpack_from(self._mm, _EPOCHS_OFFSET + 4 * namespace)[0]
+
+    # Ring
+
+    def _ring_read(self, position: int, length: int) -> bytes:
+        start = position % self.ring_bytes
+        end = start + length
+        if end <= self.ring_bytes:
+            return self._mm[self.ring_offset + start:self.ring_offset + end]
+        return (
+            self._mm[self.ring_offset + start:self.ring_offset + self.ring_bytes]
+            + self._mm[self.ring_offset:self.ring_offset + end - self.ring_bytes]
+        )
+
+    def _ring_write(self, position: int, data: bytes):
+        start = position % self.ring_bytes
+        first = min(len(data), self.ring_bytes - start)
+        self._mm[self.ring_offset + start:self.ring_offset + start + first] = data[:first]
+        if first < len(data):
+            self._mm[self.ring_offset:self.ring_offset + len(data) - first] = data[first:]
+
+    # Index
+
+    def _entry_offsets(self, hashed: int) -> List[int]:
+        base = self.index_offset + (hashed % self.sets) * self.ways * ENTRY_BYTES
+        return [base + way * ENTRY_BYTES for way in range(self.ways)]
+
+    def _read_entry(self, offset: int):
+        return _SEQ.unpack_from(self._mm, offset) + _ENTRY.unpack_from(self._mm, offset + _REF_OFFSET)
+
+    def _write_entry(self, offset: int, *fields):
+        seq = _SEQ.unpack_from(self._mm, offset)[0]
+        _SEQ.pack_into(self._mm, offset, seq + 1)
+        _ENTRY.pack_into(self._mm, offset + _REF_OFFSET, *fields)
+        _SEQ.pack_into(self._mm, offset, seq + 2)
+
+    def _clear_entry(self, offset: int):
+        self._write_entry(offset, 0, 0, 0, 0, 0, 0, 0.0)
+
+    def _entry_live(self, entry, tail: int, now: float) -> bool:
+        _, _, namespace, hashed, position, _, epoch, expires_at = entry
+        return hashed != 0 and position >= tail and expires_at > now and epoch == self._epoch(namespace)
+
+    # Lock-free reads
+
+    def _lookup(self, namespace: int, key: bytes, hashed: int, touch: bool) -> Optional[bytes]:
+        now = self._clock()
+        epoch = self._epoch(namespace)
+        for offset in self._entry_offsets(hashed):
+            for _ in range(READ_RETRIES):
+                seq, ref, entry_namespace, entry_hash, position, length, entry_epoch, expires_at = self._read_entry(offset)
+                if seq & 1:
+                    self.retries += 1
+                    continue
+                if entry_hash != hashed or entry_namespace != namespace or entry_epoch != epoch or expires_at <= now:
+                    break
+                if _SEQ.unpack_from(self._mm, offset)[0] != seq:
+                    self.retries += 1
+                    continue
+                value = self._read_record(position, length, namespace, key, hashed)
+                if value is None:
+                    break
+                if touch and not ref:
+                    self._mm[offset + _REF_OFFSET] = 1
+                return value
+        return None
+
+    def _read_record(self, position: int, length: int, namespace: int, key: bytes, hashed: int) -> Optional[bytes]:
+        if position < self._position(_TAIL_OFFSET):
+            return None
+        record = self._ring_read(position, length)
+        # The tail moves before a record is overwritten, so an unmoved tail means an intact copy
+        if position < self._position(_TAIL_OFFSET):
+            return None
+        record_hash, record_position, _, value_length, crc, key_length, record_namespace = _RECORD.unpack_from(record)
+        data = record[RECORD_HEADER_BYTES:RECORD_HEADER_BYTES + key_length + value_length]
+        if (
+            record_hash != hashed or record_position != position or record_namespace != namespace
+            or len(data) != key_length + value_length or zlib.crc32(data) != crc or data[:key_length] != key
+        ):
+            return None
+        return data[key_length:]
+
+    # Writes (under the writer lock)
+
+    def _find_entry(self, namespace: int, hashed: int) -> Optional[int]:
+        for offset in self._entry_offsets(hashed):
+            entry = self._read_entry(offset)
+            if entry[3] == hashed and entry[2] == namespace:
+                return offset
+        return None
+
+    def _claim_entry(self, namespace: int, hashed: int, tail: int, now: float) -> int:
+        """The key's own index entry, a dead one, or CLOCK's victim in the set"""
+        offsets = self._entry_offsets(hashed)
+        free = None
+        for offset in offsets:
+            entry = self._read_entry(offset)
+            if entry[3] == hashed and entry[2] == namespace:
+                return offset
+            if free is None and not self._entry_live(entry, tail, now):
+                free = offset
+        if free is not None:
+            return free
+
+        hand_offset = self.hands_offset + (hashed % self.sets) * _HAND.size
+        hand = _HAND.unpack_from(self._mm, hand_offset)[0]
+        for _ in range(2 * self.ways):
+            offset = offsets[hand % self.ways]
+            hand += 1
+            if self._mm[offset + _REF_OFFSET]:
+                self._mm[offset + _REF_OFFSET] = 0
+            else:
+                break
+        _HAND.pack_into(self._mm, hand_offset, hand % self.ways)
+        self.evictions += 1
+        return offset
+
+    def _make_room(self, needed: int, now: float):
+        """Advance the tail until `needed` bytes are free, giving referenced entries a second chance"""
+        head, tail = self._position(_HEAD_OFFSET), self._position(_TAIL_OFFSET)
+        budget = REINSERT_BUDGET * needed
+        while self.ring_bytes - (head - tail) < needed:
+            header = self._ring_read(tail, RECORD_HEADER_BYTES)
+            hashed, _, _, value_length, _, key_length, namespace = _RECORD.unpack(header)
+            size = _align(RECORD_HEADER_BYTES + key_length + value_length)
+            entry_offset = self._find_entry(namespace, hashed)
+            entry = self._read_entry(entry_offset) if entry_offset is not None else None
+            owned = entry is not None and entry[4] == tail
+            keep = owned and entry[1] and self._entry_live(entry, tail, now) and budget >= size
+            record = self._ring_read(tail, size) if keep else None
+
+            # Readers discard anything behind the tail, so move it before overwriting
+            tail += size
+            self._set_position(_TAIL_OFFSET, tail)
+
+            if record is not None:
+                budget -= size
+                moved = bytearray(record)
+                struct.pack_into("<Q", moved, 8, head)
+                self._ring_write(head, bytes(moved))
+                _, _, _, _, _, length, epoch, expires_at = entry
+                self._write_entry(entry_offset, 0, namespace, hashed, head, length, epoch, expires_at)
+                head += size
+                self._set_position(_HEAD_OFFSET, head)
+                self.reinsertions += 1
+            elif owned:
+                if self._entry_live(entry, 0, now):
+                    self.evictions += 1
+                self._clear_entry(entry_offset)
+        return head
+
+    # Public API (namespaced bytes values)
+
+    def get(self, namespace: int, key: bytes, touch: bool = True) -> Optional[bytes]:
+        value = self._lookup(namespace, key, key_hash(key), touch)
+        if touch:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, namespace: int, key: bytes, value: bytes, ttl: float) -> bool:
+        if ttl <= 0:
+            self.invalidate(namespace, key)
+            return False
+        size = _align(RECORD_HEADER_BYTES + len(key) + len(value))
+        if size > self.max_record_bytes or len(key) > 0xFFFF:
+            self.rejected += 1
+            self.invalidate(namespace, key)
+            return False
+
+        hashed = key_hash(key)
+        data = key + value
+        with self._locked():
+            now = self._clock()
+            expires_at = now + ttl
+            epoch = self._epoch(namespace)
+            head = self._make_room(size, now)
+            header = _RECORD.pack(hashed, head, expires_at, len(value), zlib.crc32(data), len(key), namespace)
+            self._ring_write(head, header + data + b"\0" * (size - RECORD_HEADER_BYTES - len(data)))
+            self._set_position(_HEAD_OFFSET, head + size)
+            offset = self._claim_entry(namespace, hashed, self._position(_TAIL_OFFSET), now)
+            self._write_entry(offset, 0, namespace, hashed, head, size, epoch, expires_at)
+        self.writes += 1
+        return True
+
+    def invalidate(self, namespace: int, key: bytes) -> bool:
+        hashed = key_hash(key)
+        if self._find_entry(namespace, hashed) is None:
+            return False
+        with self._locked():
+            offset = self._find_entry(namespace, hashed)
+            if offset is None:
+                return False
+            self._clear_entry(offset)
+            return True
+
+    def clear(self, namespace: int):
+        """Drop every entry of a namespace in all workers"""
+        with self._locked():
+            _EPOCH.pack_into(self._mm, _EPOCHS_OFFSET + 4 * namespace, (self._epoch(namespace) + 1) & 0xFFFFFFFF)
+        self._usage = None
+
+    def usage(self) -> Dict[int, Dict[str, int]]:
+        """Live entries and bytes per namespace (scans the index, at most once per USAGE_CACHE_SECONDS)"""
+        now = self._clock()
+        if self._usage is not None and now - self._usage[0] < USAGE_CACHE_SECONDS:
+            return self._usage[1]
+        tail = self._position(_TAIL_OFFSET)
+        epochs = _EPOCHS.unpack_from(self._mm, _EPOCHS_OFFSET)
+        index = memoryview(self._mm)[self.index_offset:self.ring_offset]
+        usage: Dict[int, Dict[str, int]] = {}
+        try:
+            for _, _, namespace, hashed, position, length, epoch, expires_at in _INDEX_ENTRY.iter_unpack(index):
+                if hashed and position >= tail and expires_at > now and epoch == epochs[namespace]:
+                    entry = usage.setdefault(namespace, {"entries": 0, "bytes": 0})
+                    entry["entries"] += 1
+                    entry["bytes"] += length
+        finally:
+            index.release()
+        self._usage = (now, usage)
+        return usage
+
+    def namespace(
+        self,
+        namespace: int,
+        default_ttl: float,
+        dumps: Optional[Callable[[Any], bytes]] = None,
+        loads: Optional[Callable[[bytes], Any]] = None,
+    ) -> "SharedCacheNamespace":
+        if not 0 <= namespace < MAX_NAMESPACES:
+            raise ValueError(f"Namespace must be between 0 and {MAX_NAMESPACES - 1}")
+        return SharedCacheNamespace(self, namespace, default_ttl, dumps, loads)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        head, tail = self._position(_HEAD_OFFSET), self._position(_TAIL_OFFSET)
+        return {
+            "path": self.path,
+            "size_bytes": self.size,
+            "ring_bytes": self.ring_bytes,
+            "ring_used_bytes": head - tail,
+            "index_entries": self.sets * self.ways,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "reinsertions": self.reinsertions,
+            "rejected_too_large": self.rejected,
+            "read_retries": self.retries,
+        }
+
+
+class _WriterLock:
+    def __init__(self, cache: SharedMemoryCache):
+        self.cache = cache
+
+    def __enter__(self):
+        self.cache._lock.acquire()
+        try:
+            fcntl.lockf(self.cache._fd, fcntl.LOCK_EX, 1, 0)
+        except Exception:
+            self.cache._lock.release()
+            raise
+
+    def __exit__(self, *exc_info):
+        try:
+            fcntl.lockf(self.cache._fd, fcntl.LOCK_UN, 1, 0)
+        finally:
+            self.cache._lock.release()
+
+
+class SharedCacheNamespace:
+    """One namespace of a shared segment, with the ByteLRUCache interface (str keys)"""
+
+    def __init__(
+        self,
+        segment: SharedMemoryCache,
+        namespace: int,
+        default_ttl: float,
+        dumps: Optional[Callable[[Any], bytes]] = None,
+        loads: Optional[Callable[[bytes], Any]] = None,
+    ):
+        self.segment = segment
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self._dumps = dumps
+        self._loads = loads
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    @staticmethod
+    def _key(key: str) -> bytes:
+        return key.encode()
+
+    def __contains__(self, key: str) -> bool:
+        return self.segment.get(self.namespace, self._key(key), touch=False) is not None
+
+    def __len__(self) -> int:
+        return self.segment.usage().get(self.namespace, {}).get("entries", 0)
+
+    def get(self, key: str) -> Optional[Any]:
+        data = self.segment.get(self.namespace, self._key(key))
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._loads(data) if self._loads else data
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Look up without counting a hit or setting the reference bit"""
+        data = self.segment.get(self.namespace, self._key(key), touch=False)
+        if data is None:
+            return None
+        return self._loads(data) if self._loads else data
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: Optional[int] = None):
+        """Cache a value for all workers; `size` is accepted for ByteLRUCache compatibility"""
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        data = self._dumps(value) if self._dumps else value
+        self.segment.set(self.namespace, self._key(key), data, ttl)
+
+    def invalidate(self, key: str) -> bool:
+        if self.segment.invalidate(self.namespace, self._key(key)):
+            self.invalidations += 1
+            return True
+        return False
+
+    def clear(self):
+        self.segment.clear(self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        usage = self.segment.usage().get(self.namespace, {"entries": 0, "bytes": 0})
+        return {
+            "shared": True,
+            "entries": usage["entries"],
+            "bytes": usage["bytes"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
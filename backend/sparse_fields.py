@@ -0,0 +1,69 @@
+"""Sparse fieldsets and day ranges for itinerary reads.
+
+`?fields=trip,itinerary_days` and `/days?from=&to=` read only the requested
+parts of a stored itinerary: the projection names just those payload fields,
+and day ranges use a `$slice` projection so MongoDB returns only those days.
+Itineraries stored as codec blobs cannot be projected into, so the blob is
+read whole and the selection is applied after decoding.
+"""
+from typing import Any, Dict, List, Optional
+
+from storage_codec import BLOB_FIELD, PAYLOAD_FIELD
+from storage_schema import StorageSchema
+
+# Top-level TravelItinerary fields that can be requested (session_id is always returned)
+ITINERARY_FIELDS = (
+    "user", "trip", "flights", "accommodations", "itinerary_days", "destination_info", "utility_links"
+)
+
+# Days returned by one /days request at most
+MAX_DAYS_PER_PAGE = 31
+
+
+class InvalidFieldSelection(ValueError):
+    """Raised for unknown names in a fields= parameter"""
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Requested fields in schema order, or None for the full itinerary"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(ITINERARY_FIELDS) - {"session_id"}
+    if unknown:
+        raise InvalidFieldSelection(
+            f"Unknown itinerary fields: {', '.join(sorted(unknown))}. Valid fields: {', '.join(ITINERARY_FIELDS)}"
+        )
+    return [name for name in ITINERARY_FIELDS if name in requested]
+
+
+def fields_projection(fields: List[str]) -> Dict[str, Any]:
+    """Projection reading only the requested payload fields (and a codec blob, if any)"""
+    projection: Dict[str, Any] = {"_id": 0}
+    for name in fields:
+        for path in StorageSchema.paths(PAYLOAD_FIELD, name):
+            projection[path] = 1
+    for path in StorageSchema.paths(BLOB_FIELD):
+        projection[path] = 1
+    return projection
+
+
+def days_projection(first_day: int, last_day: int) -> Dict[str, Any]:
+    """Projection reading days first_day..last_day (1-based, inclusive) and the trip length"""
+    projection: Dict[str, Any] = {"_id": 0}
+    for path in StorageSchema.paths(PAYLOAD_FIELD, "itinerary_days"):
+        projection[path] = {"$slice": [first_day - 1, last_day - first_day + 1]}
+    for path in StorageSchema.paths(PAYLOAD_FIELD, "trip", "duration_days"):
+        projection[path] = 1
+    for path in StorageSchema.paths(BLOB_FIELD):
+        projection[path] = 1
+    return projection
+
+
+def select_fields(payload: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    return {name: payload[name] for name in fields if name in payload}
+
+
+def select_days(payload: Dict[str, Any], first_day: int, last_day: int) -> List[Dict[str, Any]]:
+    """Days in range, whether or not MongoDB already sliced the list"""
+    return [day for day in payload.get("itinerary_days", []) if first_day <= day["day"] <= last_day]
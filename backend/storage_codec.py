@@ -0,0 +1,167 @@
+"""Compressed storage codec for generated itineraries.
+
+When enabled, `generated_itinerary` is persisted as a versioned binary blob in
+`generated_itinerary_blob` instead of a nested document:
+
+    {"v": 1, "codec": "zstd", "dict_id": "2025-06-01-a1b2c3d4", "data": Binary(...)}
+
+zstd with a trained dictionary does best on our payloads because amenity lists,
+Unsplash URLs and template activity text repeat across every document. zlib is
+used when the zstandard package is not installed. Documents written before the
+codec was enabled keep their plain `generated_itinerary` and are still readable;
+`migrate_itinerary_codec.py` converts them in place.
+
+Dictionaries are loaded whatever the configured codec, so blobs stay readable
+after rolling back to `none`/`zlib`; a dictionary trained after startup is
+fetched on first use by `ensure_dictionary`.
+"""
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import Binary
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback
+    zstandard = None
+
+CODEC_VERSION = 1
+PAYLOAD_FIELD = "generated_itinerary"
+BLOB_FIELD = "generated_itinerary_blob"
+
+SUPPORTED_CODECS = ("none", "zlib", "zstd")
+
+DEFAULT_DICTIONARY_SIZE = 64 * 1024
+
+
+class CodecError(ValueError):
+    """Raised for blobs this process cannot decode"""
+
+
+def _serialize(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _deserialize(data: bytes) -> Dict[str, Any]:
+    return json.loads(data.decode("utf-8"))
+
+
+def train_dictionary(samples: List[Dict[str, Any]], size: int = DEFAULT_DICTIONARY_SIZE) -> Dict[str, Any]:
+    """Train a zstd dictionary from sample itineraries; returns a storable record"""
+    if zstandard is None:
+        raise CodecError("zstandard is not installed")
+    trained = zstandard.train_dictionary(size, [_serialize(sample) for sample in samples])
+    data = trained.as_bytes()
+    dict_id = f"{datetime.utcnow():%Y-%m-%d}-{hashlib.sha256(data).hexdigest()[:8]}"
+    return {"_id": dict_id, "data": Binary(data), "created_at": datetime.utcnow(), "sample_count": len(samples)}
+
+
+class ItineraryCodec:
+    """Encodes itinerary payloads for storage and decodes them on read"""
+
+    def __init__(self, codec: str = "none", level: int = 3):
+        if codec not in SUPPORTED_CODECS:
+            raise CodecError(f"Unknown itinerary storage codec: {codec}")
+        if codec == "zstd" and zstandard is None:
+            print("zstandard not installed, falling back to zlib itinerary storage")
+            codec = "zlib"
+        self.codec = codec
+        self.level = level
+        self._dictionaries: Dict[str, bytes] = {}
+        self._active_dict_id: Optional[str] = None
+        self._compressors: Dict[Optional[str], Any] = {}
+        self._decompressors: Dict[Optional[str], Any] = {}
+        self._dictionary_collection = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.codec != "none"
+
+    @property
+    def active_dictionary(self) -> Optional[str]:
+        return self._active_dict_id
+
+    def register_dictionary(self, dict_id: str, data: bytes, activate: bool = True):
+        """Make a dictionary available for decoding (and, if active, for new writes)"""
+        self._dictionaries[dict_id] = bytes(data)
+        if activate:
+            self._active_dict_id = dict_id
+
+    async def load_dictionaries(self, collection):
+        """Load every stored dictionary; the newest one is used for new writes"""
+        self._dictionary_collection = collection
+        async for record in collection.find().sort("created_at", 1):
+            self.register_dictionary(record["_id"], record["data"])
+
+    async def ensure_dictionary(self, document: Dict[str, Any]):
+        """Fetch the dictionary of a stored blob trained after `load_dictionaries` ran (call before `load`)"""
+        blob = document.get(BLOB_FIELD)
+        dict_id = blob.get("dict_id") if isinstance(blob, dict) else None
+        if dict_id is None or dict_id in self._dictionaries or self._dictionary_collection is None:
+            return
+        record = await self._dictionary_collection.find_one({"_id": dict_id})
+        if record is not None:
+            # Readable from now on; new writes keep the dictionary chosen at startup
+            self.register_dictionary(dict_id, record["data"], activate=False)
+
+    def _zstd_dictionary(self, dict_id: Optional[str]):
+        if dict_id is None:
+            return None
+        if dict_id not in self._dictionaries:
+            raise CodecError(f"Unknown zstd dictionary: {dict_id}")
+        return zstandard.ZstdCompressionDict(self._dictionaries[dict_id])
+
+    def _compressor(self, dict_id: Optional[str]):
+        if dict_id not in self._compressors:
+            self._compressors[dict_id] = zstandard.ZstdCompressor(level=self.level, dict_data=self._zstd_dictionary(dict_id))
+        return self._compressors[dict_id]
+
+    def _decompressor(self, dict_id: Optional[str]):
+        if dict_id not in self._decompressors:
+            self._decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self._zstd_dictionary(dict_id))
+        return self._decompressors[dict_id]
+
+    def encode(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Compress a payload into a versioned blob"""
+        raw = _serialize(payload)
+        if self.codec == "zstd":
+            dict_id = self._active_dict_id
+            return {"v": CODEC_VERSION, "codec": "zstd", "dict_id": dict_id, "data": Binary(self._compressor(dict_id).compress(raw))}
+        return {"v": CODEC_VERSION, "codec": "zlib", "dict_id": None, "data": Binary(zlib.compress(raw, 6))}
+
+    def decode(self, blob: Dict[str, Any]) -> Dict[str, Any]:
+        if blob.get("v") != CODEC_VERSION:
+            raise CodecError(f"Unsupported itinerary blob version: {blob.get('v')}")
+        if blob["codec"] == "zlib":
+            return _deserialize(zlib.decompress(blob["data"]))
+        if blob["codec"] == "zstd":
+            if zstandard is None:
+                raise CodecError("zstandard is required to read this itinerary")
+            return _deserialize(self._decompressor(blob.get("dict_id")).decompress(blob["data"]))
+        raise CodecError(f"Unknown itinerary blob codec: {blob['codec']}")
+
+    def store(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Document fields that persist a payload with the configured codec"""
+        if not self.enabled:
+            return {PAYLOAD_FIELD: payload}
+        return {BLOB_FIELD: self.encode(payload)}
+
+    def load(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """The payload of a stored document, decompressing only when it is read"""
+        if BLOB_FIELD in document:
+            return self.decode(document[BLOB_FIELD])
+        return document[PAYLOAD_FIELD]
+
+    @staticmethod
+    def stored_fields(document: Dict[str, Any]) -> Dict[str, Any]:
+        """The payload fields of a document exactly as stored, for copying without decoding"""
+        return {field: document[field] for field in (PAYLOAD_FIELD, BLOB_FIELD) if field in document}
+
+    def expand(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace a stored blob with the decoded payload, for API responses"""
+        if BLOB_FIELD in document:
+            document[PAYLOAD_FIELD] = self.decode(document.pop(BLOB_FIELD))
+        return document
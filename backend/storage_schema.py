@@ -0,0 +1,182 @@
+"""Compact persisted schema for itinerary documents.
+
+With the compact schema enabled, documents are written with:
+
+* `session_id` and `original_session_id` as BSON binary UUIDs (subtype 4,
+  16 bytes) instead of 36-character strings, which shrinks both the documents
+  and the unique indexes on those fields;
+* short names for payload fields (`form_data` -> `f`, `generated_itinerary` ->
+  `g`, ...) including the keys nested inside them.
+
+Fields that are filtered or sorted on (`session_id`, `user_id`, `created_at`,
+`expires_at`, `status`, `summary`) keep their names, so one index and one
+keyset sort cover legacy and compact documents alike. Session lookups match
+both representations, and `from_storage` reads either layout, so legacy
+documents keep working and the API shape never changes.
+"""
+import uuid
+from typing import Any, Dict, List, Union
+
+from bson import Binary
+from bson.binary import UUID_SUBTYPE
+
+SESSION_FIELDS = ("session_id", "original_session_id")
+
+# Top-level document fields
+TOP_LEVEL_NAMES: Dict[str, str] = {
+    "user_email": "em",
+    "form_data": "f",
+    "generated_itinerary": "g",
+    "generated_itinerary_blob": "gz",
+    "converted_at": "cv",
+    "compressed_bodies": "cb",
+}
+
+# Keys nested inside form_data and generated_itinerary
+PAYLOAD_NAMES: Dict[str, str] = {
+    # form_data
+    "user_name": "un",
+    "origin_city": "oc",
+    "travel_theme": "tt",
+    "budget_per_person": "bp",
+    "optimize_route": "opt",
+    # shared by form_data and trip
+    "destinations": "ds",
+    "start_date": "sd",
+    "end_date": "ed",
+    "party_size": "ps",
+    "currency": "cu",
+    # user / trip
+    "budget": "b",
+    "theme": "th",
+    "origin": "o",
+    "destination": "dn",
+    "duration_days": "dd",
+    "route_optimized": "ro",
+    "route_distance_km": "rk",
+    # flights and accommodations
+    "accommodations": "acc",
+    "airline": "al",
+    "deep_link": "dl",
+    "departure_time": "dt",
+    "arrival_time": "at",
+    "duration": "du",
+    "price_per_night": "pn",
+    "star_rating": "sr",
+    "amenities": "am",
+    "image_url": "im",
+    # days and activities
+    "itinerary_days": "id",
+    "activities": "ac",
+    "description": "de",
+    "details": "dx",
+    "summary": "su",
+    # destination info and links
+    "destination_info": "di",
+    "introduction": "in",
+    "packing_tips": "pt",
+    "cultural_notes": "cn",
+    "utility_links": "ul",
+    "visa_info": "vi",
+    "currency_exchange": "cx",
+    "sim_cards": "sc",
+    "transportation": "tp",
+}
+
+_TOP_LEVEL_LONG = {short: long for long, short in TOP_LEVEL_NAMES.items()}
+_PAYLOAD_LONG = {short: long for long, short in PAYLOAD_NAMES.items()}
+
+# A short name that is also a long name would make legacy documents ambiguous
+assert not set(_PAYLOAD_LONG) & set(PAYLOAD_NAMES), "payload short names collide with long names"
+assert len(_PAYLOAD_LONG) == len(PAYLOAD_NAMES), "duplicate payload short names"
+assert len(_TOP_LEVEL_LONG) == len(TOP_LEVEL_NAMES), "duplicate top-level short names"
+
+SessionKey = Union[str, Binary]
+
+
+def _rename_keys(value: Any, names: Dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        return {names.get(key, key): _rename_keys(item, names) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rename_keys(item, names) for item in value]
+    return value
+
+
+def _session_binary(session_id: str) -> Binary:
+    return Binary(uuid.UUID(session_id).bytes, UUID_SUBTYPE)
+
+
+def session_id_str(value: SessionKey) -> str:
+    """A stored session key (string or binary UUID) as the API's string form"""
+    if isinstance(value, Binary) and value.subtype == UUID_SUBTYPE:
+        return str(uuid.UUID(bytes=bytes(value)))
+    return value
+
+
+class StorageSchema:
+    """Maps between the API document shape and the persisted layout"""
+
+    def __init__(self, compact: bool = False):
+        self.compact = compact
+
+    def session_key(self, session_id: str) -> SessionKey:
+        """The value written for a session id"""
+        if not self.compact:
+            return session_id
+        try:
+            return _session_binary(session_id)
+        except ValueError:
+            return session_id
+
+    def session_match(self, session_id: str) -> Any:
+        """Filter value matching a session id in either representation"""
+        try:
+            binary = _session_binary(session_id)
+        except ValueError:
+            return session_id
+        return {"$in": [binary, session_id]}
+
+    def sessions_match(self, session_ids: List[str]) -> Dict[str, Any]:
+        """Filter value matching any of several session ids in either representation"""
+        values: List[Any] = []
+        for session_id in session_ids:
+            match = self.session_match(session_id)
+            values.extend(match["$in"] if isinstance(match, dict) else [match])
+        return {"$in": values}
+
+    def to_storage(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.compact:
+            return document
+        stored: Dict[str, Any] = {}
+        for key, value in document.items():
+            if key in SESSION_FIELDS and isinstance(value, str):
+                stored[key] = self.session_key(value)
+            elif key in ("form_data", "generated_itinerary"):
+                stored[TOP_LEVEL_NAMES[key]] = _rename_keys(value, PAYLOAD_NAMES)
+            else:
+                stored[TOP_LEVEL_NAMES.get(key, key)] = value
+        return stored
+
+    def from_storage(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Read a compact or legacy document back into the API shape"""
+        restored: Dict[str, Any] = {}
+        for key, value in document.items():
+            name = _TOP_LEVEL_LONG.get(key, key)
+            if name in SESSION_FIELDS:
+                restored[name] = session_id_str(value)
+            elif key in ("f", "g"):
+                restored[name] = _rename_keys(value, _PAYLOAD_LONG)
+            else:
+                restored[name] = value
+        return restored
+
+    def field(self, name: str) -> str:
+        """Persisted name of a top-level field"""
+        return TOP_LEVEL_NAMES.get(name, name) if self.compact else name
+
+    @staticmethod
+    def paths(*names: str) -> List[str]:
+        """Dotted path of a (possibly nested) field in both layouts, for projections"""
+        legacy = ".".join(names)
+        compact = ".".join([TOP_LEVEL_NAMES.get(names[0], names[0])] + [PAYLOAD_NAMES.get(name, name) for name in names[1:]])
+        return [legacy] if compact == legacy else [legacy, compact]
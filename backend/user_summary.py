@@ -0,0 +1,197 @@
+"""Per-user trip summary kept in the `users` collection.
+
+The dashboard needs a user's trip count, next upcoming trip, total planned
+budget and recent destinations. Instead of reading every itinerary, each
+conversion folds the new trips into one document per user, keyed by user id:
+
+    {"_id": <user_id>, "trip_summary": {
+        "trip_count": 3,
+        "total_planned_budget": {"USD": 12000.0, "EUR": 1600.0},
+        "next_trip": {"start_date": "2031-01-01", "end_date": ..., "trip_name": ..., "itinerary_id": ...},
+        "recent_destinations": ["Tokyo, Japan", "Rome, Italy", ...],
+        "updated_at": ...}}
+
+Updates are single atomic operators ($inc, $push with $position/$slice, $min),
+so concurrent conversions never lose each other's changes. `next_trip` only
+moves earlier; once that trip has started, the next read looks up the
+following one through the `user_id_start_date` index and stores it.
+
+Conversions that predate the summary are folded in by a rebuild (from the
+backend directory, with MONGO_URL set; run off-peak):
+    python user_summary.py rebuild [--user USER_ID]
+"""
+import argparse
+import asyncio
+import re
+import sys
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+# Destinations kept, newest first; the API returns the distinct ones
+RECENT_DESTINATIONS_KEPT = 20
+RECENT_DESTINATIONS_SHOWN = 10
+
+# ISO 4217 codes; currencies become field names of `total_planned_budget`
+CURRENCY_PATTERN = r"^[A-Z]{3}$"
+_CURRENCY = re.compile(CURRENCY_PATTERN)
+
+EMPTY_TRIP_SUMMARY = {"trip_count": 0, "total_planned_budget": {}, "next_trip": None, "recent_destinations": []}
+
+
+def _today(today: Optional[date]) -> str:
+    return (today or datetime.utcnow().date()).strftime("%Y-%m-%d")
+
+
+def planned_budget(summary: Dict[str, Any]) -> float:
+    """Budget of the whole party for one trip"""
+    return float(summary.get("budget_per_person") or 0) * int(summary.get("party_size") or 1)
+
+
+def trip_entry(itinerary_id: Any, summary: Dict[str, Any]) -> Dict[str, Any]:
+    # start_date first: $min compares embedded documents field by field
+    return {
+        "start_date": summary["start_date"],
+        "end_date": summary.get("end_date"),
+        "trip_name": summary.get("trip_name"),
+        "itinerary_id": str(itinerary_id),
+    }
+
+
+def fold_itineraries(itineraries: List[Dict[str, Any]], today: Optional[date] = None) -> Dict[str, Any]:
+    """Trip summary contribution of itineraries ({"_id", "summary"}) in the order they were converted"""
+    today_str = _today(today)
+    budgets: Dict[str, float] = {}
+    destinations: List[str] = []
+    upcoming: List[Dict[str, Any]] = []
+    for itinerary in itineraries:
+        # Legacy itineraries without a summary only count as trips
+        summary = itinerary.get("summary") or {}
+        currency = summary.get("currency") or "USD"
+        # Itineraries saved before currencies were validated may hold anything; never use it as a path
+        if summary.get("budget_per_person") is not None and _CURRENCY.match(currency):
+            budgets[currency] = budgets.get(currency, 0.0) + planned_budget(summary)
+        destinations.extend(summary.get("destinations") or [])
+        if (summary.get("start_date") or "") >= today_str:
+            upcoming.append(trip_entry(itinerary["_id"], summary))
+    return {
+        "trip_count": len(itineraries),
+        "total_planned_budget": budgets,
+        "next_trip": min(upcoming, key=lambda trip: trip["start_date"]) if upcoming else None,
+        "recent_destinations": list(reversed(destinations))[:RECENT_DESTINATIONS_KEPT],
+    }
+
+
+def conversion_update(converted: List[Dict[str, Any]], today: Optional[date] = None) -> Dict[str, Any]:
+    """One atomic update folding newly converted itineraries into the stored trip summary"""
+    folded = fold_itineraries(converted, today)
+    update: Dict[str, Any] = {
+        "$inc": {
+            "trip_summary.trip_count": folded["trip_count"],
+            **{f"trip_summary.total_planned_budget.{currency}": amount for currency, amount in folded["total_planned_budget"].items()},
+        },
+        "$set": {"trip_summary.updated_at": datetime.utcnow()},
+    }
+    if folded["recent_destinations"]:
+        update["$push"] = {"trip_summary.recent_destinations": {
+            "$each": folded["recent_destinations"], "$position": 0, "$slice": RECENT_DESTINATIONS_KEPT
+        }}
+    if folded["next_trip"] is not None:
+        update["$min"] = {"trip_summary.next_trip": folded["next_trip"]}
+    return update
+
+
+async def record_conversions(users, user_id: str, converted: List[Dict[str, Any]]):
+    """Fold itineraries this request converted into the user's summary (never call it for retries)"""
+    if converted:
+        await users.update_one({"_id": user_id}, conversion_update(converted), upsert=True)
+
+
+def distinct_recent(destinations: List[str], limit: int = RECENT_DESTINATIONS_SHOWN) -> List[str]:
+    return list(dict.fromkeys(destinations))[:limit]
+
+
+async def next_upcoming_trip(collection, owned: Dict[str, Any], user_id: str, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """The user's earliest trip not yet started (one `user_id_start_date` index probe)"""
+    document = await collection.find_one(
+        {"user_id": user_id, **owned, "summary.start_date": {"$gte": _today(today)}},
+        {"summary": 1},
+        sort=[("summary.start_date", 1)],
+    )
+    return trip_entry(document["_id"], document["summary"]) if document else None
+
+
+async def trip_summary_view(
+    users, user_id: str, document: Optional[Dict[str, Any]], collection, owned: Dict[str, Any], today: Optional[date] = None
+) -> Dict[str, Any]:
+    """The user's stored trip summary for the API, moving `next_trip` forward if that trip has started"""
+    trip_summary = {**EMPTY_TRIP_SUMMARY, **((document or {}).get("trip_summary") or {})}
+
+    stale = trip_summary["next_trip"]
+    if stale is not None and stale["start_date"] < _today(today):
+        following = await next_upcoming_trip(collection, owned, user_id, today)
+        # Only replace the value we read; a concurrent conversion may have set an earlier one
+        await users.update_one(
+            {"_id": user_id, "trip_summary.next_trip": stale},
+            {"$set": {"trip_summary.next_trip": following}} if following else {"$unset": {"trip_summary.next_trip": ""}},
+        )
+        trip_summary["next_trip"] = following
+
+    trip_summary["recent_destinations"] = distinct_recent(trip_summary["recent_destinations"])
+    trip_summary.pop("updated_at", None)
+    return trip_summary
+
+
+async def rebuild_trip_summary(users, user_id: str, sources: List[Any], today: Optional[date] = None) -> Dict[str, Any]:
+    """Recompute a user's summary from every itinerary it owns; `sources` are (collection, filter) pairs"""
+    by_id: Dict[Any, Dict[str, Any]] = {}
+    for collection, owned in sources:
+        cursor = collection.find({"user_id": user_id, **owned}, {"summary": 1, "created_at": 1})
+        async for document in cursor:
+            # Mid-archival an itinerary can be in both collections
+            by_id.setdefault(document["_id"], document)
+    itineraries = list(by_id.values())
+    itineraries.sort(key=lambda document: document.get("created_at") or datetime.min)
+
+    trip_summary = {**fold_itineraries(itineraries, today), "updated_at": datetime.utcnow()}
+    if trip_summary["next_trip"] is None:
+        del trip_summary["next_trip"]
+    await users.update_one({"_id": user_id}, {"$set": {"trip_summary": trip_summary}}, upsert=True)
+    return trip_summary
+
+
+def main():
+    import os
+
+    import motor.motor_asyncio
+    from dotenv import load_dotenv
+
+    from itinerary_archive import ARCHIVE_COLLECTION, hot_collection
+
+    parser = argparse.ArgumentParser(description="Rebuild per-user trip summaries from stored itineraries")
+    parser.add_argument("command", choices=("rebuild",))
+    parser.add_argument("--user", help="only this user id")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URL")).dora_travel
+
+    async def rebuild() -> int:
+        sources = [hot_collection(database), (database[ARCHIVE_COLLECTION], {})]
+        if args.user:
+            user_ids = [args.user]
+        else:
+            user_ids = set()
+            for collection, owned in sources:
+                user_ids.update(await collection.distinct("user_id", owned))
+        for count, user_id in enumerate(sorted(user_ids), 1):
+            await rebuild_trip_summary(database.users, user_id, sources)
+            if count % 1000 == 0:
+                print(f"  {count:,} users rebuilt")
+        print(f"✅ Rebuilt trip summaries of {len(user_ids):,} users")
+        return 0
+
+    return asyncio.run(rebuild())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Write-behind batching for inserts.
+
+Documents are queued in memory and written with one `insert_many` per batch,
+when the batch is full or the oldest queued document has waited `max_delay`
+seconds, whichever comes first. Lookups by key see queued and in-flight
+documents, so a worker always reads its own writes.
+
+Two acknowledgement modes trade latency for durability:
+
+* "flushed" - `add` returns once the document's batch is written (group
+  commit: fewer round trips, nothing acknowledged is lost);
+* "queued"  - `add` returns immediately; a crash loses at most the documents
+  queued during the last `max_delay` seconds (plus any batch being retried).
+
+Failed batches are re-queued and retried with backoff; the queue is drained
+on shutdown.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+ACK_MODES = ("flushed", "queued")
+
+# Duplicate key: the document was already written by an earlier attempt
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindQueue:
+    """Batches inserts into one collection"""
+
+    def __init__(
+        self,
+        collection,
+        max_batch: int = 100,
+        max_delay: float = 0.05,
+        ack: str = "queued",
+        max_retries: int = 5,
+    ):
+        if ack not in ACK_MODES:
+            raise ValueError(f"Unknown write-behind acknowledgement mode: {ack}")
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.ack = ack
+        self.max_retries = max_retries
+        self._pending: "OrderedDict[str, Tuple[Dict[str, Any], Optional[asyncio.Future]]]" = OrderedDict()
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+        self._failures = 0
+        # Metrics
+        self.batches = 0
+        self.documents = 0
+        self.max_batch_size = 0
+        self.max_depth = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.failed_batches = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending) + len(self._in_flight)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A queued or in-flight document (read-your-writes)"""
+        if key in self._pending:
+            return self._pending[key][0]
+        return self._in_flight.get(key)
+
+    async def add(self, key: str, document: Dict[str, Any]):
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future() if self.ack == "flushed" else None
+        self._pending[key] = (document, waiter)
+        self.max_depth = max(self.max_depth, self.depth)
+
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.create_task(self._flush_after(self.max_delay))
+
+        if waiter is not None:
+            await waiter
+
+    async def persist(self, key: str):
+        """Write a queued document now (e.g. before updating it in MongoDB)"""
+        while key in self._pending or key in self._in_flight:
+            if key in self._pending:
+                self._start_flush()
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        self._timer = None
+        if self._pending:
+            self._start_flush()
+
+    def _start_flush(self):
+        # The timer only guards documents this flush is about to take
+        if self._timer is not None and len(self._pending) <= self.max_batch:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.get_running_loop().create_task(self._flush_batch())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    def _take_batch(self) -> List[Tuple[str, Dict[str, Any], Optional[asyncio.Future]]]:
+        batch = []
+        while self._pending and len(batch) < self.max_batch:
+            key, (document, waiter) = self._pending.popitem(last=False)
+            self._in_flight[key] = document
+            batch.append((key, document, waiter))
+        return batch
+
+    async def _flush_batch(self):
+        batch = self._take_batch()
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            await self.collection.insert_many([document for _, document, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+            if errors:
+                self._retry(batch, e)
+                return
+        except Exception as e:
+            self._retry(batch, e)
+            return
+
+        elapsed = time.perf_counter() - started
+        self._failures = 0
+        self.batches += 1
+        self.documents += len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+        for key, _, waiter in batch:
+            self._in_flight.pop(key, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+        # More may have queued while this batch was being written
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_after(self.max_delay))
+
+    def _retry(self, batch, error: Exception):
+        self.failed_batches += 1
+        self._failures += 1
+        if self._failures > self.max_retries:
+            print(f"Write-behind batch of {len(batch)} dropped after {self.max_retries} retries: {str(error)}")
+            self.dropped += len(batch)
+            for key, _, waiter in batch:
+                self._in_flight.pop(key, None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_exception(error)
+            self._failures = 0
+            return
+
+        print(f"Write-behind batch of {len(batch)} failed, retrying: {str(error)}")
+        # Re-queue ahead of newer documents, unless a newer version was queued meanwhile
+        for key, document, waiter in reversed(batch):
+            self._in_flight.pop(key, None)
+            if key not in self._pending:
+                self._pending[key] = (document, waiter)
+                self._pending.move_to_end(key, last=False)
+        if self._timer is None:
+            backoff = min(self.max_delay * (2 ** self._failures), 5.0)
+            self._timer = asyncio.get_running_loop().create_task(self._flush_after(backoff))
+
+    async def close(self):
+        """Drain the queue (called at shutdown); failing batches are dropped after max_retries"""
+        while self._pending or self._flushes:
+            if self._pending:
+                self._start_flush()
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ack": self.ack,
+            "queue_depth": self.depth,
+            "max_queue_depth": self.max_depth,
+            "batches": self.batches,
+            "documents": self.documents,
+            "avg_batch_size": round(self.documents / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "avg_flush_ms": round(self.flush_seconds_total / self.batches * 1000, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.flush_seconds_max * 1000, 2),
+            "failed_batches": self.failed_batches,
+            "dropped_documents": self.dropped,
+        }
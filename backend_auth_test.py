@@ -5,17 +5,26 @@ Tests the complete authentication workflow including JWT validation and Auth0 in
 """
 
 import requests
+import asyncio
 import json
+import os
+import sys
 import time
+import uuid
 import jwt
 from datetime import datetime, date
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 # Configuration
 BACKEND_URL = "https://travel-wizard-3.preview.emergentagent.com/api"
 AUTH0_DOMAIN = "dev-01mtujmmqt4lkn8h.us.auth0.com"
 AUTH0_AUDIENCE = "https://api.travel-itinerary.com"
 
+# Access token of a test user (e.g. copied from the app after logging in); enables the search tests
+AUTH_TOKEN = os.getenv("AUTH_TOKEN", "")
+# Database of the backend under test; when set, one searched trip is moved to the archive first
+MONGO_URL = os.getenv("MONGO_URL", "")
+
 # Test data for generating a session
 TEST_FORM_DATA = {
     "user_name": "Sarah Johnson",
@@ -35,6 +44,10 @@ class DoraAuthTester:
         self.test_results = []
         self.headers = {"Content-Type": "application/json"}
         self.jwks_data = None
+        # Trips converted for the search tests, by name; a unique marker in their destinations isolates them
+        self.search_marker = f"dora{uuid.uuid4().hex[:8]}"
+        self.search_trips: Dict[str, str] = {}
+        self.search_archived = False
     
     def log_test(self, test_name: str, success: bool, details: str, response_data: Optional[Dict] = None):
         """Log test results"""
@@ -201,6 +214,31 @@ class DoraAuthTester:
             self.log_test("Convert Itinerary (Invalid Auth)", False, f"Request error: {str(e)}")
             return False
     
+    def test_convert_itineraries_without_auth(self):
+        """Test bulk convert-itineraries endpoint without authentication (should fail)"""
+        if not self.session_id:
+            self.log_test("Convert Itineraries (No Auth)", False, "No session_id available")
+            return False
+        
+        try:
+            response = requests.post(
+                f"{BACKEND_URL}/convert-itineraries",
+                json={"session_ids": [self.session_id]},
+                headers=self.headers,
+                timeout=30
+            )
+            
+            if response.status_code == 401:
+                self.log_test("Convert Itineraries (No Auth)", True, "Correctly rejected bulk conversion without authentication")
+                return True
+            else:
+                self.log_test("Convert Itineraries (No Auth)", False, f"Expected 401, got HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Convert Itineraries (No Auth)", False, f"Request error: {str(e)}")
+            return False
+    
     def test_my_itineraries_without_auth(self):
         """Test my-itineraries endpoint without authentication"""
         try:
@@ -222,6 +260,234 @@ class DoraAuthTester:
             self.log_test("My Itineraries (No Auth)", False, f"Request error: {str(e)}")
             return False
     
+    def test_search_itineraries_without_auth(self):
+        """Test my-itineraries search endpoint without authentication"""
+        try:
+            response = requests.get(
+                f"{BACKEND_URL}/my-itineraries/search",
+                params={"q": "Paris", "when": "upcoming"},
+                headers=self.headers,
+                timeout=30
+            )
+            
+            if response.status_code == 401:
+                self.log_test("Search Itineraries (No Auth)", True, "Correctly rejected search without authentication")
+                return True
+            else:
+                self.log_test("Search Itineraries (No Auth)", False, f"Expected 401, got HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Search Itineraries (No Auth)", False, f"Request error: {str(e)}")
+            return False
+    
+    # Bulk conversion and search (need AUTH_TOKEN)
+
+
+    def auth_headers(self) -> Dict[str, str]:
+        return {**self.headers, "Authorization": f"Bearer {AUTH_TOKEN}"}
+
+    def archive_itinerary(self, itinerary_id: str):
+        """Move one converted itinerary to the cold archive, as the archival job would"""
+        import motor.motor_asyncio
+        from bson import ObjectId
+
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        from itinerary_archive import ARCHIVE_COLLECTION, ItineraryArchive, hot_collection
+
+        async def archive() -> int:
+            database = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL).dora_travel
+            source, owned = hot_collection(database)
+            return await ItineraryArchive(database[ARCHIVE_COLLECTION]).archive_batch(source, {"_id": ObjectId(itinerary_id), **owned})
+
+        return asyncio.run(archive())
+
+    def test_bulk_conversion(self):
+        """Duplicates collapse, unknown sessions report not_found, and repeating the batch is idempotent"""
+        try:
+            session_ids = []
+            for _ in range(2):
+                generated = requests.post(f"{BACKEND_URL}/generate-itinerary", json=TEST_FORM_DATA, headers=self.headers, timeout=60)
+                if generated.status_code != 200:
+                    self.log_test("Bulk Conversion", False, f"Generating: HTTP {generated.status_code}: {generated.text}")
+                    return False
+                session_ids.append(generated.json()["session_id"])
+            missing = f"missing-{uuid.uuid4()}"
+            batch = {"session_ids": [session_ids[0], session_ids[1], session_ids[0], missing]}
+            
+            first = requests.post(f"{BACKEND_URL}/convert-itineraries", json=batch, headers=self.auth_headers(), timeout=60)
+            if first.status_code != 200:
+                self.log_test("Bulk Conversion", False, f"HTTP {first.status_code}: {first.text}")
+                return False
+            results = first.json()["results"]
+            if [r["session_id"] for r in results] != [session_ids[0], session_ids[1], missing]:
+                self.log_test("Bulk Conversion", False, f"Expected deduplicated results in request order, got {results}")
+                return False
+            statuses = [r["status"] for r in results]
+            if statuses != ["converted", "converted", "not_found"] or results[2]["itinerary_id"] is not None:
+                self.log_test("Bulk Conversion", False, f"Unexpected statuses: {results}")
+                return False
+            
+            repeat = requests.post(f"{BACKEND_URL}/convert-itineraries", json=batch, headers=self.auth_headers(), timeout=60)
+            if repeat.status_code != 200 or repeat.json()["results"] != results:
+                self.log_test("Bulk Conversion", False, f"Repeated batch differs: HTTP {repeat.status_code}: {repeat.text}")
+                return False
+            
+            empty = requests.post(f"{BACKEND_URL}/convert-itineraries", json={"session_ids": []}, headers=self.auth_headers(), timeout=30)
+            if empty.status_code != 422:
+                self.log_test("Bulk Conversion", False, f"Expected 422 for an empty batch, got HTTP {empty.status_code}")
+                return False
+            
+            self.log_test("Bulk Conversion", True, "2 converted + 1 not_found from 4 ids; repeat returned the same itineraries; empty batch rejected")
+            return True
+            
+        except Exception as e:
+            self.log_test("Bulk Conversion", False, f"Request error: {str(e)}")
+            return False
+    
+    def setup_search_itineraries(self):
+        """Generate and convert three trips to search for (the past one archived when MONGO_URL is set)"""
+        trips = {
+            "lisbon": {"destinations": [f"Lisbon {self.search_marker}, Portugal"], "travel_theme": "Relaxation",
+                       "start_date": "2035-03-01", "end_date": "2035-03-05", "budget_per_person": 1000},
+            "reykjavik": {"destinations": [f"Reykjavik {self.search_marker}, Iceland"], "travel_theme": "Adventure",
+                          "start_date": "2036-06-10", "end_date": "2036-06-15", "budget_per_person": 4000},
+            "marrakesh": {"destinations": [f"Marrakesh {self.search_marker}, Morocco"], "travel_theme": "Cultural",
+                          "start_date": "2019-04-01", "end_date": "2019-04-06", "budget_per_person": 1500},
+        }
+        try:
+            for name, trip in trips.items():
+                generated = requests.post(
+                    f"{BACKEND_URL}/generate-itinerary",
+                    json={**TEST_FORM_DATA, **trip},
+                    headers=self.headers,
+                    timeout=60
+                )
+                if generated.status_code != 200:
+                    self.log_test("Setup Search Itineraries", False, f"Generating {name}: HTTP {generated.status_code}: {generated.text}")
+                    return False
+                converted = requests.post(
+                    f"{BACKEND_URL}/convert-itinerary",
+                    json={"session_id": generated.json()["session_id"]},
+                    headers=self.auth_headers(),
+                    timeout=30
+                )
+                if converted.status_code != 200:
+                    self.log_test("Setup Search Itineraries", False, f"Converting {name}: HTTP {converted.status_code}: {converted.text}")
+                    return False
+                self.search_trips[name] = converted.json()["itinerary_id"]
+            
+            if MONGO_URL:
+                self.search_archived = self.archive_itinerary(self.search_trips["marrakesh"]) == 1
+            where = "Marrakesh archived" if self.search_archived else "all hot (set MONGO_URL to archive one)"
+            self.log_test("Setup Search Itineraries", True, f"Converted 3 trips tagged {self.search_marker}, {where}")
+            return True
+            
+        except Exception as e:
+            self.log_test("Setup Search Itineraries", False, f"Request error: {str(e)}")
+            return False
+    
+    def search_ids(self, **params) -> List[str]:
+        """Ids of every result of a search, following cursors; raises on a non-200 page"""
+        ids, cursor = [], None
+        while True:
+            response = requests.get(
+                f"{BACKEND_URL}/my-itineraries/search",
+                params={**params, **({"cursor": cursor} if cursor else {})},
+                headers=self.auth_headers(),
+                timeout=30
+            )
+            if response.status_code != 200:
+                raise AssertionError(f"HTTP {response.status_code}: {response.text}")
+            page = response.json()
+            ids.extend(item["_id"] for item in page["itineraries"])
+            cursor = page.get("next_cursor")
+            if cursor is None:
+                return ids
+    
+    def check_search(self, test_name: str, params: Dict[str, Any], expected: List[str]) -> bool:
+        """Search with the test marker plus `params` and compare with the expected trips"""
+        try:
+            found = self.search_ids(q=self.search_marker, **params)
+            wanted = sorted(self.search_trips[name] for name in expected)
+            if sorted(found) == wanted:
+                self.log_test(test_name, True, f"{params or 'q only'} -> {', '.join(expected)}")
+                return True
+            names = {itinerary_id: name for name, itinerary_id in self.search_trips.items()}
+            self.log_test(test_name, False, f"{params}: expected {expected}, got {[names.get(i, i) for i in found]}")
+            return False
+        except Exception as e:
+            self.log_test(test_name, False, f"Request error: {str(e)}")
+            return False
+    
+    def test_search_text(self):
+        """Destination words match hot (text index) and archived (substring) trips"""
+        return self.check_search("Search Text", {}, ["lisbon", "reykjavik", "marrakesh"])
+    
+    def test_search_theme(self):
+        return self.check_search("Search Theme", {"theme": "Adventure"}, ["reykjavik"])
+    
+    def test_search_when(self):
+        upcoming = self.check_search("Search Upcoming", {"when": "upcoming"}, ["lisbon", "reykjavik"])
+        past = self.check_search("Search Past", {"when": "past"}, ["marrakesh"])
+        return upcoming and past
+    
+    def test_search_date_range(self):
+        return self.check_search("Search Date Range", {"from": "2035-01-01", "to": "2035-12-31"}, ["lisbon"])
+    
+    def test_search_budget_range(self):
+        return self.check_search("Search Budget Range", {"min_budget": 1200, "max_budget": 3000, "currency": "USD"}, ["marrakesh"])
+    
+    def test_search_cursor_paging(self):
+        """One result per page: the cursor walks every trip once, across hot and archive"""
+        try:
+            ids = self.search_ids(q=self.search_marker, limit=1)
+            success = sorted(ids) == sorted(self.search_trips.values())
+            across = "including the archived trip" if self.search_archived else "hot only"
+            if success:
+                self.log_test("Search Cursor Paging", True, f"3 pages of 1, no duplicates, {across}")
+            else:
+                self.log_test("Search Cursor Paging", False, f"Expected {sorted(self.search_trips.values())}, got {ids}")
+            return success
+        except Exception as e:
+            self.log_test("Search Cursor Paging", False, f"Request error: {str(e)}")
+            return False
+    
+    def test_search_invalid_parameters(self):
+        """Invalid dates and inverted budget ranges are rejected with 400"""
+        try:
+            invalid = ({"from": "2035-13-45"}, {"to": "next week"}, {"min_budget": 3000, "max_budget": 1000})
+            for params in invalid:
+                response = requests.get(f"{BACKEND_URL}/my-itineraries/search", params=params, headers=self.auth_headers(), timeout=30)
+                if response.status_code != 400:
+                    self.log_test("Search Invalid Parameters", False, f"{params}: expected 400, got HTTP {response.status_code}: {response.text}")
+                    return False
+            self.log_test("Search Invalid Parameters", True, f"{len(invalid)} invalid searches rejected with 400")
+            return True
+        except Exception as e:
+            self.log_test("Search Invalid Parameters", False, f"Request error: {str(e)}")
+            return False
+    
+    def test_trip_summary_without_auth(self):
+        """Test trip summary endpoint without authentication"""
+        try:
+            response = requests.get(
+                f"{BACKEND_URL}/my-itineraries/summary",
+                headers=self.headers,
+                timeout=30
+            )
+            
+            if response.status_code == 401:
+                self.log_test("Trip Summary (No Auth)", True, "Correctly rejected request without authentication")
+                return True
+            else:
+                self.log_test("Trip Summary (No Auth)", False, f"Expected 401, got HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Trip Summary (No Auth)", False, f"Request error: {str(e)}")
+            return False
+    
     def test_backend_auth_configuration(self):
         """Test backend Auth0 configuration by examining error responses"""
         try:
@@ -374,9 +640,26 @@ class DoraAuthTester:
             ("Backend Auth Configuration", self.test_backend_auth_configuration),
             ("Convert Itinerary (No Auth)", self.test_convert_itinerary_without_auth),
             ("Convert Itinerary (Invalid Auth)", self.test_convert_itinerary_with_invalid_auth),
+            ("Convert Itineraries (No Auth)", self.test_convert_itineraries_without_auth),
             ("My Itineraries (No Auth)", self.test_my_itineraries_without_auth),
+            ("Search Itineraries (No Auth)", self.test_search_itineraries_without_auth),
+            ("Trip Summary (No Auth)", self.test_trip_summary_without_auth),
             ("CORS Configuration", self.test_cors_configuration)
         ]
+        if AUTH_TOKEN:
+            tests += [
+                ("Bulk Conversion", self.test_bulk_conversion),
+                ("Setup Search Itineraries", self.setup_search_itineraries),
+                ("Search Text", self.test_search_text),
+                ("Search Theme", self.test_search_theme),
+                ("Search Upcoming/Past", self.test_search_when),
+                ("Search Date Range", self.test_search_date_range),
+                ("Search Budget Range", self.test_search_budget_range),
+                ("Search Cursor Paging", self.test_search_cursor_paging),
+                ("Search Invalid Parameters", self.test_search_invalid_parameters)
+            ]
+        else:
+            print("ℹ️  AUTH_TOKEN not set: skipping authenticated conversion and search tests")
         
         passed = 0
         total = len(tests)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Change-Stream Cache Invalidation Tests for Dora Travel API
+Runs two simulated API workers against a local single-node replica set and
+checks that writes made through one worker invalidate the other's cache,
+including after a resume and after an unusable resume token.
+
+Start a single-node replica set first:
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval "rs.initiate()"
+
+Then run: MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0" python change_stream_test.py
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import motor.motor_asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from cache import ByteLRUCache  # noqa: E402
+from cache_invalidation import ChangeStreamInvalidator, Invalidation, session_cache_subscriber  # noqa: E402
+
+# Configuration
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/?replicaSet=rs0")
+TEST_DATABASE = "dora_changestream_test"
+EVENT_TIMEOUT_SECONDS = 10
+
+
+class Worker:
+    """One API worker: its own itinerary cache, kept fresh by its own change stream"""
+
+    def __init__(self, name: str, database):
+        self.name = name
+        self.cache = ByteLRUCache(1024 * 1024, 300)
+        self.invalidator = ChangeStreamInvalidator(database, ["temporary_itineraries", "itineraries"])
+        self.seen: List[Invalidation] = []
+        self.invalidator.subscribe(self.seen.append)
+        # The subscriber the server registers for its itinerary cache
+        self.invalidator.subscribe(session_cache_subscriber(self.cache, "temporary_itineraries"))
+
+    async def start(self):
+        self.invalidator.start()
+        await self.invalidator.wait_ready()
+
+
+class ChangeStreamTester:
+    def __init__(self):
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+        self.database = self.client[TEST_DATABASE]
+        self.test_results = []
+
+    def log_test(self, test_name: str, success: bool, details: str, response_data: Optional[Dict] = None):
+        """Log test results"""
+        self.test_results.append({
+            "test": test_name,
+            "success": success,
+            "details": details,
+            "timestamp": datetime.now().isoformat(),
+            "response_data": response_data
+        })
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {details}")
+        if response_data and not success:
+            print(f"   Response: {response_data}")
+
+    async def wait_until(self, condition, timeout: float = EVENT_TIMEOUT_SECONDS) -> bool:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while asyncio.get_running_loop().time() < deadline:
+            if condition():
+                return True
+            await asyncio.sleep(0.05)
+        return condition()
+
+    async def new_session(self, *workers: Worker) -> str:
+        """A temporary itinerary every worker has cached"""
+        session_id = str(uuid.uuid4())
+        await self.database.temporary_itineraries.insert_one({"session_id": session_id, "status": "temporary"})
+        for worker in workers:
+            worker.cache.set(session_id, b"cached itinerary body")
+        return session_id
+
+    async def test_replica_set(self) -> bool:
+        hello = await self.client.admin.command("hello")
+        success = "setName" in hello
+        self.log_test("Replica Set", success, f"setName={hello.get('setName')}", None if success else hello)
+        return success
+
+    async def test_prepare_auth_invalidates_other_worker(self, a: Worker, b: Worker) -> bool:
+        session_id = await self.new_session(a, b)
+        # Worker A handles prepare_auth
+        await self.database.temporary_itineraries.update_one({"session_id": session_id}, {"$set": {"status": "auth_pending"}})
+        a.cache.invalidate(session_id)
+        success = await self.wait_until(lambda: session_id not in b.cache)
+        self.log_test("Prepare Auth Invalidation", success, "worker B dropped its cached copy" if success else "worker B still serves the stale body")
+        return success
+
+    async def test_conversion_invalidates_other_worker(self, a: Worker, b: Worker) -> bool:
+        session_id = await self.new_session(a, b)
+        # Worker A converts in split mode: copy into itineraries, delete the temporary record
+        await self.database.itineraries.insert_one({"user_id": "auth0|test", "original_session_id": session_id})
+        await self.database.temporary_itineraries.delete_one({"session_id": session_id})
+        success = await self.wait_until(lambda: session_id not in b.cache)
+        self.log_test("Conversion Invalidation", success, "worker B dropped its cached copy" if success else "worker B still serves the stale body")
+        return success
+
+    async def test_generation_keeps_cache(self, a: Worker, b: Worker) -> bool:
+        session_id = await self.new_session(a, b)
+        marker = await self.new_session()
+        await self.database.temporary_itineraries.update_one({"session_id": marker}, {"$set": {"status": "auth_pending"}})
+        # Once the later marker update arrived, the earlier insert has been processed too
+        await self.wait_until(lambda: any(i.session_id == marker for i in b.seen))
+        success = session_id in b.cache and session_id in a.cache
+        self.log_test("Generation Keeps Cache", success, "inserts of new sessions do not evict warm entries")
+        return success
+
+    async def test_resume_after_interruption(self, b: Worker) -> bool:
+        session_id = await self.new_session(b)
+        await b.invalidator.stop()
+        token = b.invalidator.resume_token
+        # Written while worker B's stream is down
+        await self.database.temporary_itineraries.update_one({"session_id": session_id}, {"$set": {"status": "auth_pending"}})
+        await b.start()
+        success = token is not None and await self.wait_until(lambda: session_id not in b.cache)
+        self.log_test("Resume Token", success, "event written during the outage was delivered after resuming" if success else "missed event during outage")
+        return success
+
+    async def test_unusable_token_flushes(self, b: Worker) -> bool:
+        session_id = await self.new_session(b)
+        await b.invalidator.stop()
+        flushes = b.invalidator.flushes
+        b.invalidator.resume_token = {"_data": "8200000000000000002B0229296E04"}
+        b.invalidator.start()
+        flushed = await self.wait_until(lambda: b.invalidator.flushes > flushes)
+        await b.invalidator.wait_ready()
+        recovered_session = await self.new_session(b)
+        await self.database.temporary_itineraries.update_one({"session_id": recovered_session}, {"$set": {"status": "auth_pending"}})
+        recovered = await self.wait_until(lambda: recovered_session not in b.cache)
+        success = flushed and session_id not in b.cache and recovered
+        self.log_test(
+            "Unusable Resume Token", success,
+            f"flushed={flushed}, stream recovered={recovered}",
+            None if success else b.invalidator.stats()
+        )
+        return success
+
+    async def run_all_tests(self):
+        print("🚀 Starting Change-Stream Invalidation Tests")
+        print(f"📍 MongoDB: {MONGO_URL}")
+        print("=" * 60)
+
+        await self.client.drop_database(TEST_DATABASE)
+        await self.database.create_collection("temporary_itineraries")
+        await self.database.create_collection("itineraries")
+
+        passed, total = 0, 0
+        if not await self.test_replica_set():
+            return 0, 1, self.test_results
+
+        a, b = Worker("A", self.database), Worker("B", self.database)
+        await a.start()
+        await b.start()
+        try:
+            tests = [
+                ("Prepare Auth Invalidation", lambda: self.test_prepare_auth_invalidates_other_worker(a, b)),
+                ("Conversion Invalidation", lambda: self.test_conversion_invalidates_other_worker(a, b)),
+                ("Generation Keeps Cache", lambda: self.test_generation_keeps_cache(a, b)),
+                ("Resume Token", lambda: self.test_resume_after_interruption(b)),
+                ("Unusable Resume Token", lambda: self.test_unusable_token_flushes(b)),
+            ]
+            total = len(tests) + 1
+            passed = 1
+            for test_name, test_func in tests:
+                print(f"\n🧪 Running: {test_name}")
+                try:
+                    if await test_func():
+                        passed += 1
+                except Exception as e:
+                    self.log_test(test_name, False, f"Exception: {str(e)}")
+        finally:
+            await a.invalidator.stop()
+            await b.invalidator.stop()
+            await self.client.drop_database(TEST_DATABASE)
+
+        print("\n" + "=" * 60)
+        print(f"📊 TEST SUMMARY: {passed}/{total} tests passed")
+        return passed, total, self.test_results
+
+
+def main():
+    passed, total, _ = asyncio.run(ChangeStreamTester().run_all_tests())
+    return passed == total
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
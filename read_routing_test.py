@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Read Routing Tests for Dora Travel API
+Routes reads to secondaries against a local three-member replica set and
+checks that consistency tokens give read-your-writes even while replication
+is paused, and that point lookups never miss a freshly written document.
+
+Start a three-member replica set with test commands enabled (for the
+rsSyncApplyStop fail point that pauses replication on a secondary):
+    for port in 27017 27018 27019; do
+        mongod --replSet rs0 --dbpath /tmp/rs0-$port --port $port --setParameter enableTestCommands=1 --fork --logpath /tmp/rs0-$port.log
+    done
+    mongosh --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017", priority: 2},
+        {_id: 1, host: "localhost:27018"},
+        {_id: 2, host: "localhost:27019"}]})'
+
+Then run: MONGO_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" python read_routing_test.py
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import motor.motor_asyncio
+from pymongo import WriteConcern
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from read_routing import InvalidConsistencyToken, ReadRouter, decode_consistency_token, parse_read_preference  # noqa: E402
+
+# Configuration
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0")
+TEST_DATABASE = "dora_read_routing_test"
+CAUSAL_WAIT_MS = 500
+
+
+class ReadRoutingTester:
+    def __init__(self):
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+        self.database = self.client[TEST_DATABASE]
+        # w:1 so writes succeed while the secondaries are paused
+        self.collection = self.database.get_collection("temporary_itineraries", write_concern=WriteConcern(w=1))
+        self.router = ReadRouter(self.client, {"itinerary": parse_read_preference("secondary")}, causal_wait_ms=CAUSAL_WAIT_MS)
+        self.secondaries: List[motor.motor_asyncio.AsyncIOMotorClient] = []
+        self.test_results = []
+
+    def log_test(self, test_name: str, success: bool, details: str, response_data: Optional[Dict] = None):
+        """Log test results"""
+        self.test_results.append({
+            "test": test_name,
+            "success": success,
+            "details": details,
+            "timestamp": datetime.now().isoformat(),
+            "response_data": response_data
+        })
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {details}")
+        if response_data and not success:
+            print(f"   Response: {response_data}")
+
+    def endpoint_stats(self) -> Dict[str, int]:
+        return dict(self.router.stats()["endpoints"].get("itinerary", {}))
+
+    async def pause_replication(self, paused: bool):
+        for secondary in self.secondaries:
+            await secondary.admin.command("configureFailPoint", "rsSyncApplyStop", mode="alwaysOn" if paused else "off")
+
+    async def test_replica_set(self) -> bool:
+        hello = await self.client.admin.command("hello")
+        for host in hello.get("secondaries", []):
+            self.secondaries.append(motor.motor_asyncio.AsyncIOMotorClient(f"mongodb://{host}/?directConnection=true"))
+        success = "setName" in hello and len(self.secondaries) >= 1
+        self.log_test("Replica Set", success, f"setName={hello.get('setName')}, secondaries={len(self.secondaries)}", None if success else hello)
+        return success
+
+    async def test_parse_read_preference(self) -> bool:
+        accepted = parse_read_preference("secondaryPreferred:120").document == {"mode": "secondaryPreferred", "maxStalenessSeconds": 120}
+        rejected = 0
+        for spec in ("primary:120", "secondary:30", "fastest"):
+            try:
+                parse_read_preference(spec)
+            except ValueError:
+                rejected += 1
+        success = accepted and rejected == 3
+        self.log_test("Read Preference Specs", success, f"mode[:staleness] parsed, {rejected}/3 invalid specs rejected")
+        return success
+
+    async def test_invalid_token(self) -> bool:
+        try:
+            self.router.reads("itinerary", "not-a-token")
+            success = False
+        except InvalidConsistencyToken:
+            success = True
+        self.log_test("Invalid Token", success, "forged tokens are rejected" if success else "forged token accepted")
+        return success
+
+    async def test_missing_document_retried_on_primary(self) -> bool:
+        await self.pause_replication(True)
+        try:
+            session_id = str(uuid.uuid4())
+            await self.collection.insert_one({"session_id": session_id, "version": 1})
+            before = self.endpoint_stats().get("missing_retried", 0)
+            reads = self.router.reads("itinerary")
+            document = await reads.find_one(self.collection, {"session_id": session_id}, {"_id": 0})
+            retried = self.endpoint_stats().get("missing_retried", 0) - before
+        finally:
+            await self.pause_replication(False)
+        success = document is not None and retried == 1 and reads.from_primary
+        self.log_test("Fresh Document Lookup", success, "not yet replicated, found on the primary" if success else f"document={document}, retried={retried}, from_primary={reads.from_primary}")
+        return success
+
+    async def test_stale_read_without_token(self) -> bool:
+        session_id = str(uuid.uuid4())
+        await self.database.temporary_itineraries.insert_one({"session_id": session_id, "version": 1})  # majority: on every member
+        await self.pause_replication(True)
+        try:
+            await self.collection.update_one({"session_id": session_id}, {"$set": {"version": 2}})
+            reads = self.router.reads("itinerary")
+            document = await reads.find_one(self.collection, {"session_id": session_id}, {"_id": 0})
+        finally:
+            await self.pause_replication(False)
+        # The server must not cache what a secondary returned
+        success = document is not None and document["version"] == 1 and not reads.from_primary
+        self.log_test("Stale Read Without Token", success, "secondary served the pre-update version (expected without a token), not cacheable", document)
+        return success
+
+    async def test_token_falls_back_to_primary(self) -> bool:
+        session_id = str(uuid.uuid4())
+        await self.database.temporary_itineraries.insert_one({"session_id": session_id, "version": 1})
+        await self.pause_replication(True)
+        try:
+            await self.collection.update_one({"session_id": session_id}, {"$set": {"version": 2}})
+            token = await self.router.token_after_write(self.collection, {"session_id": session_id})
+            before = self.endpoint_stats().get("causal_timeouts", 0)
+            document = await self.router.reads("itinerary", token).find_one(self.collection, {"session_id": session_id}, {"_id": 0})
+            timeouts = self.endpoint_stats().get("causal_timeouts", 0) - before
+        finally:
+            await self.pause_replication(False)
+        success = token is not None and document is not None and document["version"] == 2 and timeouts == 1
+        self.log_test(
+            "Token Read While Lagging", success,
+            f"secondary could not catch up within {CAUSAL_WAIT_MS}ms, primary served the write" if success else f"document={document}, timeouts={timeouts}"
+        )
+        return success
+
+    async def test_token_read_on_secondary(self) -> bool:
+        session_id = str(uuid.uuid4())
+        await self.database.temporary_itineraries.insert_one({"session_id": session_id, "version": 1})
+        await self.collection.update_one({"session_id": session_id}, {"$set": {"version": 2}})
+        token = await self.router.token_after_write(self.collection, {"session_id": session_id})
+        decode_consistency_token(token)
+        before = self.endpoint_stats()
+        document = await self.router.reads("itinerary", token).find_one(self.collection, {"session_id": session_id}, {"_id": 0})
+        after = self.endpoint_stats()
+        success = (
+            document is not None and document["version"] == 2
+            and after["causal"] == before["causal"] + 1
+            and after["causal_timeouts"] == before["causal_timeouts"]
+        )
+        self.log_test("Token Read On Secondary", success, "secondary waited for the write and served it" if success else f"document={document}, stats={after}")
+        return success
+
+    async def run_all_tests(self):
+        print("🚀 Starting Read Routing Tests")
+        print(f"📍 MongoDB: {MONGO_URL}")
+        print("=" * 60)
+
+        await self.client.drop_database(TEST_DATABASE)
+        await self.database.create_collection("temporary_itineraries")
+
+        passed, total = 0, 0
+        if not await self.test_replica_set():
+            return 0, 1, self.test_results
+
+        tests = [
+            ("Read Preference Specs", self.test_parse_read_preference),
+            ("Invalid Token", self.test_invalid_token),
+            ("Fresh Document Lookup", self.test_missing_document_retried_on_primary),
+            ("Stale Read Without Token", self.test_stale_read_without_token),
+            ("Token Read While Lagging", self.test_token_falls_back_to_primary),
+            ("Token Read On Secondary", self.test_token_read_on_secondary),
+        ]
+        total = len(tests) + 1
+        passed = 1
+        try:
+            for test_name, test_func in tests:
+                print(f"\n🧪 Running: {test_name}")
+                try:
+                    if await test_func():
+                        passed += 1
+                except Exception as e:
+                    self.log_test(test_name, False, f"Exception: {str(e)}")
+        finally:
+            await self.pause_replication(False)
+            await self.client.drop_database(TEST_DATABASE)
+
+        print("\n" + "=" * 60)
+        print(f"📊 TEST SUMMARY: {passed}/{total} tests passed")
+        return passed, total, self.test_results
+
+
+def main():
+    passed, total, _ = asyncio.run(ReadRoutingTester().run_all_tests())
+    return passed == total
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)